@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple, Type, TypeVar
+
+from fastapi import Body, HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import api.schemas as schemas
+from api.get_env import get_env_info
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class EnvInfo(BaseModel):
+    # 一括作成APIで1リクエストに含められる最大件数
+    BULK_MAX_ROWS: int = 5000
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+
+def get_bulk_rows(rows: List[Dict[str, Any]] = Body(...)) -> List[Dict[str, Any]]:
+    """一括作成のリクエストボディ
+
+    行ごとのバリデーションエラーでバッチ全体を失敗させないよう、
+    ここでは辞書の配列としてだけ受け取り、検証はvalidate_rowsで行う。
+    """
+    if len(rows) > env_info.BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many rows (max {env_info.BULK_MAX_ROWS})",
+        )
+    return rows
+
+
+def validate_rows(
+    rows: Sequence[Dict[str, Any]], schema: Type[T]
+) -> Tuple[List[Tuple[int, T]], List[schemas.BulkError]]:
+    """各行を検証し、(位置, 検証済みモデル) のリストとエラーのリストを返す"""
+    valid: List[Tuple[int, T]] = []
+    errors: List[schemas.BulkError] = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as e:
+            errors.append(
+                schemas.BulkError(
+                    index=index,
+                    errors=e.errors(include_url=False, include_context=False),
+                )
+            )
+    return valid, errors
+
+
+async def insert_rows(
+    db: AsyncSession, model, values: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """複数行を INSERT ... RETURNING でまとめて挿入し、挿入順に行を返す
+
+    ORMのadd/commit/refreshと異なり1文(件数が多い場合はドライバの上限に
+    合わせて数文)で挿入する。ORMのイベントは発火しないため、
+    before_insertで設定する列は呼び出し側でvaluesに含めること。
+    """
+    if not values:
+        return []
+    now = datetime.now()
+    values = [{"created_at": now, "updated_at": now, **value} for value in values]
+    stmt = insert(model.__table__).returning(
+        *model.__table__.columns, sort_by_parameter_order=True
+    )
+    result = await db.execute(stmt, values)
+    return [dict(row) for row in result.mappings()]
@@ -0,0 +1,173 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import metrics
+from api.db import is_replica_session
+from api.get_env import get_env_info
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class EnvInfo(BaseModel):
+    # 未設定の場合はエンティティのキャッシュを使わない
+    REDIS_URL: str = ""
+    CACHE_KEY_PREFIX: str = "api"
+    # Redisの代わりにプロセス内のメモリを使う (テストや1ワーカーでの開発用)。
+    # 更新時の破棄が他のワーカーに伝わらないため、複数ワーカーでは使わない
+    CACHE_IN_MEMORY: bool = False
+    CACHE_MAX_ENTRIES: int = 10000  # メモリキャッシュの最大件数
+    # エンティティごとのTTL(秒)。0でそのエンティティのキャッシュを無効にする
+    CACHE_TTL_ARTICLE: int = 3600
+    CACHE_TTL_TOURIST_SPOT: int = 600
+    CACHE_TTL_RESTAURANT: int = 600
+    # レプリカの遅延の上限(秒)。破棄してからこの秒数はレプリカから読んだ値をキャッシュしない。
+    # db.READ_YOUR_WRITES_SECONDS と同じ値にする
+    CACHE_REPLICA_LAG_SECONDS: int = 5
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+CACHE_TTLS: Dict[str, int] = {
+    "article": env_info.CACHE_TTL_ARTICLE,
+    "tourist_spot": env_info.CACHE_TTL_TOURIST_SPOT,
+    "restaurant": env_info.CACHE_TTL_RESTAURANT,
+}
+
+cache_requests = metrics.counter(
+    "cache_requests", "Entity cache lookups", ("entity", "result")
+)
+
+
+class InMemoryCache:
+    """テストやRedisを使わない環境向けの、プロセス内のLRUキャッシュ"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisCache:
+    """Redisをバックエンドにしたキャッシュ
+
+    Redisの障害でAPIが失敗しないよう、エラーはログに残してキャッシュミスとして扱う。
+    """
+
+    def __init__(self, url: str, prefix: str):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await self._client.get(key)
+        except Exception as e:
+            logger.warning("Cache get failed for %s: %s", key, e)
+            return None
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        try:
+            await self._client.set(key, value, ex=ttl)
+        except Exception as e:
+            logger.warning("Cache set failed for %s: %s", key, e)
+
+    async def delete(self, *keys: str) -> None:
+        try:
+            await self._client.delete(*keys)
+        except Exception as e:
+            logger.warning("Cache delete failed for %s: %s", keys, e)
+
+    async def clear(self) -> None:
+        async for key in self._client.scan_iter(match=f"{self.prefix}:*"):
+            await self._client.delete(key)
+
+
+# 共有のバックエンドが無い場合はキャッシュしない (Noneのとき)
+cache: Optional[Union[InMemoryCache, RedisCache]]
+if env_info.REDIS_URL:
+    cache = RedisCache(env_info.REDIS_URL, env_info.CACHE_KEY_PREFIX)
+elif env_info.CACHE_IN_MEMORY:
+    cache = InMemoryCache(env_info.CACHE_MAX_ENTRIES)
+else:
+    cache = None
+    logger.info("Entity cache is disabled because REDIS_URL is not set")
+
+
+def cache_key(entity: str, entity_id: int) -> str:
+    return f"{env_info.CACHE_KEY_PREFIX}:{entity}:{entity_id}"
+
+
+def invalidated_key(entity: str, entity_id: int) -> str:
+    return f"{env_info.CACHE_KEY_PREFIX}:invalidated:{entity}:{entity_id}"
+
+
+async def get_cached(entity: str, entity_id: int, schema: Type[T]) -> Optional[T]:
+    if cache is None or not CACHE_TTLS[entity]:
+        return None
+    value = await cache.get(cache_key(entity, entity_id))
+    if value is None:
+        cache_requests.labels(entity=entity, result="miss").inc()
+        return None
+    cache_requests.labels(entity=entity, result="hit").inc()
+    return schema.model_validate_json(value)
+
+
+async def set_cached(
+    entity: str, entity_id: int, value: BaseModel, db: AsyncSession
+) -> None:
+    """dbで読んだ値をキャッシュする
+
+    レプリカから読んだ値は、破棄してから CACHE_REPLICA_LAG_SECONDS の間はキャッシュしない
+    (遅延したレプリカの古い行を、破棄した直後にTTLの間入れ直さないため)。
+    """
+    ttl = CACHE_TTLS[entity]
+    if cache is None or not ttl:
+        return
+    if is_replica_session(db) and await cache.get(invalidated_key(entity, entity_id)):
+        return
+    await cache.set(cache_key(entity, entity_id), value.model_dump_json(), ttl)
+
+
+async def invalidate(entity: str, *entity_ids: int) -> None:
+    """更新・削除したエンティティのキャッシュを破棄する(コミット後に呼ぶ)"""
+    if cache is None or not entity_ids:
+        return
+    await cache.delete(*(cache_key(entity, entity_id) for entity_id in entity_ids))
+    if env_info.CACHE_REPLICA_LAG_SECONDS > 0:
+        for entity_id in entity_ids:
+            await cache.set(
+                invalidated_key(entity, entity_id),
+                "1",
+                env_info.CACHE_REPLICA_LAG_SECONDS,
+            )
@@ -0,0 +1,265 @@
+"""レスポンスの圧縮 (brotli / gzip) とCache-Controlを付けるASGIミドルウェア
+
+圧縮はAccept-Encodingのq値で選び、同じ場合はbrotliを優先する。brotliは
+brotliパッケージがインストールされている場合のみ使う (poetry add brotli)。
+COMPRESSION_MINIMUM_SIZE未満のレスポンスや、既にContent-Encodingのあるレスポンス、
+画像などテキスト以外のレスポンスは圧縮しない。
+"""
+
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.get_env import get_env_info
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class EnvInfo(BaseModel):
+    # これより小さいレスポンスは圧縮しない (バイト)
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    GZIP_COMPRESS_LEVEL: int = 6
+    # 0〜11。大きいほど圧縮率が上がるがCPUを使う
+    BROTLI_QUALITY: int = 4
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+# この状態の記事だけを共有キャッシュに置かせる
+PUBLISHED_STATUS = "published"
+
+COMPRESSIBLE_TYPES = frozenset(
+    {"application/json", "application/javascript", "application/xml"}
+)
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31でgzip形式のヘッダとフッタを付ける
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Accept-Encodingをコーディング名 -> q値 にする"""
+    qualities = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, param_value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    qualities = parse_accept_encoding(accept_encoding)
+    wildcard = qualities.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best: Optional[Tuple[float, str]] = None
+    for name in candidates:
+        quality = qualities.get(name, wildcard)
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, name)
+    return best[1] if best else None
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return (
+        content_type.startswith("text/")
+        or content_type in COMPRESSIBLE_TYPES
+        or content_type.endswith(("+json", "+xml"))
+    )
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+    ):
+        self.app = app
+        self.minimum_size = (
+            env_info.COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        )
+        self.gzip_level = (
+            env_info.GZIP_COMPRESS_LEVEL if gzip_level is None else gzip_level
+        )
+        self.brotli_quality = (
+            env_info.BROTLI_QUALITY if brotli_quality is None else brotli_quality
+        )
+
+    def _encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+        # Noneの間はまだ圧縮するかどうかを決めていない
+        compressing: Optional[bool] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, encoder, compressing
+            if message["type"] == "http.response.start":
+                # 最初のボディを見るまでヘッダを送らない
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressing is None:
+                headers = MutableHeaders(scope=start_message)
+                compressing = is_compressible(headers) and (
+                    more_body or len(body) >= self.minimum_size
+                )
+                if compressing:
+                    encoder = self._encoder(encoding)
+                    headers["Content-Encoding"] = encoder.name
+                    headers.add_vary_header("Accept-Encoding")
+                    del headers["Content-Length"]
+                    # 圧縮後の表現はバイト列が変わるため、強いETagは弱いETagにする
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = f"W/{etag}"
+                    if not more_body:
+                        # ボディが1回で送られる場合は圧縮後の長さを付ける
+                        body = encoder.compress(body) + encoder.finish()
+                        headers["Content-Length"] = str(len(body))
+                        await send(start_message)
+                        await send({**message, "body": body})
+                        return
+                await send(start_message)
+            if compressing:
+                body = encoder.compress(body)
+                if not more_body:
+                    body += encoder.finish()
+                message = {**message, "body": body}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        # ボディを送らずに終わった場合 (通常は起きない) もヘッダは送る
+        if compressing is None and start_message is not None:
+            await send(start_message)
+
+
+# 共有キャッシュに置かせず、ブラウザでも毎回再検証させる
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def set_private_unless_published(response: Response, articles: Iterable) -> None:
+    """下書きなど公開していない記事を含むレスポンスは共有キャッシュに置かせない"""
+    set_private_unless_statuses_published(
+        response, (article.status for article in articles)
+    )
+
+
+def set_private_unless_statuses_published(
+    response: Response, statuses: Iterable[Optional[str]]
+) -> None:
+    if any(status != PUBLISHED_STATUS for status in statuses):
+        response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
+
+
+class CacheControlMiddleware:
+    """パスの接頭辞ごとのCache-Controlを、GET/HEADの200・304のレスポンスに付ける
+
+    エンドポイントが既にCache-Controlを設定している場合はそちらを優先する。
+    private_cookieのあるリクエスト (直前に書き込んだクライアント) のレスポンスは、
+    そのクライアント向けの内容のため PRIVATE_CACHE_CONTROL にする。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        policies: Dict[str, str],
+        private_cookie: Optional[str] = None,
+    ):
+        self.app = app
+        # 長い接頭辞を先に調べる
+        self.policies = sorted(policies.items(), key=lambda item: -len(item[0]))
+        self.private_cookie = private_cookie
+
+    def _policy(self, path: str) -> Optional[str]:
+        for prefix, value in self.policies:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return value
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        policy = self._policy(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        if self.private_cookie and self.private_cookie in HTTPConnection(scope).cookies:
+            policy = PRIVATE_CACHE_CONTROL
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] in (
+                200,
+                304,
+            ):
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    headers["Cache-Control"] = policy
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,88 @@
+"""ETag / Last-Modified による条件付きGET
+
+ETagはエンティティの種類・id・updated_atから作る強いETag。updated_atは更新のたびに変わるため、
+本文を作らなくても表現が変わったかどうかを判定できる。
+If-None-Matchがある場合はそちらを優先し、If-Modified-Sinceは無視する (RFC 9110)。
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import api.cruds as cruds
+
+
+def make_etag(entity: str, entity_id: int, updated_at: datetime) -> str:
+    digest = hashlib.sha1(
+        f"{entity}:{entity_id}:{updated_at.isoformat()}".encode()
+    ).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def _to_utc(value: datetime) -> datetime:
+    # updated_atはローカル時刻のnaiveなdatetimeで保存されている
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(_to_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+def is_not_modified(request: Request, etag: str, updated_at: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Matchは弱い比較を行う
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # Last-Modifiedは秒単位のため、秒未満を切り捨てて比べる
+        return _to_utc(updated_at).replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(
+    response: Response, entity: str, entity_id: int, updated_at: Optional[datetime]
+) -> None:
+    # updated_atの無い古い行には検証子を付けない (条件付きGETにならず毎回200を返す)
+    if updated_at is None:
+        return
+    response.headers["ETag"] = make_etag(entity, entity_id, updated_at)
+    response.headers["Last-Modified"] = http_date(updated_at)
+
+
+async def check_not_modified(
+    request: Request, db: AsyncSession, entity: str, entity_id: int
+) -> Optional[Response]:
+    """条件付きリクエストで表現が変わっていなければ304のレスポンスを返す
+
+    updated_atはキャッシュか updated_at 列だけのSELECTで取得し、行全体は読み込まない。
+    """
+    if not is_conditional(request):
+        return None
+    # 存在しない場合とupdated_atがNULLの場合はどちらもNone
+    updated_at = await cruds.get_last_modified(db, entity, entity_id)
+    if updated_at is None:
+        return None
+    if not is_not_modified(
+        request, make_etag(entity, entity_id, updated_at), updated_at
+    ):
+        return None
+    response = Response(status_code=304)
+    set_validators(response, entity, entity_id, updated_at)
+    return response
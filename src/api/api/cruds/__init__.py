@@ -8,9 +8,11 @@ from .user import (
     get_articles_by_user,
 )
 from .article import (
+    ARTICLE_RELATIONS,
     get_article,
     get_articles,
     create_article,
+    create_articles_bulk,
     update_article,
     delete_article,
     get_article_by_title,
@@ -21,12 +23,24 @@ from .article_restaurant import (
     link_article_to_restaurant,
     unlink_article_from_restaurant,
     update_article_restaurant_association,
+    link_restaurants_to_article,
+    link_articles_to_restaurant,
+    unlink_restaurants_from_article,
+    unlink_articles_from_restaurant,
+    set_article_restaurants,
+    set_restaurant_articles,
 )
 from .article_tourist_spot import (
     get_assosicated_articles,
     link_article_to_tourist_spot,
     unlink_article_from_tourist_spot,
     update_article_tourist_spot_association,
+    link_tourist_spots_to_article,
+    link_articles_to_tourist_spot,
+    unlink_tourist_spots_from_article,
+    unlink_articles_from_tourist_spot,
+    set_article_tourist_spots,
+    set_tourist_spot_articles,
 )
 from .cultural_insight import (
     get_cultural_insight,
@@ -57,6 +71,7 @@ from .restaurant import (
     get_restaurant,
     get_restaurants,
     create_restaurant,
+    create_restaurants_bulk,
     update_restaurant,
     delete_restaurant,
     search_restaurants,
@@ -65,6 +80,7 @@ from .tourist_spot import (
     get_tourist_spot,
     get_tourist_spots,
     create_tourist_spot,
+    create_tourist_spots_bulk,
     update_tourist_spot,
     delete_tourist_spot,
     search_tourist_spots,
@@ -78,3 +94,4 @@ from .translation import (
     get_translations_by_article,
     get_translation_by_article_and_language,
 )
+from .last_modified import get_article_status, get_last_modified
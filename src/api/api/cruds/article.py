@@ -1,40 +1,92 @@
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.models.article import article_search_document
+from api.bulk import insert_rows, validate_rows
+from api.cache import get_cached, invalidate, set_cached
+from api.cruds.loaders import ARTICLE_RELATIONS, loader_options
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
+from api.text_search import SearchMode, fulltext_clauses
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
-async def get_article(db: AsyncSession, article_id: int):
-    logger.info(f"Fetching article with ID: {article_id}")
+def to_article_out(article, expand: Sequence[str] = ()) -> schemas.ArticleOut:
+    """記事の列と、expandで指定したリレーションだけを設定したArticleOutを作る
+
+    指定していないリレーションは未設定のままにし、response_model_exclude_unsetで省く。
+    """
+    data = schemas.Article.model_validate(article, from_attributes=True).model_dump()
+    for name in expand:
+        data[name] = getattr(article, name)
+    return schemas.ArticleOut.model_validate(data, from_attributes=True)
+
+
+async def get_article(db: AsyncSession, article_id: int, expand: Sequence[str] = ()):
+    logger.info("Fetching article with ID: %s", article_id)
     try:
+        if expand:
+            # リレーションを含む場合はキャッシュを使わない
+            result = await db.execute(
+                select(models.Article)
+                .filter(models.Article.id == article_id)
+                .options(*loader_options(models.Article, expand))
+            )
+            article = result.scalars().first()
+            if article is None:
+                logger.warning("Article with ID: %s not found", article_id)
+                return None
+            logger.info("Article with ID: %s fetched with %s", article_id, expand)
+            return to_article_out(article, expand)
+        article = await get_cached("article", article_id, schemas.Article)
+        if article:
+            logger.info("Article with ID: %s fetched from cache", article_id)
+            return article
         result = await db.execute(
             select(models.Article).filter(models.Article.id == article_id)
         )
         article = result.scalars().first()
         if article:
-            logger.info(f"Article with ID: {article_id} fetched successfully")
+            article = schemas.Article.model_validate(article, from_attributes=True)
+            await set_cached("article", article_id, article, db)
+            logger.info("Article with ID: %s fetched successfully", article_id)
         else:
-            logger.warning(f"Article with ID: {article_id} not found")
+            logger.warning("Article with ID: %s not found", article_id)
         return article
     except Exception as e:
-        logger.error(f"Failed to fetch article with ID: {article_id}. Error: {e}")
+        logger.error("Failed to fetch article with ID: %s. Error: %s", article_id, e)
         raise
 
 
-async def get_articles(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_articles(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
+    expand: Sequence[str] = (),
+) -> List[schemas.ArticleOut]:
     logger.info("Fetching articles")
     try:
-        result = await db.execute(select(models.Article).offset(skip).limit(limit))
-        articles = result.scalars().all()
+        result = await db.execute(
+            paginate(
+                select(models.Article).options(*loader_options(models.Article, expand)),
+                models.Article.id,
+                skip,
+                limit,
+                after,
+            )
+        )
+        articles = [to_article_out(article, expand) for article in result.scalars()]
         logger.info("Articles fetched successfully")
         return articles
     except Exception as e:
-        logger.error(f"Failed to fetch articles. Error: {e}")
+        logger.error("Failed to fetch articles. Error: %s", e)
         raise
 
 
@@ -52,92 +104,172 @@ async def create_article(db: AsyncSession, article: schemas.ArticleCreate):
         logger.info("New article created successfully")
         return db_article
     except Exception as e:
-        logger.error(f"Failed to create new article. Error: {e}")
+        logger.error("Failed to create new article. Error: %s", e)
         raise
 
 
-async def update_article(
-    db: AsyncSession, article: schemas.ArticleUpdate, article_id: int
-):
-    logger.info(f"Updating article with ID: {article_id}")
+async def create_articles_bulk(db: AsyncSession, rows: List[Dict[str, Any]]):
+    logger.info("Bulk creating %s articles", len(rows))
     try:
+        valid, errors = validate_rows(rows, schemas.ArticleCreate)
+        # 外部キー違反で文全体が失敗しないよう、存在しない著者の行は事前に除外する
+        author_ids = {article.author_id for _, article in valid}
         result = await db.execute(
-            select(models.Article).filter(models.Article.id == article_id)
+            select(models.User.id).filter(models.User.id.in_(author_ids))
         )
-        db_article = result.scalars().first()
-        if db_article:
-            update_data = {
-                **article.model_dump(exclude_unset=True),
-                "updated_at": datetime.now(),
-            }
-            for key, value in update_data.items():
-                setattr(db_article, key, value)
-            await db.commit()
-            await db.refresh(db_article)
-            logger.info(f"Article with ID: {article_id} updated successfully")
-            return db_article
-        else:
-            logger.warning(f"Article with ID: {article_id} not found")
+        existing_author_ids = set(result.scalars().all())
+        values = []
+        for index, article in valid:
+            if article.author_id not in existing_author_ids:
+                errors.append(
+                    schemas.BulkError(
+                        index=index,
+                        errors=[
+                            {
+                                "type": "not_found",
+                                "loc": ["author_id"],
+                                "msg": "Author not found",
+                                "input": article.author_id,
+                            }
+                        ],
+                    )
+                )
+                continue
+            # insert_rowsではbefore_insertイベントが発火しないため検索用の列をここで作る
+            values.append(
+                {
+                    **article.model_dump(),
+                    "search_text": article_search_document(
+                        article.title, article.content
+                    ),
+                }
+            )
+        errors.sort(key=lambda error: error.index)
+        created = await insert_rows(db, models.Article, values)
+        await db.commit()
+        logger.info("Bulk created %s articles (%s rejected)", len(created), len(errors))
+        return schemas.BulkCreateResult[schemas.Article](
+            created=[schemas.Article(**row) for row in created], errors=errors
+        )
+    except Exception as e:
+        logger.error("Failed to bulk create articles. Error: %s", e)
+        raise
+
+
+async def update_article(
+    db: AsyncSession, article: schemas.ArticleUpdate, article_id: int
+) -> Optional[schemas.Article]:
+    logger.info("Updating article with ID: %s", article_id)
+    try:
+        update_data = {
+            **article.model_dump(exclude_unset=True),
+            "updated_at": datetime.now(),
+        }
+        search_fields = {
+            name: update_data[name]
+            for name in ("title", "content")
+            if name in update_data
+        }
+        if len(search_fields) == 1:
+            # 片方だけの更新は、もう片方の列だけを読み、検索用の列も同じUPDATEで更新する。
+            # 読んでから更新するまでに別の更新が入らないよう行をロックする
+            (missing,) = {"title", "content"} - search_fields.keys()
+            row = (
+                await db.execute(
+                    select(getattr(models.Article, missing))
+                    .filter(models.Article.id == article_id)
+                    .with_for_update()
+                )
+            ).first()
+            if row is None:
+                logger.warning("Article with ID: %s not found", article_id)
+                return None
+            search_fields[missing] = row[0]
+        if search_fields:
+            update_data["search_text"] = article_search_document(
+                search_fields["title"], search_fields["content"]
+            )
+        db_article = await update_returning(db, models.Article, article_id, update_data)
+        if db_article is None:
+            logger.warning("Article with ID: %s not found", article_id)
             return None
+        article_out = schemas.Article.model_validate(db_article, from_attributes=True)
+        await db.commit()
+        await invalidate("article", article_id)
+        logger.info("Article with ID: %s updated successfully", article_id)
+        return article_out
     except Exception as e:
-        logger.error(f"Failed to update article with ID: {article_id}. Error: {e}")
+        logger.error("Failed to update article with ID: %s. Error: %s", article_id, e)
         raise
 
 
 async def delete_article(db: AsyncSession, article_id: int) -> bool:
-    logger.info(f"Deleting article with ID: {article_id}")
+    logger.info("Deleting article with ID: %s", article_id)
     try:
-        result = await db.execute(
-            select(models.Article).filter(models.Article.id == article_id)
+        deleted = await delete_returning(
+            db, models.Article, models.Article.id == article_id
         )
-        db_article = result.scalars().first()
-        if db_article:
-            await db.delete(db_article)
-            await db.commit()
-            logger.info(f"Article with ID: {article_id} deleted successfully")
-            return True
-        else:
-            logger.warning(f"Article with ID: {article_id} not found")
+        if not deleted:
+            logger.warning("Article with ID: %s not found", article_id)
             return False
+        await db.commit()
+        await invalidate("article", article_id)
+        logger.info("Article with ID: %s deleted successfully", article_id)
+        return True
     except Exception as e:
-        logger.error(f"Failed to delete article with ID: {article_id}. Error: {e}")
+        logger.error("Failed to delete article with ID: %s. Error: %s", article_id, e)
         raise
 
 
 async def get_article_by_title(db: AsyncSession, title: str):
-    logger.info(f"Fetching article with title: {title}")
+    logger.info("Fetching article with title: %s", title)
     try:
         result = await db.execute(
             select(models.Article).filter(models.Article.title == title)
         )
         article = result.scalars().first()
         if article:
-            logger.info(f"Article with title: {title} fetched successfully")
+            logger.info("Article with title: %s fetched successfully", title)
         else:
-            logger.warning(f"Article with title: {title} not found")
+            logger.warning("Article with title: %s not found", title)
         return article
     except Exception as e:
-        logger.error(f"Failed to fetch article with title: {title}. Error: {e}")
+        logger.error("Failed to fetch article with title: %s. Error: %s", title, e)
         raise
 
 
 async def search_articles(
-    db: AsyncSession, keyword: str, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    keyword: str,
+    skip: int = 0,
+    limit: int = 100,
+    mode: SearchMode = SearchMode.contains,
 ):
-    logger.info(f"Searching articles with keyword: {keyword}")
+    logger.info("Searching articles with keyword: %s (mode: %s)", keyword, mode.value)
     try:
-        result = await db.execute(
-            select(models.Article)
-            .filter(
+        stmt = select(models.Article)
+        if mode == SearchMode.fulltext:
+            clauses = fulltext_clauses(db, models.Article.search_text, keyword)
+            if clauses is None:
+                logger.info("Keyword: %s has no searchable tokens", keyword)
+                return []
+            where, rank = clauses
+            stmt = stmt.filter(where)
+            if rank is not None:
+                stmt = stmt.order_by(rank)
+        else:
+            stmt = stmt.filter(
                 models.Article.title.contains(keyword)
                 | models.Article.content.contains(keyword)
             )
-            .offset(skip)
-            .limit(limit)
+        result = await db.execute(
+            stmt.order_by(models.Article.id).offset(skip).limit(limit)
         )
         articles = result.scalars().all()
-        logger.info(f"Articles with keyword: {keyword} fetched successfully")
+        logger.info("Articles with keyword: %s fetched successfully", keyword)
         return articles
     except Exception as e:
-        logger.error(f"Failed to search articles with keyword: {keyword}. Error: {e}")
+        logger.error(
+            "Failed to search articles with keyword: %s. Error: %s", keyword, e
+        )
         raise
@@ -1,9 +1,14 @@
 from datetime import datetime
+from typing import Iterable, List
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.cache import invalidate
+from api.cruds.association import create_links, delete_links, link_many, set_links
+from api.cruds.returning import delete_returning
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
@@ -11,7 +16,7 @@ logger, log_decorator = setup_logger(__name__)
 
 # 関連する記事を取得
 async def get_assosicated_articles(db: AsyncSession, restaurant_id: int):
-    logger.info(f"Fetching associated articles for restaurant ID: {restaurant_id}")
+    logger.info("Fetching associated articles for restaurant ID: %s", restaurant_id)
     try:
         result = await db.execute(
             select(models.ArticleRestaurant).filter(
@@ -20,12 +25,16 @@ async def get_assosicated_articles(db: AsyncSession, restaurant_id: int):
         )
         articles = result.scalars().all()
         logger.info(
-            f"Successfully fetched {len(articles)} associated articles for restaurant ID: {restaurant_id}"
+            "Successfully fetched %s associated articles for restaurant ID: %s",
+            len(articles),
+            restaurant_id,
         )
         return articles
     except Exception as e:
         logger.error(
-            f"Failed to fetch associated articles for restaurant ID: {restaurant_id}. Error: {e}"
+            "Failed to fetch associated articles for restaurant ID: %s. Error: %s",
+            restaurant_id,
+            e,
         )
         raise
 
@@ -34,23 +43,44 @@ async def get_assosicated_articles(db: AsyncSession, restaurant_id: int):
 async def link_article_to_restaurant(
     db: AsyncSession, restaurant_id: int, article_id: int
 ):
-    logger.info(f"Linking article ID: {article_id} to restaurant ID: {restaurant_id}")
+    logger.info(
+        "Linking article ID: %s to restaurant ID: %s", article_id, restaurant_id
+    )
     try:
-        association = models.ArticleRestaurant(
-            article_id=article_id,
-            restaurant_id=restaurant_id,
-            created_at=datetime.now(),
-            updated_at=datetime.now(),
+        rows = await link_many(
+            db,
+            models.ArticleRestaurant,
+            "article_id",
+            article_id,
+            "restaurant_id",
+            [restaurant_id],
         )
-        db.add(association)
+        if rows:
+            association = schemas.ArticleRestaurant.model_validate(rows[0])
+        else:
+            # 既に紐付いている場合は既存の紐付けを返す
+            result = await db.execute(
+                select(models.ArticleRestaurant).filter(
+                    models.ArticleRestaurant.article_id == article_id,
+                    models.ArticleRestaurant.restaurant_id == restaurant_id,
+                )
+            )
+            association = result.scalars().first()
         await db.commit()
+        await invalidate("article", article_id)
+        await invalidate("restaurant", restaurant_id)
         logger.info(
-            f"Article ID: {article_id} successfully linked to restaurant ID: {restaurant_id}"
+            "Article ID: %s successfully linked to restaurant ID: %s",
+            article_id,
+            restaurant_id,
         )
         return association
     except Exception as e:
         logger.error(
-            f"Failed to link article ID: {article_id} to restaurant ID: {restaurant_id}. Error: {e}"
+            "Failed to link article ID: %s to restaurant ID: %s. Error: %s",
+            article_id,
+            restaurant_id,
+            e,
         )
         raise
 
@@ -60,31 +90,37 @@ async def unlink_article_from_restaurant(
     db: AsyncSession, restaurant_id: int, article_id: int
 ):
     logger.info(
-        f"Unlinking article ID: {article_id} from restaurant ID: {restaurant_id}"
+        "Unlinking article ID: %s from restaurant ID: %s", article_id, restaurant_id
     )
     try:
-        result = await db.execute(
-            select(models.ArticleRestaurant).filter(
-                models.ArticleRestaurant.article_id == article_id,
-                models.ArticleRestaurant.restaurant_id == restaurant_id,
-            )
+        deleted = await delete_returning(
+            db,
+            models.ArticleRestaurant,
+            models.ArticleRestaurant.article_id == article_id,
+            models.ArticleRestaurant.restaurant_id == restaurant_id,
         )
-        association = result.scalars().first()
-        if association:
-            await db.delete(association)
-            await db.commit()
-            logger.info(
-                f"Article ID: {article_id} successfully unlinked from restaurant ID: {restaurant_id}"
-            )
-            return True
-        else:
+        if not deleted:
             logger.warning(
-                f"No association found for article ID: {article_id} with restaurant ID: {restaurant_id}"
+                "No association found for article ID: %s with restaurant ID: %s",
+                article_id,
+                restaurant_id,
             )
             return False
+        await db.commit()
+        await invalidate("article", article_id)
+        await invalidate("restaurant", restaurant_id)
+        logger.info(
+            "Article ID: %s successfully unlinked from restaurant ID: %s",
+            article_id,
+            restaurant_id,
+        )
+        return True
     except Exception as e:
         logger.error(
-            f"Failed to unlink article ID: {article_id} from restaurant ID: {restaurant_id}. Error: {e}"
+            "Failed to unlink article ID: %s from restaurant ID: %s. Error: %s",
+            article_id,
+            restaurant_id,
+            e,
         )
         raise
 
@@ -94,7 +130,9 @@ async def update_article_restaurant_association(
     db: AsyncSession, restaurant_id: int, article_id: int
 ):
     logger.info(
-        f"Updating association for article ID: {article_id} and restaurant ID: {restaurant_id}"
+        "Updating association for article ID: %s and restaurant ID: %s",
+        article_id,
+        restaurant_id,
     )
     try:
         result = await db.execute(
@@ -107,17 +145,114 @@ async def update_article_restaurant_association(
         if association:
             association.updated_at = datetime.now()
             await db.commit()
+            await invalidate("article", article_id)
+            await invalidate("restaurant", restaurant_id)
             logger.info(
-                f"Association for article ID: {article_id} and restaurant ID: {restaurant_id} updated"
+                "Association for article ID: %s and restaurant ID: %s updated",
+                article_id,
+                restaurant_id,
             )
             return association
         else:
             logger.warning(
-                f"No association found to update for article ID: {article_id} with restaurant ID: {restaurant_id}"
+                "No association found to update for article ID: %s with restaurant ID: %s",
+                article_id,
+                restaurant_id,
             )
             return None
     except Exception as e:
         logger.error(
-            f"Failed to update association for article ID: {article_id} and restaurant ID: {restaurant_id}. Error: {e}"
+            "Failed to update association for article ID: %s and restaurant ID: %s. Error: %s",
+            article_id,
+            restaurant_id,
+            e,
         )
         raise
+
+
+# 記事に複数のレストランをまとめて紐付ける (紐付け済みのものは無視)
+async def link_restaurants_to_article(
+    db: AsyncSession, article_id: int, restaurant_ids: Iterable[int]
+) -> List[schemas.ArticleRestaurant]:
+    return await create_links(
+        db,
+        models.ArticleRestaurant,
+        schemas.ArticleRestaurant,
+        "article_id",
+        article_id,
+        "restaurant_id",
+        restaurant_ids,
+    )
+
+
+# レストランに複数の記事をまとめて紐付ける (紐付け済みのものは無視)
+async def link_articles_to_restaurant(
+    db: AsyncSession, restaurant_id: int, article_ids: Iterable[int]
+) -> List[schemas.ArticleRestaurant]:
+    return await create_links(
+        db,
+        models.ArticleRestaurant,
+        schemas.ArticleRestaurant,
+        "restaurant_id",
+        restaurant_id,
+        "article_id",
+        article_ids,
+    )
+
+
+# 記事から複数のレストランの紐付けをまとめて解除し、解除したレストランのIDを返す
+async def unlink_restaurants_from_article(
+    db: AsyncSession, article_id: int, restaurant_ids: Iterable[int]
+) -> List[int]:
+    return await delete_links(
+        db,
+        models.ArticleRestaurant,
+        "article_id",
+        article_id,
+        "restaurant_id",
+        restaurant_ids,
+    )
+
+
+# レストランから複数の記事の紐付けをまとめて解除し、解除した記事のIDを返す
+async def unlink_articles_from_restaurant(
+    db: AsyncSession, restaurant_id: int, article_ids: Iterable[int]
+) -> List[int]:
+    return await delete_links(
+        db,
+        models.ArticleRestaurant,
+        "restaurant_id",
+        restaurant_id,
+        "article_id",
+        article_ids,
+    )
+
+
+# 記事に紐付けるレストランを指定した集合に置き換える (差分だけを追加・削除)
+async def set_article_restaurants(
+    db: AsyncSession, article_id: int, restaurant_ids: Iterable[int]
+) -> List[schemas.ArticleRestaurant]:
+    return await set_links(
+        db,
+        models.ArticleRestaurant,
+        schemas.ArticleRestaurant,
+        "article_id",
+        article_id,
+        "restaurant_id",
+        restaurant_ids,
+    )
+
+
+# レストランに紐付ける記事を指定した集合に置き換える (差分だけを追加・削除)
+async def set_restaurant_articles(
+    db: AsyncSession, restaurant_id: int, article_ids: Iterable[int]
+) -> List[schemas.ArticleRestaurant]:
+    return await set_links(
+        db,
+        models.ArticleRestaurant,
+        schemas.ArticleRestaurant,
+        "restaurant_id",
+        restaurant_id,
+        "article_id",
+        article_ids,
+    )
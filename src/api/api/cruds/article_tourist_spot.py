@@ -1,15 +1,21 @@
 from datetime import datetime
+from typing import Iterable, List
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
+import api.schemas as schemas
+from api.cache import invalidate
+from api.cruds.association import create_links, delete_links, link_many, set_links
+from api.cruds.returning import delete_returning
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_assosicated_articles(db: AsyncSession, tourist_spot_id: int):
-    logger.info(f"Fetching associated articles for tourist spot ID: {tourist_spot_id}")
+    logger.info("Fetching associated articles for tourist spot ID: %s", tourist_spot_id)
     try:
         result = await db.execute(
             select(models.ArticleTouristSpot).filter(
@@ -18,12 +24,15 @@ async def get_assosicated_articles(db: AsyncSession, tourist_spot_id: int):
         )
         articles = result.scalars().all()
         logger.info(
-            f"Successfully fetched associated articles for tourist spot ID: {tourist_spot_id}"
+            "Successfully fetched associated articles for tourist spot ID: %s",
+            tourist_spot_id,
         )
         return articles
     except Exception as e:
         logger.error(
-            f"Error fetching associated articles for tourist spot ID: {tourist_spot_id}. Error: {e}"
+            "Error fetching associated articles for tourist spot ID: %s. Error: %s",
+            tourist_spot_id,
+            e,
         )
         raise
 
@@ -32,25 +41,43 @@ async def link_article_to_tourist_spot(
     db: AsyncSession, tourist_spot_id: int, article_id: int
 ):
     logger.info(
-        f"Linking article ID: {article_id} to tourist spot ID: {tourist_spot_id}"
+        "Linking article ID: %s to tourist spot ID: %s", article_id, tourist_spot_id
     )
     try:
-        association = models.ArticleTouristSpot(
-            article_id=article_id,
-            tourist_spot_id=tourist_spot_id,
-            created_at=datetime.now(),
-            updated_at=datetime.now(),
+        rows = await link_many(
+            db,
+            models.ArticleTouristSpot,
+            "article_id",
+            article_id,
+            "tourist_spot_id",
+            [tourist_spot_id],
         )
-        db.add(association)
+        if rows:
+            association = schemas.ArticleTouristSpot.model_validate(rows[0])
+        else:
+            # 既に紐付いている場合は既存の紐付けを返す
+            result = await db.execute(
+                select(models.ArticleTouristSpot).filter(
+                    models.ArticleTouristSpot.article_id == article_id,
+                    models.ArticleTouristSpot.tourist_spot_id == tourist_spot_id,
+                )
+            )
+            association = result.scalars().first()
         await db.commit()
-        await db.refresh(association)
+        await invalidate("article", article_id)
+        await invalidate("tourist_spot", tourist_spot_id)
         logger.info(
-            f"Successfully linked article ID: {article_id} to tourist spot ID: {tourist_spot_id}"
+            "Successfully linked article ID: %s to tourist spot ID: %s",
+            article_id,
+            tourist_spot_id,
         )
         return association
     except Exception as e:
         logger.error(
-            f"Error linking article ID: {article_id} to tourist spot ID: {tourist_spot_id}. Error: {e}"
+            "Error linking article ID: %s to tourist spot ID: %s. Error: %s",
+            article_id,
+            tourist_spot_id,
+            e,
         )
         raise
 
@@ -59,31 +86,37 @@ async def unlink_article_from_tourist_spot(
     db: AsyncSession, tourist_spot_id: int, article_id: int
 ):
     logger.info(
-        f"Unlinking article ID: {article_id} from tourist spot ID: {tourist_spot_id}"
+        "Unlinking article ID: %s from tourist spot ID: %s", article_id, tourist_spot_id
     )
     try:
-        result = await db.execute(
-            select(models.ArticleTouristSpot).filter(
-                models.ArticleTouristSpot.article_id == article_id,
-                models.ArticleTouristSpot.tourist_spot_id == tourist_spot_id,
-            )
+        deleted = await delete_returning(
+            db,
+            models.ArticleTouristSpot,
+            models.ArticleTouristSpot.article_id == article_id,
+            models.ArticleTouristSpot.tourist_spot_id == tourist_spot_id,
         )
-        association = result.scalars().first()
-        if association:
-            await db.delete(association)
-            await db.commit()
-            logger.info(
-                f"Successfully unlinked article ID: {article_id} from tourist spot ID: {tourist_spot_id}"
-            )
-            return True
-        else:
+        if not deleted:
             logger.warning(
-                f"No association found to unlink article ID: {article_id} from tourist spot ID: {tourist_spot_id}"
+                "No association found to unlink article ID: %s from tourist spot ID: %s",
+                article_id,
+                tourist_spot_id,
             )
             return False
+        await db.commit()
+        await invalidate("article", article_id)
+        await invalidate("tourist_spot", tourist_spot_id)
+        logger.info(
+            "Successfully unlinked article ID: %s from tourist spot ID: %s",
+            article_id,
+            tourist_spot_id,
+        )
+        return True
     except Exception as e:
         logger.error(
-            f"Error unlinking article ID: {article_id} from tourist spot ID: {tourist_spot_id}. Error: {e}"
+            "Error unlinking article ID: %s from tourist spot ID: %s. Error: %s",
+            article_id,
+            tourist_spot_id,
+            e,
         )
         raise
 
@@ -92,7 +125,9 @@ async def update_article_tourist_spot_association(
     db: AsyncSession, tourist_spot_id: int, article_id: int
 ):
     logger.info(
-        f"Updating association for article ID: {article_id} and tourist spot ID: {tourist_spot_id}"
+        "Updating association for article ID: %s and tourist spot ID: %s",
+        article_id,
+        tourist_spot_id,
     )
     try:
         result = await db.execute(
@@ -105,17 +140,114 @@ async def update_article_tourist_spot_association(
         if association:
             association.updated_at = datetime.now()
             await db.commit()
+            await invalidate("article", article_id)
+            await invalidate("tourist_spot", tourist_spot_id)
             logger.info(
-                f"Successfully updated association for article ID: {article_id} and tourist spot ID: {tourist_spot_id}"
+                "Successfully updated association for article ID: %s and tourist spot ID: %s",
+                article_id,
+                tourist_spot_id,
             )
             return association
         else:
             logger.warning(
-                f"No association found to update for article ID: {article_id} and tourist spot ID: {tourist_spot_id}"
+                "No association found to update for article ID: %s and tourist spot ID: %s",
+                article_id,
+                tourist_spot_id,
             )
             return None
     except Exception as e:
         logger.error(
-            f"Error updating association for article ID: {article_id} and tourist spot ID: {tourist_spot_id}. Error: {e}"
+            "Error updating association for article ID: %s and tourist spot ID: %s. Error: %s",
+            article_id,
+            tourist_spot_id,
+            e,
         )
         raise
+
+
+# 記事に複数の観光地をまとめて紐付ける (紐付け済みのものは無視)
+async def link_tourist_spots_to_article(
+    db: AsyncSession, article_id: int, tourist_spot_ids: Iterable[int]
+) -> List[schemas.ArticleTouristSpot]:
+    return await create_links(
+        db,
+        models.ArticleTouristSpot,
+        schemas.ArticleTouristSpot,
+        "article_id",
+        article_id,
+        "tourist_spot_id",
+        tourist_spot_ids,
+    )
+
+
+# 観光地に複数の記事をまとめて紐付ける (紐付け済みのものは無視)
+async def link_articles_to_tourist_spot(
+    db: AsyncSession, tourist_spot_id: int, article_ids: Iterable[int]
+) -> List[schemas.ArticleTouristSpot]:
+    return await create_links(
+        db,
+        models.ArticleTouristSpot,
+        schemas.ArticleTouristSpot,
+        "tourist_spot_id",
+        tourist_spot_id,
+        "article_id",
+        article_ids,
+    )
+
+
+# 記事から複数の観光地の紐付けをまとめて解除し、解除した観光地のIDを返す
+async def unlink_tourist_spots_from_article(
+    db: AsyncSession, article_id: int, tourist_spot_ids: Iterable[int]
+) -> List[int]:
+    return await delete_links(
+        db,
+        models.ArticleTouristSpot,
+        "article_id",
+        article_id,
+        "tourist_spot_id",
+        tourist_spot_ids,
+    )
+
+
+# 観光地から複数の記事の紐付けをまとめて解除し、解除した記事のIDを返す
+async def unlink_articles_from_tourist_spot(
+    db: AsyncSession, tourist_spot_id: int, article_ids: Iterable[int]
+) -> List[int]:
+    return await delete_links(
+        db,
+        models.ArticleTouristSpot,
+        "tourist_spot_id",
+        tourist_spot_id,
+        "article_id",
+        article_ids,
+    )
+
+
+# 記事に紐付ける観光地を指定した集合に置き換える (差分だけを追加・削除)
+async def set_article_tourist_spots(
+    db: AsyncSession, article_id: int, tourist_spot_ids: Iterable[int]
+) -> List[schemas.ArticleTouristSpot]:
+    return await set_links(
+        db,
+        models.ArticleTouristSpot,
+        schemas.ArticleTouristSpot,
+        "article_id",
+        article_id,
+        "tourist_spot_id",
+        tourist_spot_ids,
+    )
+
+
+# 観光地に紐付ける記事を指定した集合に置き換える (差分だけを追加・削除)
+async def set_tourist_spot_articles(
+    db: AsyncSession, tourist_spot_id: int, article_ids: Iterable[int]
+) -> List[schemas.ArticleTouristSpot]:
+    return await set_links(
+        db,
+        models.ArticleTouristSpot,
+        schemas.ArticleTouristSpot,
+        "tourist_spot_id",
+        tourist_spot_id,
+        "article_id",
+        article_ids,
+    )
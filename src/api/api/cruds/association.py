@@ -0,0 +1,210 @@
+"""記事と観光地・レストランの紐付け(中間テーブル)をまとめて操作する
+
+owner は固定する側の列名 (例: "article_id")、other は複数指定する側の列名
+(例: "tourist_spot_id")。link_many / unlink_many / replace_links はコミットを行わない。
+create_links / delete_links / set_links はコミットし、紐付けが変わった両側のキャッシュを破棄する。
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.cache import invalidate
+from api.cruds.returning import delete_returning
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+
+def _insert(db: AsyncSession, model):
+    if db.bind.dialect.name == "sqlite":
+        return sqlite_insert(model.__table__)
+    return pg_insert(model.__table__)
+
+
+async def link_many(
+    db: AsyncSession,
+    model,
+    owner: str,
+    owner_id: int,
+    other: str,
+    other_ids: Iterable[int],
+) -> List[Dict[str, Any]]:
+    """INSERT ... ON CONFLICT DO NOTHING で紐付けをまとめて作成し、新しく作成した行を返す
+
+    既に紐付いている組は (owner, other) の一意索引により無視される。
+    """
+    now = datetime.now()
+    values = [
+        {owner: owner_id, other: other_id, "created_at": now, "updated_at": now}
+        for other_id in dict.fromkeys(other_ids)
+    ]
+    if not values:
+        return []
+    table = model.__table__
+    stmt = (
+        _insert(db, model)
+        .on_conflict_do_nothing(index_elements=[owner, other])
+        .returning(*table.columns)
+    )
+    result = await db.execute(stmt, values)
+    return [dict(row) for row in result.mappings()]
+
+
+async def unlink_many(
+    db: AsyncSession,
+    model,
+    owner: str,
+    owner_id: int,
+    other: str,
+    other_ids: Iterable[int],
+) -> List[int]:
+    """紐付けを1文でまとめて削除し、削除した相手のidを返す"""
+    other_ids = list(dict.fromkeys(other_ids))
+    if not other_ids:
+        return []
+    deleted = await delete_returning(
+        db,
+        model,
+        getattr(model, owner) == owner_id,
+        getattr(model, other).in_(other_ids),
+    )
+    return [getattr(row, other) for row in deleted]
+
+
+def lock_owner(model, owner: str, owner_id: int):
+    """固定する側の行を SELECT ... FOR UPDATE でロックする文を返す
+
+    同じ行の紐付けの置き換えを直列にし、読み込んだ現在の紐付けが他のトランザクションと
+    食い違わないようにする (SQLiteではFOR UPDATEは付かない)。
+    """
+    (foreign_key,) = model.__table__.c[owner].foreign_keys
+    column = foreign_key.column
+    return select(column).where(column == owner_id).with_for_update()
+
+
+async def replace_links(
+    db: AsyncSession,
+    model,
+    owner: str,
+    owner_id: int,
+    other: str,
+    other_ids: Iterable[int],
+) -> Tuple[List[Any], List[int], List[int]]:
+    """紐付けをother_idsの集合に置き換える
+
+    固定する側の行をロックしてから現在の紐付けと比べ、増えた分だけ挿入し減った分だけ削除する。
+    置き換え後の行 (既存の行はORMのオブジェクト、挿入した行はdict)、
+    追加した相手のid、削除した相手のidを返す。
+    """
+    wanted = list(dict.fromkeys(other_ids))
+    await db.execute(lock_owner(model, owner, owner_id))
+    result = await db.execute(select(model).where(getattr(model, owner) == owner_id))
+    current = {getattr(row, other): row for row in result.scalars()}
+    removed = await unlink_many(
+        db, model, owner, owner_id, other, [i for i in current if i not in wanted]
+    )
+    inserted = await link_many(
+        db, model, owner, owner_id, other, [i for i in wanted if i not in current]
+    )
+    kept = [current[i] for i in wanted if i in current]
+    return kept + inserted, [row[other] for row in inserted], removed
+
+
+def _entity(column: str) -> str:
+    # 外部キー列名 (例: "tourist_spot_id") -> キャッシュのエンティティ名 (例: "tourist_spot")
+    return column.removesuffix("_id")
+
+
+async def _invalidate_links(
+    owner: str, owner_id: int, other: str, other_ids: List[int]
+) -> None:
+    await invalidate(_entity(owner), owner_id)
+    await invalidate(_entity(other), *other_ids)
+
+
+async def create_links(
+    db: AsyncSession,
+    model,
+    schema,
+    owner: str,
+    owner_id: int,
+    other: str,
+    other_ids: Iterable[int],
+) -> List[Any]:
+    """紐付けをまとめて作成してコミットし、新しく作成した紐付けを返す (紐付け済みのものは無視)"""
+    logger.info("Linking %s %s to %s %s", other, other_ids, owner, owner_id)
+    try:
+        rows = await link_many(db, model, owner, owner_id, other, other_ids)
+        await db.commit()
+        await _invalidate_links(owner, owner_id, other, [row[other] for row in rows])
+        logger.info("Created %s links for %s %s", len(rows), owner, owner_id)
+        return [schema.model_validate(row) for row in rows]
+    except Exception as e:
+        await db.rollback()
+        logger.error("Error linking %s to %s %s. Error: %s", other, owner, owner_id, e)
+        raise
+
+
+async def delete_links(
+    db: AsyncSession,
+    model,
+    owner: str,
+    owner_id: int,
+    other: str,
+    other_ids: Iterable[int],
+) -> List[int]:
+    """紐付けをまとめて解除してコミットし、解除した相手のidを返す"""
+    logger.info("Unlinking %s %s from %s %s", other, other_ids, owner, owner_id)
+    try:
+        removed = await unlink_many(db, model, owner, owner_id, other, other_ids)
+        await db.commit()
+        await _invalidate_links(owner, owner_id, other, removed)
+        logger.info("Removed %s links for %s %s", len(removed), owner, owner_id)
+        return removed
+    except Exception as e:
+        await db.rollback()
+        logger.error(
+            "Error unlinking %s from %s %s. Error: %s", other, owner, owner_id, e
+        )
+        raise
+
+
+async def set_links(
+    db: AsyncSession,
+    model,
+    schema,
+    owner: str,
+    owner_id: int,
+    other: str,
+    other_ids: Iterable[int],
+) -> List[Any]:
+    """紐付けをother_idsの集合に置き換えてコミットし、置き換え後の紐付けを返す"""
+    logger.info(
+        "Replacing %s links of %s %s with %s", other, owner, owner_id, other_ids
+    )
+    try:
+        rows, added, removed = await replace_links(
+            db, model, owner, owner_id, other, other_ids
+        )
+        links = [schema.model_validate(row, from_attributes=True) for row in rows]
+        await db.commit()
+        await _invalidate_links(owner, owner_id, other, added + removed)
+        logger.info(
+            "Replaced links of %s %s: %s added, %s removed",
+            owner,
+            owner_id,
+            len(added),
+            len(removed),
+        )
+        return links
+    except Exception as e:
+        await db.rollback()
+        logger.error(
+            "Error replacing %s links of %s %s. Error: %s", other, owner, owner_id, e
+        )
+        raise
@@ -1,17 +1,20 @@
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_cultural_insight(db: AsyncSession, cultural_insight_id: int):
-    logger.info(f"Attempting to fetch cultural insight with ID: {cultural_insight_id}")
+    logger.info("Attempting to fetch cultural insight with ID: %s", cultural_insight_id)
     try:
         result = await db.execute(
             select(models.CulturalInsight).filter(
@@ -21,36 +24,46 @@ async def get_cultural_insight(db: AsyncSession, cultural_insight_id: int):
         cultural_insight = result.scalars().first()
         if cultural_insight:
             logger.info(
-                f"Successfully fetched cultural insight with ID: {cultural_insight_id}"
+                "Successfully fetched cultural insight with ID: %s", cultural_insight_id
             )
         else:
-            logger.warning(f"Cultural insight with ID: {cultural_insight_id} not found")
+            logger.warning(
+                "Cultural insight with ID: %s not found", cultural_insight_id
+            )
         return cultural_insight
     except Exception as e:
         logger.error(
-            f"Error fetching cultural insight with ID: {cultural_insight_id} - {e}"
+            "Error fetching cultural insight with ID: %s - %s", cultural_insight_id, e
         )
         raise
 
 
-async def get_cultural_insights(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_cultural_insights(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
     logger.info("Fetching cultural insights")
     try:
         result = await db.execute(
-            select(models.CulturalInsight).offset(skip).limit(limit)
+            paginate(
+                select(models.CulturalInsight),
+                models.CulturalInsight.id,
+                skip,
+                limit,
+                after,
+            )
         )
         cultural_insights = result.scalars().all()
         logger.info("Successfully fetched cultural insights")
         return cultural_insights
     except Exception as e:
-        logger.error(f"Error fetching cultural insights - {e}")
+        logger.error("Error fetching cultural insights - %s", e)
         raise
 
 
 async def create_cultural_insight(
     db: AsyncSession, cultural_insight: schemas.CulturalInsightCreate, article_id: int
 ):
-    logger.info(f"Creating a new cultural insight for article ID: {article_id}")
+    logger.info("Creating a new cultural insight for article ID: %s", article_id)
     try:
         db_cultural_insight = models.CulturalInsight(
             **cultural_insight.model_dump(),
@@ -73,74 +86,81 @@ async def update_cultural_insight(
     cultural_insight: schemas.CulturalInsightUpdate,
     cultural_insight_id: int,
 ):
-    logger.info(f"Updating cultural insight with ID: {cultural_insight_id}")
+    logger.info("Updating cultural insight with ID: %s", cultural_insight_id)
     try:
-        result = await db.execute(
-            select(models.CulturalInsight).filter(
-                models.CulturalInsight.id == cultural_insight_id
+        update_data = cultural_insight.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.now()
+        db_cultural_insight = await update_returning(
+            db, models.CulturalInsight, cultural_insight_id, update_data
+        )
+        if db_cultural_insight is None:
+            logger.warning(
+                "Cultural insight with ID: %s not found", cultural_insight_id
             )
+            return None
+        cultural_insight_out = schemas.CulturalInsight.model_validate(
+            db_cultural_insight, from_attributes=True
         )
-        db_cultural_insight = result.scalars().first()
-        if db_cultural_insight:
-            update_data = cultural_insight.model_dump(exclude_unset=True)
-            update_data["updated_at"] = datetime.now()
-            for key, value in update_data.items():
-                setattr(db_cultural_insight, key, value)
-            await db.commit()
-            await db.refresh(db_cultural_insight)
-            logger.info("Successfully updated cultural insight")
-        else:
-            logger.warning(f"Cultural insight with ID: {cultural_insight_id} not found")
-        return db_cultural_insight
+        await db.commit()
+        logger.info("Successfully updated cultural insight")
+        return cultural_insight_out
     except Exception as e:
         logger.error(
-            f"Error updating cultural insight with ID: {cultural_insight_id} - {e}"
+            "Error updating cultural insight with ID: %s - %s", cultural_insight_id, e
         )
         raise
 
 
 async def delete_cultural_insight(db: AsyncSession, cultural_insight_id: int) -> bool:
-    logger.info(f"Deleting cultural insight with ID: {cultural_insight_id}")
+    logger.info("Deleting cultural insight with ID: %s", cultural_insight_id)
     try:
-        result = await db.execute(
-            select(models.CulturalInsight).filter(
-                models.CulturalInsight.id == cultural_insight_id
-            )
+        deleted = await delete_returning(
+            db,
+            models.CulturalInsight,
+            models.CulturalInsight.id == cultural_insight_id,
         )
-        db_cultural_insight = result.scalars().first()
-        if db_cultural_insight:
-            await db.delete(db_cultural_insight)
-            await db.commit()
-            logger.info("Successfully deleted cultural insight")
-            return True
-        else:
-            logger.warning(f"Cultural insight with ID: {cultural_insight_id} not found")
+        if not deleted:
+            logger.warning(
+                "Cultural insight with ID: %s not found", cultural_insight_id
+            )
             return False
+        await db.commit()
+        logger.info("Successfully deleted cultural insight")
+        return True
     except Exception as e:
         logger.error(
-            f"Error deleting cultural insight with ID: {cultural_insight_id} - {e}"
+            "Error deleting cultural insight with ID: %s - %s", cultural_insight_id, e
         )
         raise
 
 
 async def get_cultural_insights_by_article(
-    db: AsyncSession, article_id: int, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    article_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
 ):
-    logger.info(f"Fetching cultural insights for article ID: {article_id}")
+    logger.info("Fetching cultural insights for article ID: %s", article_id)
     try:
         result = await db.execute(
-            select(models.CulturalInsight)
-            .filter(models.CulturalInsight.article_id == article_id)
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(models.CulturalInsight).filter(
+                    models.CulturalInsight.article_id == article_id
+                ),
+                models.CulturalInsight.id,
+                skip,
+                limit,
+                after,
+            )
         )
         cultural_insights = result.scalars().all()
         logger.info(
-            f"Successfully fetched cultural insights for article ID: {article_id}"
+            "Successfully fetched cultural insights for article ID: %s", article_id
         )
         return cultural_insights
     except Exception as e:
         logger.error(
-            f"Error fetching cultural insights for article ID: {article_id} - {e}"
+            "Error fetching cultural insights for article ID: %s - %s", article_id, e
         )
         raise
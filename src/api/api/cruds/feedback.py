@@ -1,36 +1,49 @@
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_feedback(db: AsyncSession, feedback_id: int):
-    logger.info(f"Fetching feedback with ID {feedback_id}")
+    logger.info("Fetching feedback with ID %s", feedback_id)
     try:
         result = await db.execute(
             select(models.Feedback).filter(models.Feedback.id == feedback_id)
         )
         feedback = result.scalars().first()
         if feedback:
-            logger.info(f"Successfully fetched feedback with ID {feedback_id}")
+            logger.info("Successfully fetched feedback with ID %s", feedback_id)
         else:
-            logger.warning(f"Feedback with ID {feedback_id} not found")
+            logger.warning("Feedback with ID %s not found", feedback_id)
         return feedback
     except Exception as e:
-        logger.error(f"Error fetching feedback with ID {feedback_id}: {e}")
+        logger.error("Error fetching feedback with ID %s: %s", feedback_id, e)
         raise
 
 
-async def get_feedbacks(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_feedbacks(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
     logger.info("Fetching list of feedbacks")
     try:
-        result = await db.execute(select(models.Feedback).offset(skip).limit(limit))
+        result = await db.execute(
+            paginate(
+                select(models.Feedback),
+                models.Feedback.id,
+                skip,
+                limit,
+                after,
+            )
+        )
         feedbacks = result.scalars().all()
         logger.info("Successfully fetched list of feedbacks")
         return feedbacks
@@ -43,7 +56,7 @@ async def create_feedback(
     db: AsyncSession, feedback: schemas.FeedbackCreate, user_id: int, article_id: int
 ):
     logger.info(
-        f"Creating new feedback for article ID {article_id} by user ID {user_id}"
+        "Creating new feedback for article ID %s by user ID %s", article_id, user_id
     )
     try:
         db_feedback = models.Feedback(
@@ -66,75 +79,93 @@ async def create_feedback(
 async def update_feedback(
     db: AsyncSession, feedback: schemas.FeedbackUpdate, feedback_id: int
 ):
-    logger.info(f"Updating feedback with ID {feedback_id}")
+    logger.info("Updating feedback with ID %s", feedback_id)
     try:
-        db_feedback = await get_feedback(db, feedback_id)
-        if db_feedback:
-            update_data = feedback.model_dump(exclude_unset=True)
-            update_data["updated_at"] = datetime.now()
-            for key, value in update_data.items():
-                setattr(db_feedback, key, value)
-            await db.commit()
-            await db.refresh(db_feedback)
-            logger.info(f"Successfully updated feedback with ID {feedback_id}")
-        else:
-            logger.warning(f"Feedback with ID {feedback_id} not found")
-        return db_feedback
+        update_data = feedback.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.now()
+        db_feedback = await update_returning(
+            db, models.Feedback, feedback_id, update_data
+        )
+        if db_feedback is None:
+            logger.warning("Feedback with ID %s not found", feedback_id)
+            return None
+        feedback_out = schemas.Feedback.model_validate(
+            db_feedback, from_attributes=True
+        )
+        await db.commit()
+        logger.info("Successfully updated feedback with ID %s", feedback_id)
+        return feedback_out
     except Exception as e:
-        logger.error(f"Error updating feedback with ID {feedback_id}: {e}")
+        logger.error("Error updating feedback with ID %s: %s", feedback_id, e)
         raise
 
 
 async def delete_feedback(db: AsyncSession, feedback_id: int) -> bool:
-    logger.info(f"Deleting feedback with ID {feedback_id}")
+    logger.info("Deleting feedback with ID %s", feedback_id)
     try:
-        db_feedback = await get_feedback(db, feedback_id)
-        if db_feedback:
-            await db.delete(db_feedback)
-            await db.commit()
-            logger.info(f"Successfully deleted feedback with ID {feedback_id}")
-            return True
-        else:
-            logger.warning(f"Feedback with ID {feedback_id} not found")
+        deleted = await delete_returning(
+            db, models.Feedback, models.Feedback.id == feedback_id
+        )
+        if not deleted:
+            logger.warning("Feedback with ID %s not found", feedback_id)
             return False
+        await db.commit()
+        logger.info("Successfully deleted feedback with ID %s", feedback_id)
+        return True
     except Exception as e:
-        logger.error(f"Error deleting feedback with ID {feedback_id}: {e}")
+        logger.error("Error deleting feedback with ID %s: %s", feedback_id, e)
         raise
 
 
 async def get_feedbacks_by_article(
-    db: AsyncSession, article_id: int, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    article_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
 ):
-    logger.info(f"Fetching feedbacks for article ID {article_id}")
+    logger.info("Fetching feedbacks for article ID %s", article_id)
     try:
         result = await db.execute(
-            select(models.Feedback)
-            .filter(models.Feedback.article_id == article_id)
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(models.Feedback).filter(
+                    models.Feedback.article_id == article_id
+                ),
+                models.Feedback.id,
+                skip,
+                limit,
+                after,
+            )
         )
         feedbacks = result.scalars().all()
-        logger.info(f"Successfully fetched feedbacks for article ID {article_id}")
+        logger.info("Successfully fetched feedbacks for article ID %s", article_id)
         return feedbacks
     except Exception as e:
-        logger.error(f"Error fetching feedbacks for article ID {article_id}: {e}")
+        logger.error("Error fetching feedbacks for article ID %s: %s", article_id, e)
         raise
 
 
 async def get_feedbacks_by_user(
-    db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
 ):
-    logger.info(f"Fetching feedbacks for user ID {user_id}")
+    logger.info("Fetching feedbacks for user ID %s", user_id)
     try:
         result = await db.execute(
-            select(models.Feedback)
-            .filter(models.Feedback.user_id == user_id)
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(models.Feedback).filter(models.Feedback.user_id == user_id),
+                models.Feedback.id,
+                skip,
+                limit,
+                after,
+            )
         )
         feedbacks = result.scalars().all()
-        logger.info(f"Successfully fetched feedbacks for user ID {user_id}")
+        logger.info("Successfully fetched feedbacks for user ID %s", user_id)
         return feedbacks
     except Exception as e:
-        logger.error(f"Error fetching feedbacks for user ID {user_id}: {e}")
+        logger.error("Error fetching feedbacks for user ID %s: %s", user_id, e)
         raise
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+import api.models as models
+import api.schemas as schemas
+from api.cache import CACHE_TTLS, get_cached
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+# 条件付きGETに対応するエンティティ -> (モデル, キャッシュに保存するスキーマ)
+LAST_MODIFIED_ENTITIES = {
+    "article": (models.Article, schemas.Article),
+    "tourist_spot": (models.TouristSpot, schemas.TouristSpot),
+    "restaurant": (models.Restaurant, schemas.Restaurant),
+    "translation": (models.Translation, schemas.Translation),
+}
+
+
+async def get_last_modified(
+    db: AsyncSession, entity: str, entity_id: int
+) -> Optional[datetime]:
+    """エンティティのupdated_atを返す (存在しない場合はNone)
+
+    キャッシュにあればその値を使い、無ければ updated_at 列だけをSELECTする。
+    行全体の読み込みとシリアライズを行わずに304を返すために使う。
+    """
+    logger.info("Fetching last modified time of %s with ID %s", entity, entity_id)
+    try:
+        model, schema = LAST_MODIFIED_ENTITIES[entity]
+        if entity in CACHE_TTLS:
+            cached = await get_cached(entity, entity_id, schema)
+            if cached:
+                return cached.updated_at
+        result = await db.execute(
+            select(model.updated_at).filter(model.id == entity_id)
+        )
+        return result.scalars().first()
+    except Exception as e:
+        logger.error(
+            "Error fetching last modified time of %s with ID %s: %s",
+            entity,
+            entity_id,
+            e,
+        )
+        raise
+
+
+async def get_article_status(db: AsyncSession, article_id: int) -> Optional[str]:
+    """記事のstatusを返す (存在しない場合はNone)
+
+    304のレスポンスにも200と同じCache-Controlを付けるために使う。
+    """
+    logger.info("Fetching status of article with ID %s", article_id)
+    try:
+        cached = await get_cached("article", article_id, schemas.Article)
+        if cached:
+            return cached.status
+        result = await db.execute(
+            select(models.Article.status).filter(models.Article.id == article_id)
+        )
+        return result.scalars().first()
+    except Exception as e:
+        logger.error("Error fetching status of article with ID %s: %s", article_id, e)
+        raise
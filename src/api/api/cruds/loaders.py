@@ -0,0 +1,30 @@
+"""リレーションの読み込み方をクエリごとに決めるためのローダーオプション
+
+モデルのリレーションは全てデフォルトの遅延読み込み(lazy="select")とし、
+一緒に読み込むリレーションはクエリごとにexpandで指定する。
+非同期セッションでは遅延読み込みができないため、レスポンスで使うリレーションは
+必ずloader_optionsで読み込むこと。
+"""
+
+from typing import List, Sequence
+
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.interfaces import ORMOption
+
+# ?expand= で指定できる記事のリレーション (schemas.ArticleOut のネストしたフィールド)
+ARTICLE_RELATIONS = (
+    "photos",
+    "translations",
+    "tourist_spots",
+    "restaurants",
+    "feedbacks",
+    "cultural_insights",
+)
+
+
+def loader_options(model, expand: Sequence[str] = ()) -> List[ORMOption]:
+    """expandで指定したリレーションをselectinloadするオプション
+
+    リレーションごとにクエリが1つ増えるだけなので、件数によらずクエリ数は一定になる。
+    """
+    return [selectinload(getattr(model, name)) for name in dict.fromkeys(expand)]
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -6,32 +7,44 @@ from fastapi import UploadFile
 
 import api.models as models
 import api.schemas as schemas
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_photo(db: AsyncSession, photo_id: int):
-    logger.info(f"Fetching photo with ID {photo_id}")
+    logger.info("Fetching photo with ID %s", photo_id)
     try:
         result = await db.execute(
             select(models.Photo).filter(models.Photo.id == photo_id)
         )
         photo = result.scalars().first()
         if photo:
-            logger.info(f"Successfully fetched photo with ID {photo_id}")
+            logger.info("Successfully fetched photo with ID %s", photo_id)
         else:
-            logger.warning(f"Photo with ID {photo_id} not found")
+            logger.warning("Photo with ID %s not found", photo_id)
         return photo
     except Exception as e:
-        logger.error(f"Error fetching photo with ID {photo_id}: {e}")
+        logger.error("Error fetching photo with ID %s: %s", photo_id, e)
         raise
 
 
-async def get_photos(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_photos(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
     logger.info("Fetching list of photos")
     try:
-        result = await db.execute(select(models.Photo).offset(skip).limit(limit))
+        result = await db.execute(
+            paginate(
+                select(models.Photo),
+                models.Photo.id,
+                skip,
+                limit,
+                after,
+            )
+        )
         photos = result.scalars().all()
         logger.info("Successfully fetched list of photos")
         return photos
@@ -41,7 +54,7 @@ async def get_photos(db: AsyncSession, skip: int = 0, limit: int = 100):
 
 
 async def create_photo(db: AsyncSession, photo: schemas.PhotoCreate, article_id: int):
-    logger.info(f"Creating a new photo for article ID {article_id}")
+    logger.info("Creating a new photo for article ID %s", article_id)
     try:
         db_photo = models.Photo(
             **photo.model_dump(),
@@ -52,7 +65,7 @@ async def create_photo(db: AsyncSession, photo: schemas.PhotoCreate, article_id:
         db.add(db_photo)
         await db.commit()
         await db.refresh(db_photo)
-        logger.info(f"Successfully created photo: {photo.file_path}")
+        logger.info("Successfully created photo: %s", photo.file_path)
         return db_photo
     except Exception as e:
         logger.error("Error creating photo: ", e)
@@ -60,58 +73,62 @@ async def create_photo(db: AsyncSession, photo: schemas.PhotoCreate, article_id:
 
 
 async def update_photo(db: AsyncSession, photo: schemas.PhotoUpdate, photo_id: int):
-    logger.info(f"Updating photo with ID {photo_id}")
+    logger.info("Updating photo with ID %s", photo_id)
     try:
-        db_photo = await get_photo(db, photo_id)
-        if db_photo:
-            update_data = {
-                **photo.model_dump(exclude_unset=True),
-                "updated_at": datetime.now(),
-            }
-            for key, value in update_data.items():
-                setattr(db_photo, key, value)
-            db_photo.file_path = photo.file_path
-            db_photo.description = photo.description
-            await db.commit()
-            await db.refresh(db_photo)
-            logger.info(f"Successfully updated photo with ID {photo_id}")
-        else:
-            logger.warning(f"Photo with ID {photo_id} not found")
-        return db_photo
+        update_data = {
+            **photo.model_dump(exclude_unset=True),
+            "updated_at": datetime.now(),
+        }
+        db_photo = await update_returning(db, models.Photo, photo_id, update_data)
+        if db_photo is None:
+            logger.warning("Photo with ID %s not found", photo_id)
+            return None
+        photo_out = schemas.Photo.model_validate(db_photo, from_attributes=True)
+        await db.commit()
+        logger.info("Successfully updated photo with ID %s", photo_id)
+        return photo_out
     except Exception as e:
-        logger.error(f"Error updating photo with ID {photo_id}: {e}")
+        logger.error("Error updating photo with ID %s: %s", photo_id, e)
         raise
 
 
-async def delete_photo(db: AsyncSession, photo_id: int):
-    logger.info(f"Deleting photo with ID {photo_id}")
+async def delete_photo(db: AsyncSession, photo_id: int) -> Optional[schemas.Photo]:
+    logger.info("Deleting photo with ID %s", photo_id)
     try:
-        db_photo = await get_photo(db, photo_id)
-        if db_photo:
-            await db.delete(db_photo)
-            await db.commit()
-            logger.info(f"Successfully deleted photo with ID {photo_id}")
-        else:
-            logger.warning(f"Photo with ID {photo_id} not found")
+        deleted = await delete_returning(db, models.Photo, models.Photo.id == photo_id)
+        if not deleted:
+            logger.warning("Photo with ID %s not found", photo_id)
+            return None
+        photo = schemas.Photo.model_validate(deleted[0], from_attributes=True)
+        await db.commit()
+        logger.info("Successfully deleted photo with ID %s", photo_id)
+        return photo
     except Exception as e:
-        logger.error(f"Error deleting photo with ID {photo_id}: {e}")
+        logger.error("Error deleting photo with ID %s: %s", photo_id, e)
         raise
 
 
 async def get_photos_by_article(
-    db: AsyncSession, article_id: int, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    article_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
 ):
-    logger.info(f"Fetching photos for article ID {article_id}")
+    logger.info("Fetching photos for article ID %s", article_id)
     try:
         result = await db.execute(
-            select(models.Photo)
-            .filter(models.Photo.article_id == article_id)
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(models.Photo).filter(models.Photo.article_id == article_id),
+                models.Photo.id,
+                skip,
+                limit,
+                after,
+            )
         )
         photos = result.scalars().all()
-        logger.info(f"Successfully fetched photos for article ID {article_id}")
+        logger.info("Successfully fetched photos for article ID %s", article_id)
         return photos
     except Exception as e:
-        logger.error(f"Error fetching photos for article ID {article_id}: {e}")
+        logger.error("Error fetching photos for article ID %s: %s", article_id, e)
         raise
@@ -1,34 +1,60 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.bulk import insert_rows, validate_rows
+from api.cache import get_cached, invalidate, set_cached
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
+from api.text_search import FuzzySearchMode, set_similarity_threshold, trigram_clauses
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_restaurant(db: AsyncSession, restaurant_id: int):
-    logger.info(f"Fetching restaurant with ID {restaurant_id}")
+    logger.info("Fetching restaurant with ID %s", restaurant_id)
     try:
+        restaurant = await get_cached("restaurant", restaurant_id, schemas.Restaurant)
+        if restaurant:
+            logger.info("Fetched restaurant with ID %s from cache", restaurant_id)
+            return restaurant
         result = await db.execute(
             select(models.Restaurant).filter(models.Restaurant.id == restaurant_id)
         )
         restaurant = result.scalars().first()
         if restaurant:
-            logger.info(f"Successfully fetched restaurant with ID {restaurant_id}")
+            restaurant = schemas.Restaurant.model_validate(
+                restaurant, from_attributes=True
+            )
+            await set_cached("restaurant", restaurant_id, restaurant, db)
+            logger.info("Successfully fetched restaurant with ID %s", restaurant_id)
         else:
-            logger.warning(f"Restaurant with ID {restaurant_id} not found")
+            logger.warning("Restaurant with ID %s not found", restaurant_id)
         return restaurant
     except Exception as e:
-        logger.error(f"Error fetching restaurant with ID {restaurant_id}: {e}")
+        logger.error("Error fetching restaurant with ID %s: %s", restaurant_id, e)
         raise
 
 
-async def get_restaurants(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_restaurants(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
     logger.info("Fetching list of restaurants")
     try:
-        result = await db.execute(select(models.Restaurant).offset(skip).limit(limit))
+        result = await db.execute(
+            paginate(
+                select(models.Restaurant),
+                models.Restaurant.id,
+                skip,
+                limit,
+                after,
+            )
+        )
         restaurants = result.scalars().all()
         logger.info("Successfully fetched list of restaurants")
         return restaurants
@@ -46,67 +72,119 @@ async def create_restaurant(db: AsyncSession, restaurant: schemas.RestaurantCrea
         db.add(db_restaurant)
         await db.commit()
         await db.refresh(db_restaurant)
-        logger.info(f"Successfully created restaurant: {db_restaurant.name}")
+        logger.info("Successfully created restaurant: %s", db_restaurant.name)
         return db_restaurant
     except Exception as e:
         logger.error("Error creating restaurant: ", e)
         raise
 
 
+async def create_restaurants_bulk(db: AsyncSession, rows: List[Dict[str, Any]]):
+    logger.info("Bulk creating %s restaurants", len(rows))
+    try:
+        valid, errors = validate_rows(rows, schemas.RestaurantCreate)
+        created = await insert_rows(
+            db, models.Restaurant, [restaurant.model_dump() for _, restaurant in valid]
+        )
+        await db.commit()
+        logger.info(
+            "Bulk created %s restaurants (%s rejected)", len(created), len(errors)
+        )
+        return schemas.BulkCreateResult[schemas.Restaurant](
+            created=[schemas.Restaurant(**row) for row in created], errors=errors
+        )
+    except Exception as e:
+        logger.error("Error bulk creating restaurants: %s", e)
+        raise
+
+
 async def update_restaurant(
     db: AsyncSession, restaurant: schemas.RestaurantUpdate, restaurant_id: int
 ):
-    logger.info(f"Updating restaurant with ID {restaurant_id}")
+    logger.info("Updating restaurant with ID %s", restaurant_id)
     try:
-        db_restaurant = await get_restaurant(db, restaurant_id)
-        if db_restaurant:
-            update_data = restaurant.model_dump(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(db_restaurant, key, value)
-            await db.commit()
-            await db.refresh(db_restaurant)
-            logger.info(f"Successfully updated restaurant with ID {restaurant_id}")
-        else:
-            logger.warning(f"Restaurant with ID {restaurant_id} not found")
-        return db_restaurant
+        update_data = restaurant.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.now()
+        db_restaurant = await update_returning(
+            db, models.Restaurant, restaurant_id, update_data
+        )
+        if db_restaurant is None:
+            logger.warning("Restaurant with ID %s not found", restaurant_id)
+            return None
+        restaurant_out = schemas.Restaurant.model_validate(
+            db_restaurant, from_attributes=True
+        )
+        await db.commit()
+        await invalidate("restaurant", restaurant_id)
+        logger.info("Successfully updated restaurant with ID %s", restaurant_id)
+        return restaurant_out
     except Exception as e:
-        logger.error(f"Error updating restaurant with ID {restaurant_id}: {e}")
+        logger.error("Error updating restaurant with ID %s: %s", restaurant_id, e)
         raise
 
 
-async def delete_restaurant(db: AsyncSession, restaurant_id: int):
-    logger.info(f"Deleting restaurant with ID {restaurant_id}")
+async def delete_restaurant(
+    db: AsyncSession, restaurant_id: int
+) -> Optional[schemas.Restaurant]:
+    logger.info("Deleting restaurant with ID %s", restaurant_id)
     try:
-        db_restaurant = await get_restaurant(db, restaurant_id)
-        if db_restaurant:
-            await db.delete(db_restaurant)
-            await db.commit()
-            logger.info(f"Successfully deleted restaurant with ID {restaurant_id}")
-        else:
-            logger.warning(f"Restaurant with ID {restaurant_id} not found")
+        deleted = await delete_returning(
+            db, models.Restaurant, models.Restaurant.id == restaurant_id
+        )
+        if not deleted:
+            logger.warning("Restaurant with ID %s not found", restaurant_id)
+            return None
+        restaurant = schemas.Restaurant.model_validate(deleted[0], from_attributes=True)
+        await db.commit()
+        await invalidate("restaurant", restaurant_id)
+        logger.info("Successfully deleted restaurant with ID %s", restaurant_id)
+        return restaurant
     except Exception as e:
-        logger.error(f"Error deleting restaurant with ID {restaurant_id}: {e}")
+        logger.error("Error deleting restaurant with ID %s: %s", restaurant_id, e)
         raise
 
 
 async def search_restaurants(
-    db: AsyncSession, keyword: str, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    keyword: str,
+    skip: int = 0,
+    limit: int = 100,
+    mode: FuzzySearchMode = FuzzySearchMode.contains,
+    threshold: Optional[float] = None,
 ):
-    logger.info(f"Searching for restaurants with keyword '{keyword}'")
+    logger.info(
+        "Searching for restaurants with keyword '%s' (mode: %s)", keyword, mode.value
+    )
     try:
-        result = await db.execute(
-            select(models.Restaurant)
-            .filter(
+        stmt = select(models.Restaurant)
+        if mode == FuzzySearchMode.trigram:
+            await set_similarity_threshold(db, threshold)
+            where, rank = trigram_clauses(
+                db,
+                (
+                    models.Restaurant.name,
+                    models.Restaurant.location,
+                    models.Restaurant.cuisine,
+                ),
+                keyword,
+            )
+            stmt = stmt.filter(where)
+            if rank is not None:
+                stmt = stmt.order_by(rank)
+        else:
+            stmt = stmt.filter(
                 models.Restaurant.name.contains(keyword)
                 | models.Restaurant.location.contains(keyword)
                 | models.Restaurant.cuisine.contains(keyword)
             )
-            .offset(skip)
-            .limit(limit)
+        result = await db.execute(
+            stmt.order_by(models.Restaurant.id).offset(skip).limit(limit)
         )
         restaurants = result.scalars().all()
-        logger.info(f"Found restaurants with keyword '{keyword}'")
+        logger.info("Found restaurants with keyword '%s'", keyword)
         return restaurants
     except Exception as e:
-        logger.error(f"Error searching for restaurants with keyword '{keyword}': {e}")
+        logger.error(
+            "Error searching for restaurants with keyword '%s': %s", keyword, e
+        )
         raise
@@ -0,0 +1,29 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def update_returning(
+    db: AsyncSession, model, row_id: int, values: Dict[str, Any]
+) -> Optional[Any]:
+    """UPDATE ... RETURNING で1行を更新し、更新後の行を返す (存在しない場合はNone)
+
+    事前のSELECTやコミット後のrefreshを行わないため、更新は1往復で済む。
+    ORMのイベント(before_updateなど)は発火しないため、イベントで設定する列は
+    呼び出し側でvaluesに含めること。コミットは呼び出し側で行う。
+    """
+    result = await db.execute(
+        update(model).where(model.id == row_id).values(**values).returning(model)
+    )
+    return result.scalars().first()
+
+
+async def delete_returning(db: AsyncSession, model, *criteria) -> List[Any]:
+    """DELETE ... RETURNING で条件に一致する行を削除し、削除した行を返す
+
+    行をセッションに読み込まずに1文で削除する。子の行はDBの外部キー
+    (ON DELETE CASCADE / SET NULL)で処理される。コミットは呼び出し側で行う。
+    """
+    result = await db.execute(delete(model).where(*criteria).returning(model))
+    return list(result.scalars())
@@ -1,38 +1,65 @@
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.bulk import insert_rows, validate_rows
+from api.cache import get_cached, invalidate, set_cached
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
+from api.text_search import FuzzySearchMode, set_similarity_threshold, trigram_clauses
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_tourist_spot(db: AsyncSession, tourist_spot_id: int):
-    logger.info(f"Fetching tourist spot with ID {tourist_spot_id}")
+    logger.info("Fetching tourist spot with ID %s", tourist_spot_id)
     try:
+        tourist_spot = await get_cached(
+            "tourist_spot", tourist_spot_id, schemas.TouristSpot
+        )
+        if tourist_spot:
+            logger.info("Fetched tourist spot with ID %s from cache", tourist_spot_id)
+            return tourist_spot
         result = await db.execute(
             select(models.TouristSpot).filter(models.TouristSpot.id == tourist_spot_id)
         )
         tourist_spot = result.scalars().first()
-        logger.info(f"Successfully fetched tourist spot with ID {tourist_spot_id}")
+        if tourist_spot:
+            tourist_spot = schemas.TouristSpot.model_validate(
+                tourist_spot, from_attributes=True
+            )
+            await set_cached("tourist_spot", tourist_spot_id, tourist_spot, db)
+        logger.info("Successfully fetched tourist spot with ID %s", tourist_spot_id)
         return tourist_spot
     except Exception as e:
-        logger.error(f"Error fetching tourist spot with ID {tourist_spot_id}: {e}")
+        logger.error("Error fetching tourist spot with ID %s: %s", tourist_spot_id, e)
         raise
 
 
-async def get_tourist_spots(db: AsyncSession, skip: int = 0, limit: int = 100):
+async def get_tourist_spots(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
     logger.info("Fetching tourist spots")
     try:
-        result = await db.execute(select(models.TouristSpot).offset(skip).limit(limit))
+        result = await db.execute(
+            paginate(
+                select(models.TouristSpot),
+                models.TouristSpot.id,
+                skip,
+                limit,
+                after,
+            )
+        )
         tourist_spots = result.scalars().all()
         logger.info("Successfully fetched tourist spots")
         return tourist_spots
     except Exception as e:
-        logger.error(f"Error fetching tourist spots: {e}")
+        logger.error("Error fetching tourist spots: %s", e)
         raise
 
 
@@ -52,67 +79,113 @@ async def create_tourist_spot(
         logger.info("Successfully created a new tourist spot")
         return db_tourist_spot
     except Exception as e:
-        logger.error(f"Error creating tourist spot: {e}")
+        logger.error("Error creating tourist spot: %s", e)
+        raise
+
+
+async def create_tourist_spots_bulk(db: AsyncSession, rows: List[Dict[str, Any]]):
+    logger.info("Bulk creating %s tourist spots", len(rows))
+    try:
+        valid, errors = validate_rows(rows, schemas.TouristSpotCreate)
+        created = await insert_rows(
+            db, models.TouristSpot, [spot.model_dump() for _, spot in valid]
+        )
+        await db.commit()
+        logger.info(
+            "Bulk created %s tourist spots (%s rejected)", len(created), len(errors)
+        )
+        return schemas.BulkCreateResult[schemas.TouristSpot](
+            created=[schemas.TouristSpot(**row) for row in created], errors=errors
+        )
+    except Exception as e:
+        logger.error("Error bulk creating tourist spots: %s", e)
         raise
 
 
 async def update_tourist_spot(
     db: AsyncSession, tourist_spot: schemas.TouristSpotUpdate, tourist_spot_id: int
 ):
-    logger.info(f"Updating tourist spot with ID {tourist_spot_id}")
+    logger.info("Updating tourist spot with ID %s", tourist_spot_id)
     try:
-        db_tourist_spot = await get_tourist_spot(db, tourist_spot_id)
-        if db_tourist_spot:
-            update_data = tourist_spot.model_dump(exclude_unset=True)
-            update_data["updated_at"] = datetime.now()
-            for key, value in update_data.items():
-                setattr(db_tourist_spot, key, value)
-            await db.commit()
-            await db.refresh(db_tourist_spot)
-            logger.info(f"Successfully updated tourist spot with ID {tourist_spot_id}")
-            return db_tourist_spot
-        else:
-            logger.warning(f"Tourist spot with ID {tourist_spot_id} not found")
+        update_data = tourist_spot.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.now()
+        db_tourist_spot = await update_returning(
+            db, models.TouristSpot, tourist_spot_id, update_data
+        )
+        if db_tourist_spot is None:
+            logger.warning("Tourist spot with ID %s not found", tourist_spot_id)
+            return None
+        tourist_spot_out = schemas.TouristSpot.model_validate(
+            db_tourist_spot, from_attributes=True
+        )
+        await db.commit()
+        await invalidate("tourist_spot", tourist_spot_id)
+        logger.info("Successfully updated tourist spot with ID %s", tourist_spot_id)
+        return tourist_spot_out
     except Exception as e:
-        logger.error(f"Error updating tourist spot with ID {tourist_spot_id}: {e}")
+        logger.error("Error updating tourist spot with ID %s: %s", tourist_spot_id, e)
         raise
 
 
 async def delete_tourist_spot(db: AsyncSession, tourist_spot_id: int) -> bool:
-    logger.info(f"Deleting tourist spot with ID {tourist_spot_id}")
+    logger.info("Deleting tourist spot with ID %s", tourist_spot_id)
     try:
-        db_tourist_spot = await get_tourist_spot(db, tourist_spot_id)
-        if db_tourist_spot:
-            await db.delete(db_tourist_spot)
-            await db.commit()
-            logger.info(f"Successfully deleted tourist spot with ID {tourist_spot_id}")
-            return True
-        else:
-            logger.warning(f"Tourist spot with ID {tourist_spot_id} not found")
+        deleted = await delete_returning(
+            db, models.TouristSpot, models.TouristSpot.id == tourist_spot_id
+        )
+        if not deleted:
+            logger.warning("Tourist spot with ID %s not found", tourist_spot_id)
             return False
+        await db.commit()
+        await invalidate("tourist_spot", tourist_spot_id)
+        logger.info("Successfully deleted tourist spot with ID %s", tourist_spot_id)
+        return True
     except Exception as e:
-        logger.error(f"Error deleting tourist spot with ID {tourist_spot_id}: {e}")
+        logger.error("Error deleting tourist spot with ID %s: %s", tourist_spot_id, e)
         raise
 
 
 async def search_tourist_spots(
-    db: AsyncSession, keyword: str, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    keyword: str,
+    skip: int = 0,
+    limit: int = 100,
+    mode: FuzzySearchMode = FuzzySearchMode.contains,
+    threshold: Optional[float] = None,
 ):
-    logger.info(f"Searching for tourist spots with keyword '{keyword}'")
+    logger.info(
+        "Searching for tourist spots with keyword '%s' (mode: %s)", keyword, mode.value
+    )
     try:
-        result = await db.execute(
-            select(models.TouristSpot)
-            .filter(
+        stmt = select(models.TouristSpot)
+        if mode == FuzzySearchMode.trigram:
+            await set_similarity_threshold(db, threshold)
+            where, rank = trigram_clauses(
+                db,
+                (
+                    models.TouristSpot.name,
+                    models.TouristSpot.location,
+                    models.TouristSpot.description,
+                ),
+                keyword,
+            )
+            stmt = stmt.filter(where)
+            if rank is not None:
+                stmt = stmt.order_by(rank)
+        else:
+            stmt = stmt.filter(
                 models.TouristSpot.name.contains(keyword)
                 | models.TouristSpot.location.contains(keyword)
                 | models.TouristSpot.description.contains(keyword)
             )
-            .offset(skip)
-            .limit(limit)
+        result = await db.execute(
+            stmt.order_by(models.TouristSpot.id).offset(skip).limit(limit)
         )
         tourist_spots = result.scalars().all()
-        logger.info(f"Found tourist spots with keyword '{keyword}'")
+        logger.info("Found tourist spots with keyword '%s'", keyword)
         return tourist_spots
     except Exception as e:
-        logger.error(f"Error searching for tourist spots with keyword '{keyword}': {e}")
+        logger.error(
+            "Error searching for tourist spots with keyword '%s': %s", keyword, e
+        )
         raise
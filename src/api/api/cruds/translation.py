@@ -1,47 +1,60 @@
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
 
 async def get_translation(db: AsyncSession, translation_id: int):
-    logger.info(f"Fetching translation with ID {translation_id}")
+    logger.info("Fetching translation with ID %s", translation_id)
     try:
         result = await db.execute(
             select(models.Translation).filter(models.Translation.id == translation_id)
         )
         translation = result.scalars().first()
-        logger.info(f"Successfully fetched translation with ID {translation_id}")
+        logger.info("Successfully fetched translation with ID %s", translation_id)
         return translation
     except Exception as e:
-        logger.error(f"Error fetching translation with ID {translation_id}: {e}")
+        logger.error("Error fetching translation with ID %s: %s", translation_id, e)
         raise
 
 
-async def get_translations(db: AsyncSession, skip: int = 0, limit: int = 100):
-    logger.info(f"Fetching translations with skip {skip} and limit {limit}")
+async def get_translations(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
+    logger.info("Fetching translations with skip %s and limit %s", skip, limit)
     try:
-        result = await db.execute(select(models.Translation).offset(skip).limit(limit))
+        result = await db.execute(
+            paginate(
+                select(models.Translation),
+                models.Translation.id,
+                skip,
+                limit,
+                after,
+            )
+        )
         translations = result.scalars().all()
         logger.info(
-            f"Successfully fetched translations with skip {skip} and limit {limit}"
+            "Successfully fetched translations with skip %s and limit %s", skip, limit
         )
         return translations
     except Exception as e:
-        logger.error(f"Error fetching translations: {e}")
+        logger.error("Error fetching translations: %s", e)
         raise
 
 
 async def create_translation(
     db: AsyncSession, translation: schemas.TranslationCreate, article_id: int
 ):
-    logger.info(f"Creating translation for article ID {article_id}")
+    logger.info("Creating translation for article ID %s", article_id)
     try:
         db_translation = models.Translation(
             **translation.model_dump(),
@@ -52,67 +65,78 @@ async def create_translation(
         db.add(db_translation)
         await db.commit()
         await db.refresh(db_translation)
-        logger.info(f"Successfully created translation for article ID {article_id}")
+        logger.info("Successfully created translation for article ID %s", article_id)
         return schemas.Translation(**db_translation.__dict__)
     except Exception as e:
-        logger.error(f"Error creating translation for article ID {article_id}: {e}")
+        logger.error("Error creating translation for article ID %s: %s", article_id, e)
         raise
 
 
 async def update_translation(
     db: AsyncSession, translation: schemas.TranslationUpdate, translation_id: int
 ):
-    logger.info(f"Updating translation with ID {translation_id}")
+    logger.info("Updating translation with ID %s", translation_id)
     try:
-        db_translation = await get_translation(db, translation_id)
-        if db_translation:
-            update_data = translation.model_dump(exclude_unset=True)
-            update_data["updated_at"] = datetime.now()
-            for key, value in update_data.items():
-                setattr(db_translation, key, value)
-            await db.commit()
-            await db.refresh(db_translation)
-            logger.info(f"Successfully updated translation with ID {translation_id}")
-            return db_translation
-        else:
-            logger.warning(f"Translation with ID {translation_id} not found")
+        update_data = translation.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.now()
+        db_translation = await update_returning(
+            db, models.Translation, translation_id, update_data
+        )
+        if db_translation is None:
+            logger.warning("Translation with ID %s not found", translation_id)
+            return None
+        translation_out = schemas.Translation.model_validate(
+            db_translation, from_attributes=True
+        )
+        await db.commit()
+        logger.info("Successfully updated translation with ID %s", translation_id)
+        return translation_out
     except Exception as e:
-        logger.error(f"Error updating translation with ID {translation_id}: {e}")
+        logger.error("Error updating translation with ID %s: %s", translation_id, e)
         raise
 
 
 async def delete_translation(db: AsyncSession, translation_id: int) -> bool:
-    logger.info(f"Deleting translation with ID {translation_id}")
+    logger.info("Deleting translation with ID %s", translation_id)
     try:
-        db_translation = await get_translation(db, translation_id)
-        if db_translation:
-            await db.delete(db_translation)
-            await db.commit()
-            logger.info(f"Successfully deleted translation with ID {translation_id}")
-            return True
-        else:
-            logger.warning(f"Translation with ID {translation_id} not found")
+        deleted = await delete_returning(
+            db, models.Translation, models.Translation.id == translation_id
+        )
+        if not deleted:
+            logger.warning("Translation with ID %s not found", translation_id)
             return False
+        await db.commit()
+        logger.info("Successfully deleted translation with ID %s", translation_id)
+        return True
     except Exception as e:
-        logger.error(f"Error deleting translation with ID {translation_id}: {e}")
+        logger.error("Error deleting translation with ID %s: %s", translation_id, e)
         raise
 
 
 async def get_translations_by_article(
-    db: AsyncSession, article_id: int, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    article_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
 ):
-    logger.info(f"Fetching translations for article ID {article_id}")
+    logger.info("Fetching translations for article ID %s", article_id)
     try:
         result = await db.execute(
-            select(models.Translation)
-            .filter(models.Translation.article_id == article_id)
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(models.Translation).filter(
+                    models.Translation.article_id == article_id
+                ),
+                models.Translation.id,
+                skip,
+                limit,
+                after,
+            )
         )
-        logger.info(f"Successfully fetched translations for article ID {article_id}")
+        logger.info("Successfully fetched translations for article ID %s", article_id)
         return result.scalars().all()
     except Exception as e:
-        logger.error(f"Error fetching translations for article ID {article_id}: {e}")
+        logger.error("Error fetching translations for article ID %s: %s", article_id, e)
         raise
 
 
@@ -120,7 +144,7 @@ async def get_translation_by_article_and_language(
     db: AsyncSession, article_id: int, language: str
 ):
     logger.info(
-        f"Fetching translation for article ID {article_id} and language {language}"
+        "Fetching translation for article ID %s and language %s", article_id, language
     )
     try:
         result = await db.execute(
@@ -130,11 +154,16 @@ async def get_translation_by_article_and_language(
             )
         )
         logger.info(
-            f"Successfully fetched translation for article ID {article_id} and language {language}"
+            "Successfully fetched translation for article ID %s and language %s",
+            article_id,
+            language,
         )
         return result.scalars().first()
     except Exception as e:
         logger.error(
-            f"Error fetching translation for article ID {article_id} and language {language}: {e}"
+            "Error fetching translation for article ID %s and language %s: %s",
+            article_id,
+            language,
+            e,
         )
         raise
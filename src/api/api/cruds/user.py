@@ -1,58 +1,70 @@
 from datetime import datetime
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import api.models as models
 import api.schemas as schemas
-from api.security import get_password_hash
+from api.security.password import get_password_hash_async
+from api.security.token_store import TokenStoreUnavailable, bump_token_version
+from api.security.user_cache import invalidate_user
+from api.cruds.returning import delete_returning, update_returning
+from api.pagination import paginate
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
 
+# 変更するとアクセストークンのクレームと食い違う、または再認証が必要になる列
+TOKEN_CLAIM_FIELDS = frozenset({"role", "email", "hashed_password"})
+
 
 # ユーザーをIDで取得
 async def get_user(db: AsyncSession, user_id: int):
-    logger.info(f"Fetching user with ID {user_id}")
+    logger.info("Fetching user with ID %s", user_id)
     try:
         result = await db.execute(select(models.User).filter(models.User.id == user_id))
-        logger.info(f"Successfully fetched user with ID {user_id}")
+        logger.info("Successfully fetched user with ID %s", user_id)
         return result.scalars().first()
     except Exception as e:
-        logger.error(f"Error in get_user: {e}")
+        logger.error("Error in get_user: %s", e)
         return None
 
 
 # ユーザーをEメールで取得
 async def get_user_by_email(db: AsyncSession, email: str):
-    logger.info(f"Fetching user with email {email}")
+    logger.info("Fetching user with email %s", email)
     try:
         result = await db.execute(
             select(models.User).filter(models.User.email == email)
         )
-        logger.info(f"Successfully fetched user with email {email}")
+        logger.info("Successfully fetched user with email %s", email)
         return result.scalars().first()
     except Exception as e:
-        logger.error(f"Error in get_user_by_email: {e}")
+        logger.error("Error in get_user_by_email: %s", e)
         return None
 
 
 # 複数のユーザーを取得
-async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
-    logger.info(f"Fetching users with skip {skip} and limit {limit}")
+async def get_users(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
+    logger.info("Fetching users with skip %s and limit %s", skip, limit)
     try:
-        result = await db.execute(select(models.User).offset(skip).limit(limit))
-        logger.info(f"Successfully fetched users with skip {skip} and limit {limit}")
+        result = await db.execute(
+            paginate(select(models.User), models.User.id, skip, limit, after)
+        )
+        logger.info("Successfully fetched users with skip %s and limit %s", skip, limit)
         return result.scalars().all()
     except Exception as e:
-        logger.error(f"Error in get_users: {e}")
+        logger.error("Error in get_users: %s", e)
         return []
 
 
 # ユーザーの作成
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    logger.info(f"Creating user with username {user.username}")
+    logger.info("Creating user with username %s", user.username)
     try:
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await get_password_hash_async(user.password)
         db_user = models.User(
             username=user.username,
             email=user.email,
@@ -64,70 +76,99 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
         db.add(db_user)
         await db.commit()
         await db.refresh(db_user)
-        logger.info(f"Successfully created user with username {user.username}")
+        logger.info("Successfully created user with username %s", user.username)
         return schemas.User(**db_user.__dict__)
     except Exception as e:
-        logger.error(f"Error in create_user: {e}")
+        logger.error("Error in create_user: %s", e)
         return None
 
 
+async def _bump_token_version_after_commit(user_id: int) -> None:
+    """コミット前に増やしてからコミットするまでの間に発行されたトークンも無効にする"""
+    try:
+        await bump_token_version(user_id)
+    except TokenStoreUnavailable as e:
+        # コミット前に一度増やしているため、変更前に発行されたトークンは既に無効
+        logger.error(
+            "Could not bump token version of user %s after commit: %s", user_id, e
+        )
+
+
 # ユーザー情報の更新
 async def update_user(db: AsyncSession, user: schemas.UserUpdate, user_id: int):
-    logger.info(f"Updating user with ID {user_id}")
+    logger.info("Updating user with ID %s", user_id)
     try:
-        db_user = await get_user(db, user_id)
-        if db_user:
-            update_data = user.model_dump(exclude_unset=True)
-            if "password" in update_data:
-                update_data["hashed_password"] = get_password_hash(
-                    update_data["password"]
-                )
-                del update_data["password"]
-            update_data["updated_at"] = datetime.now()
-            for key, value in update_data.items():
-                setattr(db_user, key, value)
-            await db.commit()
-            await db.refresh(db_user)
-            logger.info(f"Successfully updated user with ID {user_id}")
-        else:
-            logger.warning(f"User with ID {user_id} not found")
-        return db_user
+        update_data = user.model_dump(exclude_unset=True)
+        if "password" in update_data:
+            update_data["hashed_password"] = await get_password_hash_async(
+                update_data["password"]
+            )
+            del update_data["password"]
+        update_data["updated_at"] = datetime.now()
+        db_user = await update_returning(db, models.User, user_id, update_data)
+        if db_user is None:
+            logger.warning("User with ID %s not found", user_id)
+            return None
+        user_out = schemas.User.model_validate(db_user, from_attributes=True)
+        # ロール・パスワード・emailを変えた場合は発行済みのトークンを無効にする。
+        # トークンストアに接続できない場合は、古いトークンが残らないよう更新しない
+        revokes_tokens = bool(TOKEN_CLAIM_FIELDS & update_data.keys())
+        if revokes_tokens:
+            await bump_token_version(user_id)
+        await db.commit()
     except Exception as e:
-        logger.error(f"Error in update_user: {e}")
-        return None
+        await db.rollback()
+        logger.error("Error in update_user: %s", e)
+        raise
+    await invalidate_user(user_id)
+    if revokes_tokens:
+        await _bump_token_version_after_commit(user_id)
+    logger.info("Successfully updated user with ID %s", user_id)
+    return user_out
 
 
 # ユーザーの削除
 async def delete_user(db: AsyncSession, user_id: int):
-    logger.info(f"Deleting user with ID {user_id}")
+    logger.info("Deleting user with ID %s", user_id)
     try:
-        db_user = await get_user(db, user_id)
-        if db_user:
-            await db.delete(db_user)
-            await db.commit()
-            logger.info(f"Successfully deleted user with ID {user_id}")
-        else:
-            logger.warning(f"User with ID {user_id} not found")
-        return db_user
+        deleted = await delete_returning(db, models.User, models.User.id == user_id)
+        if not deleted:
+            logger.warning("User with ID %s not found", user_id)
+            return None
+        user = schemas.User.model_validate(deleted[0], from_attributes=True)
+        await bump_token_version(user_id)
+        await db.commit()
     except Exception as e:
-        logger.error(f"Error in delete_user: {e}")
-        return None
+        await db.rollback()
+        logger.error("Error in delete_user: %s", e)
+        raise
+    await invalidate_user(user_id)
+    await _bump_token_version_after_commit(user_id)
+    logger.info("Successfully deleted user with ID %s", user_id)
+    return user
 
 
 # 特定ユーザーの記事を取得
 async def get_articles_by_user(
-    db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
 ):
-    logger.info(f"Fetching articles by user with ID {user_id}")
+    logger.info("Fetching articles by user with ID %s", user_id)
     try:
         result = await db.execute(
-            select(models.Article)
-            .filter(models.Article.author_id == user_id)
-            .offset(skip)
-            .limit(limit)
+            paginate(
+                select(models.Article).filter(models.Article.author_id == user_id),
+                models.Article.id,
+                skip,
+                limit,
+                after,
+            )
         )
-        logger.info(f"Successfully fetched articles by user with ID {user_id}")
+        logger.info("Successfully fetched articles by user with ID %s", user_id)
         return result.scalars().all()
     except Exception as e:
-        logger.error(f"Error in get_articles_by_user: {e}")
+        logger.error("Error in get_articles_by_user: %s", e)
         return []
@@ -1,4 +1,9 @@
-from sqlalchemy import create_engine, text
+import time
+from functools import lru_cache
+
+from fastapi import Request, Response
+from sqlalchemy import DDL, create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
@@ -6,6 +11,8 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 from pydantic import BaseModel
 
 from api.get_env import get_env_info
+from api.pool import InstrumentedAsyncAdaptedQueuePool, register_pool_metrics
+from api.sql_timing import register_sql_timing
 
 
 class EnvInfo(BaseModel):
@@ -16,6 +23,17 @@ class EnvInfo(BaseModel):
     PG_PASSWORD: str = "postgres"
     PG_DATABASE: str = "japan_tourism_info"
     LOGGER_CONFIG_PATH: str = "logger.ini"
+    # コネクションプールの設定
+    # (DB_POOL_SIZE + DB_MAX_OVERFLOW) * ワーカー数 がPostgreSQLのmax_connectionsを超えないようにする
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    # 読み取り専用レプリカ (未設定の場合は読み取りもプライマリに送る)
+    PG_READ_HOST: str = ""
+    # 書き込み後この秒数はそのクライアントの読み取りをプライマリに固定する (0で無効)
+    READ_YOUR_WRITES_SECONDS: int = 5
 
 
 env_info: EnvInfo = get_env_info(EnvInfo)
@@ -34,6 +52,10 @@ SQLALCHEMY_DATABASE_URL = f"{SQLALCHEMY_DATABASE_URL_WITHOUT_DB}/{env_info.PG_DA
 SQLALCHEMY_DATABASE_URL_SYNC = (
     f"{SQLALCHEMY_DATABASE_URL_WITHOUT_DB_SYNC}/{env_info.PG_DATABASE}"
 )
+SQLALCHEMY_READ_DATABASE_URL = (
+    f"postgresql+asyncpg://{env_info.PG_USER}:{env_info.PG_PASSWORD}"
+    f"@{env_info.PG_READ_HOST}/{env_info.PG_DATABASE}"
+)
 
 # データベース名を指定せずにエンジンを作成
 # db_engine_without_db = create_engine(SQLALCHEMY_DATABASE_URL_WITHOUT_DB)
@@ -48,17 +70,114 @@ SQLALCHEMY_DATABASE_URL_SYNC = (
 #     except Exception as e:
 #         print(f"An error occurred: {e}")
 
+
 # データベース名を指定してエンジンを作成
-db_engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
-db_engine_sync = create_engine(SQLALCHEMY_DATABASE_URL_SYNC)
+def create_pooled_async_engine(url: str, label: str):
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=env_info.DB_POOL_SIZE,
+        max_overflow=env_info.DB_MAX_OVERFLOW,
+        pool_timeout=env_info.DB_POOL_TIMEOUT,
+        pool_pre_ping=env_info.DB_POOL_PRE_PING,
+        pool_recycle=env_info.DB_POOL_RECYCLE,
+    )
+    register_pool_metrics(engine, label)
+    register_sql_timing(engine)
+    return engine
+
+
+db_engine = create_pooled_async_engine(SQLALCHEMY_DATABASE_URL, "primary")
+
+
+@lru_cache(maxsize=None)
+def get_sync_engine() -> Engine:
+    """マイグレーション用の同期エンジン。APIのプロセスでは作成しない"""
+    return create_engine(SQLALCHEMY_DATABASE_URL_SYNC)
+
 
 SessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=db_engine, class_=AsyncSession
+    autocommit=False,
+    autoflush=False,
+    bind=db_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
 )
 
+# レプリカが設定されている場合のみ読み取り専用のエンジンを作成する
+if env_info.PG_READ_HOST:
+    db_read_engine = create_pooled_async_engine(SQLALCHEMY_READ_DATABASE_URL, "replica")
+    ReadSessionLocal = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=db_read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        info={"replica": True},
+    )
+else:
+    db_read_engine = None
+    ReadSessionLocal = None
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    """レプリカに接続するセッションか (遅延した値を読みうる)"""
+    return session.info.get("replica", False)
+
+
+async def dispose_engines() -> None:
+    """終了時にプールしている接続を閉じる"""
+    await db_engine.dispose()
+    if db_read_engine is not None:
+        await db_read_engine.dispose()
+
+
 Base = declarative_base()
 
+# あいまい検索のtrigram索引(gin_trgm_ops)に必要な拡張機能
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
 
-async def get_db():
+# 書き込みを行ったクライアントに付与し、期限までは読み取りをプライマリに固定する
+READ_PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    pinned_until = request.cookies.get(READ_PRIMARY_COOKIE)
+    if not pinned_until:
+        return False
+    try:
+        return float(pinned_until) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_db(request: Request, response: Response):
+    if env_info.READ_YOUR_WRITES_SECONDS > 0 and request.method not in SAFE_METHODS:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(time.time() + env_info.READ_YOUR_WRITES_SECONDS),
+            max_age=env_info.READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
     async with SessionLocal() as session:
         yield session
+
+
+async def get_read_db(request: Request):
+    """読み取り専用エンドポイント用のセッション
+
+    レプリカ未設定時、または直前に書き込みを行ったクライアントからの
+    リクエストはプライマリに送る(read-your-writes)。
+    """
+    if ReadSessionLocal is None or is_pinned_to_primary(request):
+        async with SessionLocal() as session:
+            yield session
+    else:
+        async with ReadSessionLocal() as session:
+            yield session
@@ -1,6 +1,7 @@
 import os
+from functools import lru_cache
 from pydantic import ValidationError, TypeAdapter
-from typing import Type, TypeVar
+from typing import Any, Type, TypeVar
 
 from dotenv import load_dotenv
 
@@ -9,8 +10,20 @@ T = TypeVar("T")
 S = TypeVar("S")
 
 
-def create_instance_from_env(dataclass_type: Type[T]) -> T:
+@lru_cache(maxsize=None)
+def load_dotenv_once() -> None:
+    """.envファイルを探して、あれば読み込む (プロセスで1回だけ)"""
     load_dotenv()
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(field_type: Any) -> TypeAdapter:
+    # TypeAdapterの作成はスキーマの構築を伴うため、型ごとに1つだけ作る
+    return TypeAdapter(field_type)
+
+
+def create_instance_from_env(dataclass_type: Type[T]) -> T:
+    load_dotenv_once()
     field_info = dataclass_type.__annotations__
 
     init_values = {}
@@ -19,7 +32,7 @@ def create_instance_from_env(dataclass_type: Type[T]) -> T:
         if env_value is not None:
             try:
                 # TypeAdapterを使用して型変換を試みる
-                adapter = TypeAdapter(field_type)
+                adapter = get_type_adapter(field_type)
                 converted_value = adapter.validate_python(env_value)
             except ValidationError:
                 # バリデーションエラーが発生した場合は、変換せずに元の値を使用
@@ -33,9 +46,13 @@ def create_instance_from_env(dataclass_type: Type[T]) -> T:
         raise
 
 
+@lru_cache(maxsize=None)
 def get_env_info(env_info_class: Type[S]) -> S:
     """環境変数から設定を読み込んで、指定されたデータクラスのインスタンスを作成する
 
+    .envの読み込みはプロセスで1回だけ行い、同じクラスには同じインスタンスを返す。
+    環境変数を変えて読み直す場合は clear_env_cache() を呼ぶ。
+
     Arguments:
     ----------
         env_info_class (Type[BaseModel]): 環境変数から読み込む設定のデータクラス
@@ -56,7 +73,11 @@ def get_env_info(env_info_class: Type[S]) -> S:
     PG_USER = env_info.PG_USER
     ```
     """
-    # .envファイルを探して、あれば読み込む
-    load_dotenv()
     env_info_instance = create_instance_from_env(env_info_class)
     return env_info_instance
+
+
+def clear_env_cache() -> None:
+    """読み込み済みの設定を破棄する (テストなどで環境変数を変えた場合に使う)"""
+    get_env_info.cache_clear()
+    load_dotenv_once.cache_clear()
@@ -0,0 +1,45 @@
+"""prometheus_clientのメトリクスを、APIのメトリクス用のレジストリに登録して作る
+
+プロセス全体のデフォルトレジストリではなく専用のREGISTRYを使い、GET /metrics ではそれだけを出力する。
+"""
+
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+PROMETHEUS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+DEFAULT_BUCKETS = Histogram.DEFAULT_BUCKETS
+
+REGISTRY = CollectorRegistry()
+
+
+def render() -> bytes:
+    """REGISTRYのメトリクスをPrometheusのテキスト形式で出力する"""
+    return generate_latest(REGISTRY)
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return Counter(name, documentation, labelnames, registry=REGISTRY)
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return Gauge(name, documentation, labelnames, registry=REGISTRY)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Tuple[str, ...] = (),
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return Histogram(
+        name, documentation, labelnames, registry=REGISTRY, buckets=buckets
+    )
@@ -7,9 +7,14 @@ from sqlalchemy import (
     Text,
     DateTime,
     Float,
+    Index,
+    cast,
+    event,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship
 from api.db import Base
+from api.text_search import to_search_document
 
 
 class Article(Base):
@@ -21,22 +26,48 @@ class Article(Base):
     status = Column(String)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
+    # 全文検索用のtsvectorリテラル (タイトル・本文のbigram)。保存時に自動生成する
+    search_text = Column(Text)
 
-    author_id = Column(Integer, ForeignKey("users.id"))
+    author_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True)
 
     author = relationship("User", back_populates="articles")
-    photos = relationship("Photo", back_populates="article")
-    translations = relationship("Translation", back_populates="article")
+    # 削除時の子の行の扱いはDBの外部キー(ON DELETE)に任せる
+    photos = relationship("Photo", back_populates="article", passive_deletes=True)
+    translations = relationship(
+        "Translation", back_populates="article", passive_deletes=True
+    )
     tourist_spots = relationship(
         "TouristSpot",
         secondary="article_tourist_spots",  # 中間テーブルの名前を指定
         back_populates="articles",
-        lazy="selectin",
+        passive_deletes=True,
     )
     restaurants = relationship(
         "Restaurant",
         secondary="article_restaurants",  # 中間テーブルの名前を指定
         back_populates="articles",
+        passive_deletes=True,
+    )
+    feedbacks = relationship("Feedback", back_populates="article", passive_deletes=True)
+    cultural_insights = relationship(
+        "CulturalInsight", back_populates="article", passive_deletes=True
     )
-    feedbacks = relationship("Feedback", back_populates="article")
-    cultural_insights = relationship("CulturalInsight", back_populates="article")
+
+
+# tsvectorへのキャストに対するGIN索引 (PostgreSQLのみ)
+Index(
+    "ix_articles_search_text",
+    cast(Article.search_text, TSVECTOR),
+    postgresql_using="gin",
+).ddl_if(dialect="postgresql")
+
+
+def article_search_document(title, content) -> str:
+    return to_search_document((title, "A"), (content, "D"))
+
+
+@event.listens_for(Article, "before_insert")
+@event.listens_for(Article, "before_update")
+def _update_search_text(mapper, connection, target):
+    target.search_text = article_search_document(target.title, target.content)
@@ -1,13 +1,26 @@
-from sqlalchemy import Column, ForeignKey, Integer, DateTime
+from sqlalchemy import Column, ForeignKey, Index, Integer, DateTime
 from sqlalchemy.orm import relationship
 from api.db import Base
 
 
 class ArticleRestaurant(Base):
     __tablename__ = "article_restaurants"
+    # 同じ組の重複を防ぎ、一括紐付けの ON CONFLICT DO NOTHING の対象にする
+    __table_args__ = (
+        Index(
+            "uq_article_restaurants_article_id_restaurant_id",
+            "article_id",
+            "restaurant_id",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    article_id = Column(Integer, ForeignKey("articles.id"))
-    restaurant_id = Column(Integer, ForeignKey("restaurants.id"))
+    article_id = Column(
+        Integer, ForeignKey("articles.id", ondelete="CASCADE"), index=True
+    )
+    restaurant_id = Column(
+        Integer, ForeignKey("restaurants.id", ondelete="CASCADE"), index=True
+    )
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
@@ -1,13 +1,26 @@
-from sqlalchemy import Column, ForeignKey, Integer, DateTime
+from sqlalchemy import Column, ForeignKey, Index, Integer, DateTime
 from sqlalchemy.orm import relationship
 from api.db import Base
 
 
 class ArticleTouristSpot(Base):
     __tablename__ = "article_tourist_spots"
+    # 同じ組の重複を防ぎ、一括紐付けの ON CONFLICT DO NOTHING の対象にする
+    __table_args__ = (
+        Index(
+            "uq_article_tourist_spots_article_id_tourist_spot_id",
+            "article_id",
+            "tourist_spot_id",
+            unique=True,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    article_id = Column(Integer, ForeignKey("articles.id"))
-    tourist_spot_id = Column(Integer, ForeignKey("tourist_spots.id"))
+    article_id = Column(
+        Integer, ForeignKey("articles.id", ondelete="CASCADE"), index=True
+    )
+    tourist_spot_id = Column(
+        Integer, ForeignKey("tourist_spots.id", ondelete="CASCADE"), index=True
+    )
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
@@ -11,6 +11,8 @@ class CulturalInsight(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
-    article_id = Column(Integer, ForeignKey("articles.id"))
+    article_id = Column(
+        Integer, ForeignKey("articles.id", ondelete="CASCADE"), index=True
+    )
 
-    article = relationship("Article", back_populates="cultural_insights", lazy="joined")
+    article = relationship("Article", back_populates="cultural_insights")
@@ -11,8 +11,10 @@ class Feedback(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
-    user_id = Column(Integer, ForeignKey("users.id"))
-    article_id = Column(Integer, ForeignKey("articles.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True)
+    article_id = Column(
+        Integer, ForeignKey("articles.id", ondelete="CASCADE"), index=True
+    )
 
-    user = relationship("User", back_populates="feedbacks", lazy="joined")
-    article = relationship("Article", back_populates="feedbacks", lazy="joined")
+    user = relationship("User", back_populates="feedbacks")
+    article = relationship("Article", back_populates="feedbacks")
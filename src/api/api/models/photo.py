@@ -12,6 +12,8 @@ class Photo(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
-    article_id = Column(Integer, ForeignKey("articles.id"))
+    article_id = Column(
+        Integer, ForeignKey("articles.id", ondelete="CASCADE"), index=True
+    )
 
-    article = relationship("Article", back_populates="photos", lazy="joined")
+    article = relationship("Article", back_populates="photos")
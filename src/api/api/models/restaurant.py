@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from api.db import Base
 
@@ -18,4 +18,15 @@ class Restaurant(Base):
         "Article",
         secondary="article_restaurants",  # 中間テーブルの名前を指定
         back_populates="restaurants",
+        passive_deletes=True,
     )
+
+
+# あいまい検索用のtrigram索引 (PostgreSQLのみ)
+for _column in ("name", "location", "cuisine"):
+    Index(
+        f"ix_restaurants_{_column}_trgm",
+        getattr(Restaurant, _column),
+        postgresql_using="gin",
+        postgresql_ops={_column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
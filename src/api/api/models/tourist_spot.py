@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Index
 from sqlalchemy.orm import relationship
 from api.db import Base
 
@@ -18,5 +18,15 @@ class TouristSpot(Base):
         "Article",
         secondary="article_tourist_spots",  # 中間テーブルの名前を指定
         back_populates="tourist_spots",
-        lazy="selectin",
+        passive_deletes=True,
     )
+
+
+# あいまい検索用のtrigram索引 (PostgreSQLのみ)
+for _column in ("name", "location", "description"):
+    Index(
+        f"ix_tourist_spots_{_column}_trgm",
+        getattr(TouristSpot, _column),
+        postgresql_using="gin",
+        postgresql_ops={_column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from api.db import Base
 
@@ -6,6 +6,11 @@ from api.db import Base
 class Translation(Base):
     __tablename__ = "translations"
 
+    # 記事ごと・言語ごとの翻訳の取得用。先頭列のarticle_idだけの検索にも使われる
+    __table_args__ = (
+        Index("ix_translations_article_id_language", "article_id", "language"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     language = Column(String)
     title = Column(String)
@@ -14,6 +19,6 @@ class Translation(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
-    article_id = Column(Integer, ForeignKey("articles.id"))
+    article_id = Column(Integer, ForeignKey("articles.id", ondelete="CASCADE"))
 
-    article = relationship("Article", back_populates="translations", lazy="joined")
+    article = relationship("Article", back_populates="translations")
@@ -14,5 +14,6 @@ class User(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
-    articles = relationship("Article", back_populates="author")
-    feedbacks = relationship("Feedback", back_populates="user")
+    # 削除時の子の行の扱いはDBの外部キー(ON DELETE)に任せる
+    articles = relationship("Article", back_populates="author", passive_deletes=True)
+    feedbacks = relationship("Feedback", back_populates="user", passive_deletes=True)
@@ -0,0 +1,72 @@
+import base64
+import binascii
+import json
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+# 次ページのカーソルはレスポンスヘッダで返し、既存のレスポンスボディ(リスト)は変更しない
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(BaseModel):
+    skip: int = 0
+    limit: int = 100
+    after: Optional[int] = None
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(last_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return last_id
+
+
+def get_page(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0),
+    after: Optional[str] = Query(
+        None, description=f"前ページの {NEXT_CURSOR_HEADER} ヘッダの値"
+    ),
+) -> Page:
+    """skip/limitに加えてカーソル(after)を受け付ける共通のクエリパラメータ"""
+    if after is None:
+        return Page(skip=skip, limit=limit)
+    try:
+        return Page(limit=limit, after=decode_cursor(after))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(
+    stmt: Select,
+    id_column,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
+) -> Select:
+    """idの昇順で並べ、afterが指定されていればキーセット、なければOFFSETでページングする"""
+    stmt = stmt.order_by(id_column)
+    if after is not None:
+        stmt = stmt.where(id_column > after)
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
+
+
+def set_next_cursor(response: Response, items: Sequence, limit: int) -> None:
+    """ページが埋まっている場合のみ次ページのカーソルを設定する"""
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
@@ -0,0 +1,79 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api import metrics
+
+# チェックアウト待ち時間は通常ミリ秒以下、枯渇時はPOOL_TIMEOUTまで伸びる
+POOL_WAIT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+)
+
+pool_size = metrics.gauge(
+    "db_pool_size", "Configured number of persistent connections", ("engine",)
+)
+pool_checked_out = metrics.gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool", ("engine",)
+)
+pool_checked_in = metrics.gauge(
+    "db_pool_checked_in", "Idle connections currently held by the pool", ("engine",)
+)
+pool_overflow = metrics.gauge(
+    "db_pool_overflow",
+    "Connections opened beyond pool_size (negative while the pool is warming up)",
+    ("engine",),
+)
+pool_checkout_wait_seconds = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ("engine",),
+    buckets=POOL_WAIT_BUCKETS,
+)
+pool_checkout_timeouts = metrics.counter(
+    "db_pool_checkout_timeouts",
+    "Checkouts that gave up after pool_timeout seconds",
+    ("engine",),
+)
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """チェックアウトにかかった時間を計測するAsyncAdaptedQueuePool"""
+
+    metrics_label = "primary"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.labels(engine=self.metrics_label).inc()
+            raise
+        finally:
+            pool_checkout_wait_seconds.labels(engine=self.metrics_label).observe(
+                time.perf_counter() - start
+            )
+
+
+def register_pool_metrics(engine: AsyncEngine, label: str) -> None:
+    """エンジンのプール状態をスクレイプ時に読み出すゲージを登録する"""
+    pool = engine.sync_engine.pool
+    if isinstance(pool, InstrumentedAsyncAdaptedQueuePool):
+        pool.metrics_label = label
+    if not hasattr(pool, "checkedout"):
+        return
+    pool_size.labels(engine=label).set_function(lambda: pool.size())
+    pool_checked_out.labels(engine=label).set_function(lambda: pool.checkedout())
+    pool_checked_in.labels(engine=label).set_function(lambda: pool.checkedin())
+    pool_overflow.labels(engine=label).set_function(lambda: pool.overflow())
@@ -0,0 +1,118 @@
+"""リクエストごとのメトリクスを記録するASGIミドルウェア
+
+BaseHTTPMiddlewareはレスポンスをストリームに包み直すため使わず、
+send/receiveを薄くラップするだけのASGIミドルウェアにしている。
+ラベルのrouteは生のURLではなくルートのテンプレート (例: /v1/articles/{article_id})。
+"""
+
+import time
+import weakref
+from typing import Any, Callable, Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api import metrics
+
+# どのルートにも一致しなかったリクエストのrouteラベル (URLごとに系列が増えないようにまとめる)
+UNMATCHED_ROUTE = "<unmatched>"
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed"
+)
+requests_total = metrics.counter(
+    "http_requests", "HTTP requests by response status", ("method", "route", "status")
+)
+request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response is complete",
+    ("method", "route"),
+)
+request_size = metrics.histogram(
+    "http_request_size_bytes",
+    "HTTP request body size",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+response_size = metrics.histogram(
+    "http_response_size_bytes",
+    "HTTP response body size",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+request_exceptions = metrics.counter(
+    "http_request_exceptions",
+    "HTTP requests that raised an unhandled exception",
+    ("method", "route"),
+)
+
+# アプリ -> (エンドポイント関数 -> ルートのテンプレート)。ルートは起動後に変わらないため初回に作る
+_route_paths: "weakref.WeakKeyDictionary[Any, Dict[Callable[..., Any], str]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def route_template(scope: Scope) -> str:
+    """ルーティング時にscopeへ設定されたエンドポイントからルートのテンプレートを引く"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    app = scope["app"]
+    paths = _route_paths.get(app)
+    if paths is None:
+        paths = _route_paths[app] = {
+            route.endpoint: route.path
+            for route in app.routes
+            if hasattr(route, "endpoint")
+        }
+    return paths.get(endpoint, UNMATCHED_ROUTE)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        received = 0
+        sent = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        failed = False
+        requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight.dec()
+            method = scope["method"]
+            route = route_template(scope)
+            if failed:
+                request_exceptions.labels(method=method, route=route).inc()
+            request_duration.labels(method=method, route=route).observe(elapsed)
+            requests_total.labels(method=method, route=route, status=status).inc()
+            request_size.labels(method=method, route=route).observe(received)
+            response_size.labels(method=method, route=route).observe(sent)
@@ -1,11 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+    Response,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Any, Dict, List, Tuple
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import get_db
+from api.bulk import get_bulk_rows
+from api.compression import (
+    set_private_unless_published,
+    set_private_unless_statuses_published,
+)
+from api.conditional import check_not_modified, set_validators
+from api.db import get_db, get_read_db
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
+from api.text_search import SearchMode
 
 logger, log_decorator = setup_logger(__name__)
 
@@ -15,6 +33,25 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 記事は編集されうるため、キャッシュには毎回ETagで再検証させる (下書きはprivateにする)
+CACHE_CONTROL = "no-cache"
+
+
+def get_expand(
+    expand: List[str] = Query(
+        [],
+        description=f"含めるリレーション (カンマ区切り): {', '.join(cruds.ARTICLE_RELATIONS)}",
+    )
+) -> Tuple[str, ...]:
+    names = [name.strip() for value in expand for name in value.split(",")]
+    names = [name for name in names if name]
+    unknown = [name for name in names if name not in cruds.ARTICLE_RELATIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown relation: {', '.join(unknown)}"
+        )
+    return tuple(dict.fromkeys(names))
+
 
 @router_v1.post(
     "/", response_model=schemas.Article, status_code=status.HTTP_201_CREATED
@@ -29,20 +66,77 @@ async def create_article(
     return db_article
 
 
-@router_v1.get("/", response_model=List[schemas.Article])
+@router_v1.post("/bulk", response_model=schemas.BulkCreateResult[schemas.Article])
+async def create_articles_bulk(
+    rows: List[Dict[str, Any]] = Depends(get_bulk_rows),
+    db: AsyncSession = Depends(get_db),
+):
+    return await cruds.create_articles_bulk(db=db, rows=rows)
+
+
+@router_v1.get(
+    "/",
+    response_model=List[schemas.ArticleOut],
+    response_model_exclude_unset=True,
+)
 async def read_articles(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    expand: Tuple[str, ...] = Depends(get_expand),
+    db: AsyncSession = Depends(get_read_db),
+):
+    articles = await cruds.get_articles(
+        db, skip=page.skip, limit=page.limit, after=page.after, expand=expand
+    )
+    set_next_cursor(response, articles, page.limit)
+    set_private_unless_published(response, articles)
+    return articles
+
+
+@router_v1.get("/search", response_model=List[schemas.Article])
+async def search_articles(
+    response: Response,
+    keyword: str = Query(..., min_length=1),
+    mode: SearchMode = SearchMode.fulltext,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    articles = await cruds.get_articles(db, skip=skip, limit=limit)
+    articles = await cruds.search_articles(
+        db, keyword=keyword, skip=skip, limit=limit, mode=mode
+    )
+    set_private_unless_published(response, articles)
     return articles
 
 
-@router_v1.get("/{article_id}", response_model=schemas.Article)
-async def read_article(article_id: int, db: AsyncSession = Depends(get_db)):
-    db_article = await cruds.get_article(db, article_id=article_id)
+@router_v1.get(
+    "/{article_id}",
+    response_model=schemas.ArticleOut,
+    response_model_exclude_unset=True,
+)
+async def read_article(
+    article_id: int,
+    request: Request,
+    response: Response,
+    expand: Tuple[str, ...] = Depends(get_expand),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # リレーションの紐付けを変えても記事のupdated_atは変わらないため、expand指定時はETagを付けない
+    if not expand:
+        not_modified = await check_not_modified(request, db, "article", article_id)
+        if not_modified is not None:
+            # 304で更新されるキャッシュのヘッダも、下書きなら共有キャッシュに置かせない
+            set_private_unless_statuses_published(
+                not_modified, [await cruds.get_article_status(db, article_id)]
+            )
+            return not_modified
+    db_article = await cruds.get_article(db, article_id=article_id, expand=expand)
     if db_article is None:
-        logger.error(f"Article {article_id} not found")
+        logger.error("Article %s not found", article_id)
         raise HTTPException(status_code=404, detail="Article not found")
+    if not expand:
+        set_validators(response, "article", article_id, db_article.updated_at)
+    set_private_unless_published(response, [db_article])
     return db_article
 
 
@@ -50,18 +144,20 @@ async def read_article(article_id: int, db: AsyncSession = Depends(get_db)):
 async def update_article(
     article_id: int, article: schemas.ArticleUpdate, db: AsyncSession = Depends(get_db)
 ):
-    db_article = await cruds.get_article(db, article_id=article_id)
+    db_article = await cruds.update_article(
+        db=db, article=article, article_id=article_id
+    )
     if db_article is None:
-        logger.error(f"Article {article_id} not found")
+        logger.error("Article %s not found", article_id)
         raise HTTPException(status_code=404, detail="Article not found")
-    return await cruds.update_article(db=db, article=article, article_id=article_id)
+    return db_article
 
 
 @router_v1.delete("/{article_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_article(article_id: int, db: AsyncSession = Depends(get_db)):
     success = await cruds.delete_article(db=db, article_id=article_id)
     if not success:
-        logger.error(f"Article {article_id} not found")
+        logger.error("Article %s not found", article_id)
         raise HTTPException(status_code=404, detail="Article not found")
     # 204 No Content ステータスコードを返すためにレスポンスボディは空
     return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
@@ -120,3 +216,101 @@ async def create_cultural_insight_for_article(
             status_code=400, detail="Cultural_insights could not be created"
         )
     return db_cultural_insights
+
+
+@router_v1.post(
+    "/{article_id}/tourist_spots", response_model=List[schemas.ArticleTouristSpot]
+)
+async def link_article_tourist_spots(
+    article_id: int,
+    tourist_spot_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付け済みのものは無視し、新しく紐付けたものだけを返す
+    try:
+        return await cruds.link_tourist_spots_to_article(
+            db, article_id, tourist_spot_ids
+        )
+    except IntegrityError:
+        logger.error(
+            "Could not link tourist_spots %s to article %s",
+            tourist_spot_ids,
+            article_id,
+        )
+        raise HTTPException(status_code=404, detail="Article or tourist spot not found")
+
+
+@router_v1.put(
+    "/{article_id}/tourist_spots", response_model=List[schemas.ArticleTouristSpot]
+)
+async def replace_article_tourist_spots(
+    article_id: int,
+    tourist_spot_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付けを指定したIDの集合に置き換え、置き換え後の紐付けを返す
+    try:
+        return await cruds.set_article_tourist_spots(db, article_id, tourist_spot_ids)
+    except IntegrityError:
+        logger.error(
+            "Could not link tourist_spots %s to article %s",
+            tourist_spot_ids,
+            article_id,
+        )
+        raise HTTPException(status_code=404, detail="Article or tourist spot not found")
+
+
+@router_v1.delete("/{article_id}/tourist_spots", status_code=status.HTTP_204_NO_CONTENT)
+async def unlink_article_tourist_spots(
+    article_id: int,
+    tourist_spot_ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db),
+):
+    await cruds.unlink_tourist_spots_from_article(db, article_id, tourist_spot_ids)
+    return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router_v1.post(
+    "/{article_id}/restaurants", response_model=List[schemas.ArticleRestaurant]
+)
+async def link_article_restaurants(
+    article_id: int,
+    restaurant_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付け済みのものは無視し、新しく紐付けたものだけを返す
+    try:
+        return await cruds.link_restaurants_to_article(db, article_id, restaurant_ids)
+    except IntegrityError:
+        logger.error(
+            "Could not link restaurants %s to article %s", restaurant_ids, article_id
+        )
+        raise HTTPException(status_code=404, detail="Article or restaurant not found")
+
+
+@router_v1.put(
+    "/{article_id}/restaurants", response_model=List[schemas.ArticleRestaurant]
+)
+async def replace_article_restaurants(
+    article_id: int,
+    restaurant_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付けを指定したIDの集合に置き換え、置き換え後の紐付けを返す
+    try:
+        return await cruds.set_article_restaurants(db, article_id, restaurant_ids)
+    except IntegrityError:
+        logger.error(
+            "Could not link restaurants %s to article %s", restaurant_ids, article_id
+        )
+        raise HTTPException(status_code=404, detail="Article or restaurant not found")
+
+
+@router_v1.delete("/{article_id}/restaurants", status_code=status.HTTP_204_NO_CONTENT)
+async def unlink_article_restaurants(
+    article_id: int,
+    restaurant_ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db),
+):
+    await cruds.unlink_restaurants_from_article(db, article_id, restaurant_ids)
+    return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
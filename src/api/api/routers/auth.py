@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import api.schemas as schemas
+from api.db import get_db
+from api.security import (
+    authenticate_user,
+    create_user_access_token,
+    get_token_data,
+    revoke_access_token,
+)
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+router_v1 = APIRouter(
+    tags=["auth"],
+)
+
+
+@router_v1.post("/token", response_model=schemas.Token)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
+    # username には email を指定する
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        logger.error("Failed login for %s", form_data.username)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = await create_user_access_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router_v1.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token_data: schemas.TokenData = Depends(get_token_data)):
+    await revoke_access_token(token_data)
@@ -4,7 +4,8 @@ from typing import List
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import get_db
+from api.db import get_db, get_read_db
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
@@ -15,6 +16,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 更新の直後に古い内容を返さないよう、キャッシュには毎回再検証させる
+CACHE_CONTROL = "no-cache"
+
 
 @router_v1.post("/", response_model=schemas.CulturalInsight)
 async def create_cultural_insight(
@@ -29,21 +33,26 @@ async def create_cultural_insight(
 
 @router_v1.get("/", response_model=List[schemas.CulturalInsight])
 async def read_cultural_insights(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    cultural_insights = await cruds.get_cultural_insights(db, skip=skip, limit=limit)
+    cultural_insights = await cruds.get_cultural_insights(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, cultural_insights, page.limit)
     return cultural_insights
 
 
 @router_v1.get("/{cultural_insight_id}", response_model=schemas.CulturalInsight)
 async def read_cultural_insight(
-    cultural_insight_id: int, db: AsyncSession = Depends(get_db)
+    cultural_insight_id: int, db: AsyncSession = Depends(get_read_db)
 ):
     db_cultural_insight = await cruds.get_cultural_insight(
         db, cultural_insight_id=cultural_insight_id
     )
     if db_cultural_insight is None:
-        logger.error(f"Cultural insight {cultural_insight_id} not found")
+        logger.error("Cultural insight %s not found", cultural_insight_id)
         raise HTTPException(status_code=404, detail="Cultural insight not found")
     return db_cultural_insight
 
@@ -54,34 +63,26 @@ async def update_cultural_insight(
     cultural_insight: schemas.CulturalInsightUpdate,
     db: AsyncSession = Depends(get_db),
 ):
-    db_cultural_insight = await cruds.get_cultural_insight(
-        db, cultural_insight_id=cultural_insight_id
-    )
-    if db_cultural_insight is None:
-        logger.error(f"Cultural insight {cultural_insight_id} not found")
-        raise HTTPException(status_code=404, detail="Cultural insight not found")
-    return await cruds.update_cultural_insight(
+    db_cultural_insight = await cruds.update_cultural_insight(
         db=db,
         cultural_insight=cultural_insight,
         cultural_insight_id=cultural_insight_id,
     )
+    if db_cultural_insight is None:
+        logger.error("Cultural insight %s not found", cultural_insight_id)
+        raise HTTPException(status_code=404, detail="Cultural insight not found")
+    return db_cultural_insight
 
 
 @router_v1.delete("/{cultural_insight_id}", response_model=schemas.CulturalInsight)
 async def delete_cultural_insight(
     cultural_insight_id: int, db: AsyncSession = Depends(get_db)
 ):
-    db_cultural_insight = await cruds.get_cultural_insight(
-        db, cultural_insight_id=cultural_insight_id
-    )
-    if db_cultural_insight is None:
-        logger.error(f"Cultural insight {cultural_insight_id} not found")
-        raise HTTPException(status_code=404, detail="Cultural insight not found")
     success = await cruds.delete_cultural_insight(
         db=db, cultural_insight_id=cultural_insight_id
     )
     if not success:
-        logger.error(f"Cultural insight {cultural_insight_id} not found")
-        raise HTTPException(status_code=404, detail="Article not found")
+        logger.error("Cultural insight %s not found", cultural_insight_id)
+        raise HTTPException(status_code=404, detail="Cultural insight not found")
     # 204 No Content ステータスコードを返すためにレスポンスボディは空
     return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
@@ -4,7 +4,8 @@ from typing import List
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import get_db
+from api.db import get_db, get_read_db
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
@@ -15,6 +16,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# フィードバックはユーザーに紐付くため共有キャッシュに置かない
+CACHE_CONTROL = "private, no-cache"
+
 
 @router_v1.post(
     "/", response_model=schemas.Feedback, status_code=status.HTTP_201_CREATED
@@ -36,17 +40,22 @@ async def create_feedback(
 
 @router_v1.get("/", response_model=List[schemas.Feedback])
 async def read_feedbacks(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    feedbacks = await cruds.get_feedbacks(db, skip=skip, limit=limit)
+    feedbacks = await cruds.get_feedbacks(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, feedbacks, page.limit)
     return feedbacks
 
 
 @router_v1.get("/{feedback_id}", response_model=schemas.Feedback)
-async def read_feedback(feedback_id: int, db: AsyncSession = Depends(get_db)):
+async def read_feedback(feedback_id: int, db: AsyncSession = Depends(get_read_db)):
     db_feedback = await cruds.get_feedback(db, feedback_id=feedback_id)
     if db_feedback is None:
-        logger.error(f"Feedback {feedback_id} not found")
+        logger.error("Feedback %s not found", feedback_id)
         raise HTTPException(status_code=404, detail="Feedback not found")
     return db_feedback
 
@@ -57,20 +66,20 @@ async def update_feedback(
     feedback: schemas.FeedbackUpdate,
     db: AsyncSession = Depends(get_db),
 ):
-    db_feedback = await cruds.get_feedback(db, feedback_id=feedback_id)
-    if db_feedback is None:
-        logger.error(f"Feedback {feedback_id} not found")
-        raise HTTPException(status_code=404, detail="Feedback not found")
-    return await cruds.update_feedback(
+    db_feedback = await cruds.update_feedback(
         db=db, feedback=feedback, feedback_id=feedback_id
     )
+    if db_feedback is None:
+        logger.error("Feedback %s not found", feedback_id)
+        raise HTTPException(status_code=404, detail="Feedback not found")
+    return db_feedback
 
 
 @router_v1.delete("/{feedback_id}", response_model=schemas.Feedback)
 async def delete_feedback(feedback_id: int, db: AsyncSession = Depends(get_db)):
     success = await cruds.delete_feedback(db=db, feedback_id=feedback_id)
     if not success:
-        logger.error(f"Feedback {feedback_id} not found")
+        logger.error("Feedback %s not found", feedback_id)
         raise HTTPException(status_code=404, detail="Feedback not found")
     # 204 No Content ステータスコードを返すためにレスポンスボディは空
     return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import get_db
+from api.db import get_db, get_read_db
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
@@ -15,6 +16,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 更新の直後に古い内容を返さないよう、キャッシュには毎回再検証させる
+CACHE_CONTROL = "no-cache"
+
 
 @router_v1.post("/", response_model=schemas.Photo)
 async def create_photo(
@@ -27,17 +31,22 @@ async def create_photo(
 
 @router_v1.get("/", response_model=List[schemas.Photo])
 async def read_photos(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    photos = await cruds.get_photos(db, skip=skip, limit=limit)
+    photos = await cruds.get_photos(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, photos, page.limit)
     return photos
 
 
 @router_v1.get("/{photo_id}", response_model=schemas.Photo)
-async def read_photo(photo_id: int, db: AsyncSession = Depends(get_db)):
+async def read_photo(photo_id: int, db: AsyncSession = Depends(get_read_db)):
     db_photo = await cruds.get_photo(db, photo_id=photo_id)
     if db_photo is None:
-        logger.error(f"Photo {photo_id} not found")
+        logger.error("Photo %s not found", photo_id)
         raise HTTPException(status_code=404, detail="Photo not found")
     return db_photo
 
@@ -46,17 +55,17 @@ async def read_photo(photo_id: int, db: AsyncSession = Depends(get_db)):
 async def update_photo(
     photo_id: int, photo: UploadFile = File(...), db: AsyncSession = Depends(get_db)
 ):
-    db_photo = await cruds.get_photo(db, photo_id=photo_id)
+    db_photo = await cruds.update_photo(db=db, photo=photo, photo_id=photo_id)
     if db_photo is None:
-        logger.error(f"Photo {photo_id} not found")
+        logger.error("Photo %s not found", photo_id)
         raise HTTPException(status_code=404, detail="Photo not found")
-    return await cruds.update_photo(db=db, photo=photo, photo_id=photo_id)
+    return db_photo
 
 
 @router_v1.delete("/{photo_id}", response_model=schemas.Photo)
 async def delete_photo(photo_id: int, db: AsyncSession = Depends(get_db)):
-    db_photo = await cruds.get_photo(db, photo_id=photo_id)
+    db_photo = await cruds.delete_photo(db=db, photo_id=photo_id)
     if db_photo is None:
-        logger.error(f"Photo {photo_id} not found")
+        logger.error("Photo %s not found", photo_id)
         raise HTTPException(status_code=404, detail="Photo not found")
-    return await cruds.delete_photo(db=db, photo_id=photo_id)
+    return db_photo
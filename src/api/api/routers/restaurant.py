@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+    Response,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Any, Dict, List, Optional
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import get_db
+from api.bulk import get_bulk_rows
+from api.conditional import check_not_modified, set_validators
+from api.db import get_db, get_read_db
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
+from api.text_search import FuzzySearchMode
 
 logger, log_decorator = setup_logger(__name__)
 
@@ -15,6 +29,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 更新の直後に古い内容を返さないよう、キャッシュには毎回ETagで再検証させる
+CACHE_CONTROL = "no-cache"
+
 
 @router_v1.post("/", response_model=schemas.Restaurant)
 async def create_restaurant(
@@ -23,19 +40,58 @@ async def create_restaurant(
     return await cruds.create_restaurant(db=db, restaurant=restaurant)
 
 
+@router_v1.post("/bulk", response_model=schemas.BulkCreateResult[schemas.Restaurant])
+async def create_restaurants_bulk(
+    rows: List[Dict[str, Any]] = Depends(get_bulk_rows),
+    db: AsyncSession = Depends(get_db),
+):
+    return await cruds.create_restaurants_bulk(db=db, rows=rows)
+
+
 @router_v1.get("/", response_model=List[schemas.Restaurant])
 async def read_restaurants(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return await cruds.get_restaurants(db, skip=skip, limit=limit)
+    restaurants = await cruds.get_restaurants(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, restaurants, page.limit)
+    return restaurants
+
+
+@router_v1.get("/search", response_model=List[schemas.Restaurant])
+async def search_restaurants(
+    keyword: str = Query(..., min_length=1),
+    mode: FuzzySearchMode = FuzzySearchMode.trigram,
+    threshold: Optional[float] = Query(
+        None, ge=0, le=1, description="あいまい検索の類似度の下限 (省略時は設定値)"
+    ),
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await cruds.search_restaurants(
+        db, keyword=keyword, skip=skip, limit=limit, mode=mode, threshold=threshold
+    )
 
 
 @router_v1.get("/{restaurant_id}", response_model=schemas.Restaurant)
-async def read_restaurant(restaurant_id: int, db: AsyncSession = Depends(get_db)):
+async def read_restaurant(
+    restaurant_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+):
+    not_modified = await check_not_modified(request, db, "restaurant", restaurant_id)
+    if not_modified is not None:
+        return not_modified
     db_restaurant = await cruds.get_restaurant(db, restaurant_id=restaurant_id)
     if db_restaurant is None:
-        logger.error(f"Restaurant {restaurant_id} not found")
+        logger.error("Restaurant %s not found", restaurant_id)
         raise HTTPException(status_code=404, detail="Restaurant not found")
+    set_validators(response, "restaurant", restaurant_id, db_restaurant.updated_at)
     return db_restaurant
 
 
@@ -45,25 +101,29 @@ async def update_restaurant(
     restaurant: schemas.RestaurantCreate,
     db: AsyncSession = Depends(get_db),
 ):
-    db_restaurant = await cruds.get_restaurant(db, restaurant_id=restaurant_id)
-    if db_restaurant is None:
-        logger.error(f"Restaurant {restaurant_id} not found")
-        raise HTTPException(status_code=404, detail="Restaurant not found")
-    return await cruds.update_restaurant(
+    db_restaurant = await cruds.update_restaurant(
         db=db, restaurant=restaurant, restaurant_id=restaurant_id
     )
+    if db_restaurant is None:
+        logger.error("Restaurant %s not found", restaurant_id)
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return db_restaurant
 
 
 @router_v1.delete("/{restaurant_id}", response_model=schemas.Restaurant)
 async def delete_restaurant(restaurant_id: int, db: AsyncSession = Depends(get_db)):
-    return await cruds.delete_restaurant(db=db, restaurant_id=restaurant_id)
+    db_restaurant = await cruds.delete_restaurant(db=db, restaurant_id=restaurant_id)
+    if db_restaurant is None:
+        logger.error("Restaurant %s not found", restaurant_id)
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return db_restaurant
 
 
 @router_v1.get(
     "/{restaurant_id}/articles", response_model=List[schemas.ArticleRestaurant]
 )
 async def read_associated_articles(
-    restaurant_id: int, db: AsyncSession = Depends(get_db)
+    restaurant_id: int, db: AsyncSession = Depends(get_read_db)
 ):
     return await cruds.get_associated_articles(db, restaurant_id=restaurant_id)
 
@@ -90,7 +150,9 @@ async def delete_link_article_to_restaurant(
         return {"message": "Association deleted successfully"}
     else:
         logger.error(
-            f"Association between restaurant {restaurant_id} and article {article_id} not found"
+            "Association between restaurant %s and article %s not found",
+            restaurant_id,
+            article_id,
         )
         raise HTTPException(status_code=404, detail="Association not found")
 
@@ -108,6 +170,54 @@ async def update_association(
         return association
     else:
         logger.error(
-            f"Association between restaurant {restaurant_id} and article {article_id} not found"
+            "Association between restaurant %s and article %s not found",
+            restaurant_id,
+            article_id,
         )
         raise HTTPException(status_code=404, detail="Association not found")
+
+
+@router_v1.post(
+    "/{restaurant_id}/articles", response_model=List[schemas.ArticleRestaurant]
+)
+async def link_restaurant_articles(
+    restaurant_id: int,
+    article_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付け済みのものは無視し、新しく紐付けたものだけを返す
+    try:
+        return await cruds.link_articles_to_restaurant(db, restaurant_id, article_ids)
+    except IntegrityError:
+        logger.error(
+            "Could not link articles %s to restaurant %s", article_ids, restaurant_id
+        )
+        raise HTTPException(status_code=404, detail="Article or restaurant not found")
+
+
+@router_v1.put(
+    "/{restaurant_id}/articles", response_model=List[schemas.ArticleRestaurant]
+)
+async def replace_restaurant_articles(
+    restaurant_id: int,
+    article_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付けを指定したIDの集合に置き換え、置き換え後の紐付けを返す
+    try:
+        return await cruds.set_restaurant_articles(db, restaurant_id, article_ids)
+    except IntegrityError:
+        logger.error(
+            "Could not link articles %s to restaurant %s", article_ids, restaurant_id
+        )
+        raise HTTPException(status_code=404, detail="Article or restaurant not found")
+
+
+@router_v1.delete("/{restaurant_id}/articles", status_code=status.HTTP_204_NO_CONTENT)
+async def unlink_restaurant_articles(
+    restaurant_id: int,
+    article_ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db),
+):
+    await cruds.unlink_articles_from_restaurant(db, restaurant_id, article_ids)
+    return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
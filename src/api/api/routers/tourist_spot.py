@@ -1,12 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    status,
+    Response,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Any, Dict, List, Optional
 
 import api.cruds as cruds
-from api.db import get_db
+from api.bulk import get_bulk_rows
+from api.conditional import check_not_modified, set_validators
+from api.db import get_db, get_read_db
 
 import api.schemas as schemas
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
+from api.text_search import FuzzySearchMode
 
 logger, log_decorator = setup_logger(__name__)
 
@@ -16,6 +30,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 更新の直後に古い内容を返さないよう、CDNなどのキャッシュには毎回ETagで再検証させる
+CACHE_CONTROL = "no-cache"
+
 
 @router_v1.post("/", response_model=schemas.TouristSpot)
 async def create_tourist_spot(
@@ -24,19 +41,62 @@ async def create_tourist_spot(
     return await cruds.create_tourist_spot(db=db, tourist_spot=tourist_spot)
 
 
+@router_v1.post("/bulk", response_model=schemas.BulkCreateResult[schemas.TouristSpot])
+async def create_tourist_spots_bulk(
+    rows: List[Dict[str, Any]] = Depends(get_bulk_rows),
+    db: AsyncSession = Depends(get_db),
+):
+    return await cruds.create_tourist_spots_bulk(db=db, rows=rows)
+
+
 @router_v1.get("/", response_model=List[schemas.TouristSpot])
 async def read_tourist_spots(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return await cruds.get_tourist_spots(db, skip=skip, limit=limit)
+    tourist_spots = await cruds.get_tourist_spots(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, tourist_spots, page.limit)
+    return tourist_spots
+
+
+@router_v1.get("/search", response_model=List[schemas.TouristSpot])
+async def search_tourist_spots(
+    keyword: str = Query(..., min_length=1),
+    mode: FuzzySearchMode = FuzzySearchMode.trigram,
+    threshold: Optional[float] = Query(
+        None, ge=0, le=1, description="あいまい検索の類似度の下限 (省略時は設定値)"
+    ),
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await cruds.search_tourist_spots(
+        db, keyword=keyword, skip=skip, limit=limit, mode=mode, threshold=threshold
+    )
 
 
 @router_v1.get("/{tourist_spot_id}", response_model=schemas.TouristSpot)
-async def read_tourist_spot(tourist_spot_id: int, db: AsyncSession = Depends(get_db)):
+async def read_tourist_spot(
+    tourist_spot_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+):
+    not_modified = await check_not_modified(
+        request, db, "tourist_spot", tourist_spot_id
+    )
+    if not_modified is not None:
+        return not_modified
     db_tourist_spot = await cruds.get_tourist_spot(db, tourist_spot_id=tourist_spot_id)
     if db_tourist_spot is None:
-        logger.error(f"Tourist spot {tourist_spot_id} not found")
+        logger.error("Tourist spot %s not found", tourist_spot_id)
         raise HTTPException(status_code=404, detail="Tourist spot not found")
+    set_validators(
+        response, "tourist_spot", tourist_spot_id, db_tourist_spot.updated_at
+    )
     return db_tourist_spot
 
 
@@ -46,16 +106,20 @@ async def update_tourist_spot(
     tourist_spot: schemas.TouristSpotUpdate,
     db: AsyncSession = Depends(get_db),
 ):
-    return await cruds.update_tourist_spot(
+    db_tourist_spot = await cruds.update_tourist_spot(
         db=db, tourist_spot=tourist_spot, tourist_spot_id=tourist_spot_id
     )
+    if db_tourist_spot is None:
+        logger.error("Tourist spot %s not found", tourist_spot_id)
+        raise HTTPException(status_code=404, detail="Tourist spot not found")
+    return db_tourist_spot
 
 
 @router_v1.delete("/{tourist_spot_id}", response_model=schemas.TouristSpot)
 async def delete_tourist_spot(tourist_spot_id: int, db: AsyncSession = Depends(get_db)):
     success = await cruds.delete_tourist_spot(db=db, tourist_spot_id=tourist_spot_id)
     if not success:
-        logger.error(f"Tourist_spot {tourist_spot_id} not found")
+        logger.error("Tourist_spot %s not found", tourist_spot_id)
         raise HTTPException(status_code=404, detail="Tourist_spot not found")
     # 204 No Content ステータスコードを返すためにレスポンスボディは空
     return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
@@ -65,7 +129,7 @@ async def delete_tourist_spot(tourist_spot_id: int, db: AsyncSession = Depends(g
     "/{tourist_spot_id}/articles", response_model=List[schemas.ArticleTouristSpot]
 )
 async def read_associated_articles(
-    tourist_spot_id: int, db: AsyncSession = Depends(get_db)
+    tourist_spot_id: int, db: AsyncSession = Depends(get_read_db)
 ):
     return await cruds.get_assosicated_articles(db, tourist_spot_id=tourist_spot_id)
 
@@ -95,7 +159,9 @@ async def delete_link_article_from_tourist_spot(
         return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
     else:
         logger.error(
-            f"Association between tourist spot {tourist_spot_id} and article {article_id} not found"
+            "Association between tourist spot %s and article %s not found",
+            tourist_spot_id,
+            article_id,
         )
         raise HTTPException(status_code=404, detail="Association not found")
 
@@ -110,3 +176,55 @@ async def update_association(
     return await cruds.update_article_tourist_spot_association(
         db, tourist_spot_id=tourist_spot_id, article_id=article_id
     )
+
+
+@router_v1.post(
+    "/{tourist_spot_id}/articles", response_model=List[schemas.ArticleTouristSpot]
+)
+async def link_tourist_spot_articles(
+    tourist_spot_id: int,
+    article_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付け済みのものは無視し、新しく紐付けたものだけを返す
+    try:
+        return await cruds.link_articles_to_tourist_spot(
+            db, tourist_spot_id, article_ids
+        )
+    except IntegrityError:
+        logger.error(
+            "Could not link articles %s to tourist spot %s",
+            article_ids,
+            tourist_spot_id,
+        )
+        raise HTTPException(status_code=404, detail="Article or tourist spot not found")
+
+
+@router_v1.put(
+    "/{tourist_spot_id}/articles", response_model=List[schemas.ArticleTouristSpot]
+)
+async def replace_tourist_spot_articles(
+    tourist_spot_id: int,
+    article_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # 紐付けを指定したIDの集合に置き換え、置き換え後の紐付けを返す
+    try:
+        return await cruds.set_tourist_spot_articles(db, tourist_spot_id, article_ids)
+    except IntegrityError:
+        logger.error(
+            "Could not link articles %s to tourist spot %s",
+            article_ids,
+            tourist_spot_id,
+        )
+        raise HTTPException(status_code=404, detail="Article or tourist spot not found")
+
+
+@router_v1.delete("/{tourist_spot_id}/articles", status_code=status.HTTP_204_NO_CONTENT)
+async def unlink_tourist_spot_articles(
+    tourist_spot_id: int,
+    article_ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db),
+):
+    await cruds.unlink_articles_from_tourist_spot(db, tourist_spot_id, article_ids)
+    return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
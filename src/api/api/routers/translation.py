@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 import api.cruds as cruds
-from api.db import get_db
+from api.conditional import check_not_modified, set_validators
+from api.db import get_db, get_read_db
 import api.schemas as schemas
+from api.pagination import Page, get_page, set_next_cursor
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
@@ -15,6 +17,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# 更新の直後に古い内容を返さないよう、キャッシュには毎回ETagで再検証させる
+CACHE_CONTROL = "no-cache"
+
 
 @router_v1.post(
     "/", response_model=schemas.Translation, status_code=status.HTTP_201_CREATED
@@ -35,17 +40,32 @@ async def create_translation(
 
 @router_v1.get("/", response_model=List[schemas.Translation])
 async def read_translations(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    return await cruds.get_translations(db, skip=skip, limit=limit)
+    translations = await cruds.get_translations(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, translations, page.limit)
+    return translations
 
 
 @router_v1.get("/{translation_id}", response_model=schemas.Translation)
-async def read_translation(translation_id: int, db: AsyncSession = Depends(get_db)):
+async def read_translation(
+    translation_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+):
+    not_modified = await check_not_modified(request, db, "translation", translation_id)
+    if not_modified is not None:
+        return not_modified
     db_translation = await cruds.get_translation(db, translation_id=translation_id)
     if db_translation is None:
-        logger.error(f"Translation {translation_id} not found")
+        logger.error("Translation %s not found", translation_id)
         raise HTTPException(status_code=404, detail="Translation not found")
+    set_validators(response, "translation", translation_id, db_translation.updated_at)
     return db_translation
 
 
@@ -55,16 +75,20 @@ async def update_translation(
     translation: schemas.TranslationUpdate,
     db: AsyncSession = Depends(get_db),
 ):
-    return await cruds.update_translation(
+    db_translation = await cruds.update_translation(
         db=db, translation=translation, translation_id=translation_id
     )
+    if db_translation is None:
+        logger.error("Translation %s not found", translation_id)
+        raise HTTPException(status_code=404, detail="Translation not found")
+    return db_translation
 
 
 @router_v1.delete("/{translation_id}", response_model=schemas.Translation)
 async def delete_translation(translation_id: int, db: AsyncSession = Depends(get_db)):
     success = await cruds.delete_translation(db=db, translation_id=translation_id)
     if not success:
-        logger.error(f"translation {translation_id} not found")
+        logger.error("translation %s not found", translation_id)
         raise HTTPException(status_code=404, detail="translation not found")
     # 204 No Content ステータスコードを返すためにレスポンスボディは空
     return Response(content=None, status_code=status.HTTP_204_NO_CONTENT)
@@ -1,11 +1,15 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import get_db
+from api.db import get_db, get_read_db
+from api.pagination import Page, get_page, set_next_cursor
+from api.security.auth import token_store_unavailable
+from api.security.token_store import TokenStoreUnavailable
 from api.setup_logger import setup_logger
 
 logger, log_decorator = setup_logger(__name__)
@@ -16,6 +20,9 @@ router_v1 = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# ユーザー情報は共有キャッシュに置かせず、ブラウザでも毎回再検証させる
+CACHE_CONTROL = "private, no-cache"
+
 
 @router_v1.post(
     "/",
@@ -25,24 +32,29 @@ router_v1 = APIRouter(
 async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     db_user = await cruds.get_user_by_email(db, email=user.email)
     if db_user:
-        logger.error(f"Email {user.email} already registered")
+        logger.error("Email %s already registered", user.email)
         raise HTTPException(status_code=400, detail="Email already registered")
     return await cruds.create_user(db=db, user=user)
 
 
 @router_v1.get("/", response_model=List[schemas.User])
 async def read_users(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    users = await cruds.get_users(db, skip=skip, limit=limit)
+    users = await cruds.get_users(
+        db, skip=page.skip, limit=page.limit, after=page.after
+    )
+    set_next_cursor(response, users, page.limit)
     return users
 
 
 @router_v1.get("/{user_id}", response_model=schemas.User)
-async def read_user(user_id: int, db: AsyncSession = Depends(get_db)):
+async def read_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     db_user = await cruds.get_user(db, user_id=user_id)
     if db_user is None:
-        logger.error(f"User {user_id} not found")
+        logger.error("User %s not found", user_id)
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
@@ -51,31 +63,47 @@ async def read_user(user_id: int, db: AsyncSession = Depends(get_db)):
 async def update_user(
     user_id: int, user: schemas.UserUpdate, db: AsyncSession = Depends(get_db)
 ):
-    db_user = await cruds.get_user(db, user_id=user_id)
+    try:
+        db_user = await cruds.update_user(db=db, user=user, user_id=user_id)
+    except IntegrityError:
+        logger.error("Email %s already registered", user.email)
+        raise HTTPException(status_code=409, detail="Email already registered")
+    except TokenStoreUnavailable as e:
+        raise token_store_unavailable(e)
     if db_user is None:
-        logger.error(f"User {user_id} not found")
+        logger.error("User %s not found", user_id)
         raise HTTPException(status_code=404, detail="User not found")
-    return await cruds.update_user(db=db, user=user, user_id=user_id)
+    return db_user
 
 
 @router_v1.delete("/{user_id}", response_model=schemas.User)
 async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
-    db_user = await cruds.get_user(db, user_id=user_id)
+    try:
+        db_user = await cruds.delete_user(db=db, user_id=user_id)
+    except IntegrityError:
+        logger.error("User %s is still referenced", user_id)
+        raise HTTPException(status_code=409, detail="User is still referenced")
+    except TokenStoreUnavailable as e:
+        raise token_store_unavailable(e)
     if db_user is None:
-        logger.error(f"User {user_id} not found")
+        logger.error("User %s not found", user_id)
         raise HTTPException(status_code=404, detail="User not found")
-    return await cruds.delete_user(db=db, user_id=user_id)
+    return db_user
 
 
 @router_v1.get("/{user_id}/articles/", response_model=List[schemas.Article])
 async def read_user_articles(
-    user_id: int, skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    user_id: int,
+    response: Response,
+    page: Page = Depends(get_page),
+    db: AsyncSession = Depends(get_read_db),
 ):
     db_user = await cruds.get_user(db, user_id=user_id)
     if db_user is None:
-        logger.error(f"User {user_id} not found")
+        logger.error("User %s not found", user_id)
         raise HTTPException(status_code=404, detail="User not found")
     articles = await cruds.get_articles_by_user(
-        db=db, user_id=user_id, skip=skip, limit=limit
+        db=db, user_id=user_id, skip=page.skip, limit=page.limit, after=page.after
     )
+    set_next_cursor(response, articles, page.limit)
     return articles
@@ -0,0 +1,65 @@
+"""適用済みのマイグレーションの記録 (schema_migrationsテーブル)
+
+APIの起動時の確認はモデルやマイグレーションの処理(migrate_db)を読み込まずに行えるよう、
+テーブルの定義と最新のバージョンだけをここに置く。
+"""
+
+from typing import List, Optional, Set
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    select,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+# migrate_db.MIGRATIONS の最後のバージョン。マイグレーションを追加したら合わせて更新する
+# (一致しない場合は migrate_db の読み込み時に失敗する)
+LATEST_SCHEMA_VERSION = 6
+
+# モデルのメタデータとは分け、create_all/drop_allの対象にしない
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def get_applied_versions(conn: Connection) -> Set[int]:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+async def log_pending_migrations(engine: AsyncEngine) -> Optional[List[int]]:
+    """起動時に未適用のマイグレーションをログに出す。DBに接続できない場合はNone"""
+    try:
+        async with engine.connect() as conn:
+            applied = await conn.run_sync(get_applied_versions)
+    except Exception as e:
+        logger.warning("Could not check pending migrations: %s", e)
+        return None
+    pending = [
+        version
+        for version in range(1, LATEST_SCHEMA_VERSION + 1)
+        if version not in applied
+    ]
+    if pending:
+        logger.warning(
+            "Pending migrations %s (run `python -m migrate_db`)",
+            ", ".join(map(str, pending)),
+        )
+    return pending
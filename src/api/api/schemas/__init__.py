@@ -31,3 +31,4 @@ from .cultural_insight import (
     CulturalInsightUpdate,
     CulturalInsightOut,
 )
+from .bulk import BulkCreateResult, BulkError
@@ -0,0 +1,14 @@
+from typing import Any, Dict, Generic, List, TypeVar
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class BulkError(BaseModel):
+    index: int  # リクエストの配列内の位置
+    errors: List[Dict[str, Any]]
+
+
+class BulkCreateResult(BaseModel, Generic[T]):
+    created: List[T] = []
+    errors: List[BulkError] = []
@@ -58,3 +58,8 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
+    role: Optional[str] = None
+    version: Optional[str] = None
+    jti: Optional[str] = None
+    expires_at: Optional[float] = None
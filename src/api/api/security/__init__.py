@@ -1,6 +1,15 @@
 from .auth import (
     authenticate_user,
     create_access_token,
+    create_user_access_token,
     get_current_user,
+    get_token_data,
+    require_role,
+    revoke_access_token,
+)
+from .password import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_password,
+    verify_password_async,
 )
-from .password import get_password_hash, verify_password
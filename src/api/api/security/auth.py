@@ -1,17 +1,28 @@
+import secrets
 from datetime import datetime, timedelta
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import api.schemas as schemas
 import api.cruds as cruds
-from api.db import SessionLocal
-from api.security.password import verify_password
+from api.db import get_db
+from api.security.password import verify_password_async
+from api.security.token_store import (
+    TokenStoreUnavailable,
+    get_token_version,
+    is_token_revoked,
+    revoke_token,
+)
+from api.security.user_cache import get_cached_user, set_cached_user
 from api.get_env import get_env_info
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
 
 
 class EnvInfo(BaseModel):
@@ -21,25 +32,26 @@ class EnvInfo(BaseModel):
 
 
 env_info: EnvInfo = get_env_info(EnvInfo)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/token")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def token_store_unavailable(e: TokenStoreUnavailable) -> HTTPException:
+    # 失効を確認できないトークンは受け付けない
+    logger.error("Token store unavailable: %s", e)
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is temporarily unavailable",
+    )
 
 
-def authenticate_user(db: Session, username: str, password: str):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
     # 修正: get_user_by_username -> get_user_by_email
-    user = cruds.get_user_by_email(
+    user = await cruds.get_user_by_email(
         db, email=username
     )  # username は実際には email を表している
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -59,9 +71,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-):
+async def create_user_access_token(user) -> str:
+    """ユーザーのロールとトークンバージョンを埋め込んだアクセストークンを発行する
+
+    認可はトークンのroleで行えるため、リクエストごとにユーザーをDBから読む必要がない。
+    """
+    try:
+        version = await get_token_version(user.id)
+    except TokenStoreUnavailable as e:
+        raise token_store_unavailable(e)
+    return create_access_token(
+        {
+            "sub": user.email,
+            "uid": user.id,
+            "role": user.role,
+            "ver": version,
+            "jti": secrets.token_urlsafe(16),
+        }
+    )
+
+
+async def get_token_data(token: str = Depends(oauth2_scheme)) -> schemas.TokenData:
+    """トークンを検証する。失効とバージョンの確認はトークンストアのみで行い、DBは使わない"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -71,15 +102,76 @@ def get_current_user(
         payload = jwt.decode(
             token, env_info.SECRET_KEY, algorithms=[env_info.ALGORITHM]
         )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
+        token_data = schemas.TokenData(
+            username=payload.get("sub"),
+            user_id=payload.get("uid"),
+            role=payload.get("role"),
+            version=payload.get("ver"),
+            jti=payload.get("jti"),
+            expires_at=payload.get("exp"),
+        )
+    except (JWTError, ValidationError):
+        raise credentials_exception
+    # ロールとバージョンを含まない古い形式のトークンは受け付けない
+    if None in (
+        token_data.username,
+        token_data.user_id,
+        token_data.role,
+        token_data.version,
+        token_data.jti,
+    ):
+        raise credentials_exception
+    try:
+        revoked = await is_token_revoked(token_data.jti)
+        version = await get_token_version(token_data.user_id)
+    except TokenStoreUnavailable as e:
+        raise token_store_unavailable(e)
+    if revoked or version != token_data.version:
         raise credentials_exception
-    user = cruds.get_user_by_email(
+    return token_data
+
+
+def require_role(*roles: str):
+    """トークンのロールがrolesのいずれかであることを要求する依存関係を返す"""
+
+    async def check_role(
+        token_data: schemas.TokenData = Depends(get_token_data),
+    ) -> schemas.TokenData:
+        if token_data.role not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions",
+            )
+        return token_data
+
+    return check_role
+
+
+async def revoke_access_token(token_data: schemas.TokenData) -> None:
+    """ログアウトしたトークンを有効期限まで失効させる"""
+    try:
+        await revoke_token(token_data.jti, token_data.expires_at)
+    except TokenStoreUnavailable as e:
+        raise token_store_unavailable(e)
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    token_data: schemas.TokenData = Depends(get_token_data),
+) -> schemas.User:
+    # キャッシュにあればDBを引かない (セッションは実行するまで接続を取得しない)
+    user = await get_cached_user(token_data.username)
+    if user is not None:
+        return user
+    db_user = await cruds.get_user_by_email(
         db, email=token_data.username
     )  # username は実際には email を表している
-    if user is None:
-        raise credentials_exception
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user = schemas.User.model_validate(db_user, from_attributes=True)
+    await set_cached_user(token_data.username, user)
     return user
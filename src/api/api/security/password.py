@@ -1,6 +1,32 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
+from pydantic import BaseModel
+
+from api.get_env import get_env_info
+
+
+class EnvInfo(BaseModel):
+    # bcryptのコスト(2のべき乗の反復回数)。1増やすごとにハッシュ化の時間が約2倍になる
+    BCRYPT_ROUNDS: int = 12
+    # 同時に実行するハッシュ化・照合の数 (0の場合はCPU数)
+    PASSWORD_HASH_CONCURRENCY: int = 0
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=env_info.BCRYPT_ROUNDS
+)
+
+# bcryptは計算中にGILを解放するため、スレッドで並列に実行できる。
+# ワーカー数を超えた分はキューで待つので、同時にCPUを使うのは最大でこの数まで
+_executor = ThreadPoolExecutor(
+    max_workers=env_info.PASSWORD_HASH_CONCURRENCY or os.cpu_count() or 1,
+    thread_name_prefix="password-hash",
+)
 
 
 def verify_password(plain_password, hashed_password):
@@ -9,3 +35,16 @@ def verify_password(plain_password, hashed_password):
 
 def get_password_hash(password):
     return pwd_context.hash(password)
+
+
+# 1回に100ms以上かかるため、非同期の処理からはイベントループを止めないこちらを使う
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, get_password_hash, password)
@@ -0,0 +1,182 @@
+"""アクセストークンの失効とトークンバージョンの管理
+
+エンティティのキャッシュ (api.cache) とは別の、削除されないストアに保存する。
+- 失効: ログアウトしたトークンのjtiを、トークンの有効期限まで保存する
+- バージョン: ユーザーごとの値をトークンのverクレームに埋め込み、ロールやパスワードの
+  変更・削除時に値を増やすことで、そのユーザーの発行済みトークンをまとめて無効にする
+どちらもPostgreSQLを使わずに検証できる。
+
+TOKEN_STORE_REDIS_URL (未設定の場合はREDIS_URL) のRedisを使う。キーが消えると失効したトークンが
+再び使えてしまうため、Redisは maxmemory-policy noeviction と永続化 (AOFなど) を設定して運用する。
+プロセス内のメモリを使う InMemoryTokenStore は他のワーカーに失効が伝わらないため、
+TOKEN_STORE_IN_MEMORY=true を設定したテストでのみ使う。
+ストアが未設定・接続できない場合は TokenStoreUnavailable を送出し、トークンを有効とはみなさない。
+"""
+
+import time
+from typing import Dict, Optional, Union
+
+from pydantic import BaseModel
+
+from api.get_env import get_env_info
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+
+class EnvInfo(BaseModel):
+    TOKEN_STORE_REDIS_URL: str = ""
+    REDIS_URL: str = ""
+    TOKEN_STORE_KEY_PREFIX: str = "auth"
+    # テスト用。本番では複数ワーカー間で失効を共有できないため使わない
+    TOKEN_STORE_IN_MEMORY: bool = False
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+
+class TokenStoreUnavailable(Exception):
+    """トークンストアが未設定、または接続できない"""
+
+
+class InMemoryTokenStore:
+    """テスト用の、件数で削除しないプロセス内のストア"""
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._versions: Dict[int, int] = {}
+
+    async def revoke(self, jti: str, ttl: int) -> None:
+        now = time.monotonic()
+        # 期限切れの失効はトークン自体も期限切れのため、ここでまとめて消す
+        self._revoked = {
+            key: expires_at
+            for key, expires_at in self._revoked.items()
+            if expires_at > now
+        }
+        self._revoked[jti] = now + ttl
+
+    async def is_revoked(self, jti: str) -> bool:
+        return self._revoked.get(jti, 0) > time.monotonic()
+
+    async def get_version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    async def bump_version(self, user_id: int) -> int:
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        return self._versions[user_id]
+
+    async def check(self) -> None:
+        pass
+
+    async def clear(self) -> None:
+        self._revoked.clear()
+        self._versions.clear()
+
+
+class RedisTokenStore:
+    """Redisをバックエンドにしたストア
+
+    キャッシュと違い、エラーはミスとして扱わずに TokenStoreUnavailable にする。
+    バージョンはINCRで増やし、期限を付けずに保存する。
+    """
+
+    def __init__(self, url: str, prefix: str):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._client = redis.from_url(url, decode_responses=True)
+
+    def _revoked_key(self, jti: str) -> str:
+        return f"{self.prefix}:revoked_token:{jti}"
+
+    def _version_key(self, user_id: int) -> str:
+        return f"{self.prefix}:token_version:{user_id}"
+
+    async def _call(self, method: str, *args, **kwargs):
+        try:
+            return await getattr(self._client, method)(*args, **kwargs)
+        except Exception as e:
+            logger.error("Token store %s failed: %s", method, e)
+            raise TokenStoreUnavailable(str(e)) from e
+
+    async def revoke(self, jti: str, ttl: int) -> None:
+        await self._call("set", self._revoked_key(jti), "1", ex=ttl)
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await self._call("exists", self._revoked_key(jti)))
+
+    async def get_version(self, user_id: int) -> int:
+        return int(await self._call("get", self._version_key(user_id)) or 0)
+
+    async def bump_version(self, user_id: int) -> int:
+        return await self._call("incr", self._version_key(user_id))
+
+    async def check(self) -> None:
+        await self._call("ping")
+        try:
+            policy = (await self._client.config_get("maxmemory-policy")).get(
+                "maxmemory-policy"
+            )
+        except Exception as e:
+            # マネージドRedisなどCONFIGが使えない場合は確認しない
+            logger.info("Could not check maxmemory-policy of token store: %s", e)
+            return
+        if policy != "noeviction":
+            logger.warning(
+                "Token store maxmemory-policy is %s; revocations may be evicted "
+                "(set noeviction)",
+                policy,
+            )
+
+
+TokenStore = Union[InMemoryTokenStore, RedisTokenStore]
+
+_redis_url = env_info.TOKEN_STORE_REDIS_URL or env_info.REDIS_URL
+token_store: Optional[TokenStore]
+if _redis_url:
+    token_store = RedisTokenStore(_redis_url, env_info.TOKEN_STORE_KEY_PREFIX)
+elif env_info.TOKEN_STORE_IN_MEMORY:
+    token_store = InMemoryTokenStore()
+else:
+    token_store = None
+
+
+def get_token_store() -> TokenStore:
+    if token_store is None:
+        raise TokenStoreUnavailable("TOKEN_STORE_REDIS_URL or REDIS_URL is not set")
+    return token_store
+
+
+async def check_token_store() -> bool:
+    """起動時にストアに接続できるか確認する
+
+    未設定・接続できない場合も起動は止めず警告だけを出す。その間トークンを使うリクエストは503になる。
+    """
+    try:
+        await get_token_store().check()
+    except TokenStoreUnavailable as e:
+        logger.warning(
+            "Token store unavailable, token endpoints will return 503: %s", e
+        )
+        return False
+    return True
+
+
+async def revoke_token(jti: str, expires_at: float) -> None:
+    ttl = int(expires_at - time.time()) + 1
+    if ttl > 0:
+        await get_token_store().revoke(jti, ttl)
+
+
+async def is_token_revoked(jti: str) -> bool:
+    return await get_token_store().is_revoked(jti)
+
+
+async def get_token_version(user_id: int) -> str:
+    return str(await get_token_store().get_version(user_id))
+
+
+async def bump_token_version(user_id: int) -> None:
+    """ユーザーの発行済みトークンを全て無効にする(コミット後に呼ぶ)"""
+    await get_token_store().bump_version(user_id)
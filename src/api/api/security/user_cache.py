@@ -0,0 +1,58 @@
+"""認証済みユーザーのプロセス内キャッシュ
+
+トークンのsub(email)ごとにユーザーを短いTTLでキャッシュし、認証のたびにDBを引かないようにする。
+emailの変更にも対応できるよう、ユーザーIDからsubへの対応も同じTTLで持つ。
+プロセス内のキャッシュのため、別のワーカーで行った更新はTTLが切れるまで反映されない。
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+import api.schemas as schemas
+from api.cache import InMemoryCache, cache_requests
+from api.get_env import get_env_info
+
+
+class EnvInfo(BaseModel):
+    # 0でキャッシュを無効にする
+    CURRENT_USER_CACHE_TTL: int = 30
+    CURRENT_USER_CACHE_MAX_ENTRIES: int = 10000
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+user_cache = InMemoryCache(env_info.CURRENT_USER_CACHE_MAX_ENTRIES)
+
+
+def _subject_key(subject: str) -> str:
+    return f"sub:{subject}"
+
+
+def _user_id_key(user_id: int) -> str:
+    return f"user_id:{user_id}"
+
+
+async def get_cached_user(subject: str) -> Optional[schemas.User]:
+    if not env_info.CURRENT_USER_CACHE_TTL:
+        return None
+    value = await user_cache.get(_subject_key(subject))
+    if value is None:
+        cache_requests.labels(entity="current_user", result="miss").inc()
+        return None
+    cache_requests.labels(entity="current_user", result="hit").inc()
+    return schemas.User.model_validate_json(value)
+
+
+async def set_cached_user(subject: str, user: schemas.User) -> None:
+    ttl = env_info.CURRENT_USER_CACHE_TTL
+    if ttl:
+        await user_cache.set(_subject_key(subject), user.model_dump_json(), ttl)
+        await user_cache.set(_user_id_key(user.id), subject, ttl)
+
+
+async def invalidate_user(user_id: int) -> None:
+    """更新・削除したユーザーのキャッシュを破棄する(コミット後に呼ぶ)"""
+    subject = await user_cache.get(_user_id_key(user_id))
+    if subject is not None:
+        await user_cache.delete(_subject_key(subject), _user_id_key(user_id))
@@ -1,10 +1,15 @@
+import atexit
 import configparser
+from functools import lru_cache
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+from typing import Optional
 
 from pydantic import BaseModel
 
+from api import metrics
 from api.get_env import get_env_info
 
 
@@ -22,6 +27,10 @@ class LoggerInfo(BaseModel):
     format: str
     max_bytes: int
     backup_count: int
+    # sync: 各ロガーのRotatingFileHandlerで書き込む
+    # queue: キュー経由で別スレッドが整形・書き込みを行う (イベントループを止めない)
+    mode: str = "sync"
+    queue_size: int = 10000
 
 
 def load_logger_config(config_path: str) -> LoggerInfo:
@@ -34,6 +43,8 @@ def load_logger_config(config_path: str) -> LoggerInfo:
     format = config.get("logger", "Format")
     max_bytes = config.getint("logger", "MaxBytes")
     backup_count = config.getint("logger", "BackupCount")
+    mode = config.get("logger", "Mode", fallback="sync")
+    queue_size = config.getint("logger", "QueueSize", fallback=10000)
 
     return LoggerInfo(
         level=level,
@@ -42,36 +53,97 @@ def load_logger_config(config_path: str) -> LoggerInfo:
         format=format,
         max_bytes=max_bytes,
         backup_count=backup_count,
+        mode=mode,
+        queue_size=queue_size,
     )
 
 
-def setup_logger(module_name: str, config_path: str = env_info.LOGGER_CONFIG_PATH):
+@lru_cache(maxsize=None)
+def get_logger_config(config_path: str) -> LoggerInfo:
+    """logger.iniの読み込みとログフォルダの作成をプロセスで1回だけ行う"""
     logger_info = load_logger_config(config_path)
-
     if not os.path.exists(logger_info.folder):
         os.makedirs(logger_info.folder)
+    return logger_info
+
+
+dropped_log_records = metrics.counter(
+    "log_records_dropped",
+    "Log records dropped because the logging queue was full",
+    ("level",),
+)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """キューが満杯のときはINFO以下のレコードを捨て、呼び出し元を待たせない
+
+    WARNING以上は書き込みスレッドが空けるまで待って必ず残す。
+    メッセージの整形(%の展開)も書き込みスレッドで行うため、
+    ログに渡した引数は呼び出し後に変更しないこと。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 同じプロセス内のキューなのでpickle用の整形は不要
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_log_records.labels(level=record.levelname).inc()
 
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_queue_listener: Optional[QueueListener] = None
+
+
+def get_queue_handler(logger_info: LoggerInfo, full_log_path: str) -> QueueHandler:
+    """全ロガーで共有するQueueHandlerを返す。初回に書き込みスレッドを開始する"""
+    global _queue_handler, _queue_listener
+    if _queue_handler is None:
+        file_handler = RotatingFileHandler(
+            full_log_path,
+            maxBytes=logger_info.max_bytes,
+            backupCount=logger_info.backup_count,
+        )
+        file_handler.setFormatter(logging.Formatter(logger_info.format))
+        log_queue: queue.Queue = queue.Queue(maxsize=logger_info.queue_size)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _queue_listener = QueueListener(log_queue, file_handler)
+        _queue_listener.start()
+        # 終了時にキューに残ったレコードを書き出す
+        atexit.register(_queue_listener.stop)
+    return _queue_handler
+
+
+def setup_logger(module_name: str, config_path: str = env_info.LOGGER_CONFIG_PATH):
+    logger_info = get_logger_config(config_path)
     full_log_path = os.path.join(logger_info.folder, logger_info.file)
 
     logger = logging.getLogger(module_name)
     logger.setLevel(logging.getLevelName(logger_info.level))
 
-    handler = RotatingFileHandler(
-        full_log_path,
-        maxBytes=logger_info.max_bytes,
-        backupCount=logger_info.backup_count,
-    )
-    formatter = logging.Formatter(logger_info.format)
-    handler.setFormatter(formatter)
-
     if not logger.handlers:  # Avoid adding multiple handlers to the same logger
-        logger.addHandler(handler)
+        if logger_info.mode == "queue":
+            logger.addHandler(get_queue_handler(logger_info, full_log_path))
+        else:
+            handler = RotatingFileHandler(
+                full_log_path,
+                maxBytes=logger_info.max_bytes,
+                backupCount=logger_info.backup_count,
+            )
+            formatter = logging.Formatter(logger_info.format)
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
 
     def log_decorator(func):
         def wrapper(*args, **kwargs):
-            logger.info(f"Function {func.__name__} started")
+            logger.info("Function %s started", func.__name__)
             result = func(*args, **kwargs)
-            logger.info(f"Function {func.__name__} finished")
+            logger.info("Function %s finished", func.__name__)
             return result
 
         return wrapper
@@ -0,0 +1,122 @@
+"""リクエストごとのSQLの実行回数と実行時間を計測する
+
+エンジンのbefore/after_cursor_executeイベントで、リクエストごとの集計(contextvar)に
+文の数と実行時間を加算する。ミドルウェアはレスポンスに
+Server-Timing: db;dur=<ミリ秒>;desc="<n> queries" ヘッダを付け、
+文の数がSQL_STATEMENT_BUDGETを超えたエンドポイントを警告としてログに出す (N+1の検出用)。
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api import metrics
+from api.get_env import get_env_info
+from api.request_metrics import route_template
+from api.setup_logger import setup_logger
+
+logger, log_decorator = setup_logger(__name__)
+
+
+class EnvInfo(BaseModel):
+    # 1リクエストで実行してよいSQL文の数。超えた場合に警告を出す (0で無効)
+    SQL_STATEMENT_BUDGET: int = 20
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+db_statements = metrics.histogram(
+    "http_request_db_statements",
+    "SQL statements executed per HTTP request",
+    ("method", "route"),
+    buckets=STATEMENT_BUCKETS,
+)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+
+# リクエストの外(起動時やスクリプト)で実行した文は集計しない
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "sql_query_stats", default=None
+)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 開始時刻は文ごとの実行コンテキストに持たせる。失敗した文ではafter_cursor_executeが
+    # 呼ばれないため、接続に積むと取り出されない値が残り、以降の文の計測がずれる
+    if _current_stats.get() is not None and context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = getattr(context, "_query_start", None)
+    if stats is None or started is None:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started
+
+
+def register_sql_timing(engine: AsyncEngine) -> None:
+    """エンジンで実行した文をリクエストごとの集計に加算する"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SqlTimingMiddleware:
+    def __init__(self, app: ASGIApp, budget: Optional[int] = None):
+        self.app = app
+        self.budget = env_info.SQL_STATEMENT_BUDGET if budget is None else budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # エンドポイントや依存関係は同じコンテキストで実行されるため、同じオブジェクトに加算される
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                server_timing = (
+                    f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            method = scope["method"]
+            route = route_template(scope)
+            db_statements.labels(method=method, route=route).observe(stats.count)
+            if 0 < self.budget < stats.count:
+                logger.warning(
+                    "%s %s executed %d SQL statements (budget %d, %.1f ms)",
+                    method,
+                    route,
+                    stats.count,
+                    self.budget,
+                    stats.seconds * 1000,
+                )
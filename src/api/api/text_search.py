@@ -0,0 +1,183 @@
+"""日本語(CJK)を含むテキストの全文検索用トークナイザと、pg_trgmによるあいまい検索
+
+日本語は単語の区切りに空白を使わないため、CJK文字の連続はbigram
+(2文字ずつずらした部分文字列)に分割し、それ以外は単語単位で扱う。
+生成した文書はPostgreSQLのtsvectorリテラル形式で保存し、
+パーサやロケールに依存せずに ``CAST(search_text AS tsvector)`` で索引できる。
+"""
+
+from enum import Enum
+import re
+import unicodedata
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy import and_, cast, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import TSQUERY, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.get_env import get_env_info
+
+
+class EnvInfo(BaseModel):
+    # あいまい検索(pg_trgm)で一致とみなすword_similarityの下限 (0〜1)
+    TRGM_SIMILARITY_THRESHOLD: float = 0.3
+
+
+env_info: EnvInfo = get_env_info(EnvInfo)
+
+
+class SearchMode(str, Enum):
+    contains = "contains"
+    fulltext = "fulltext"
+
+
+class FuzzySearchMode(str, Enum):
+    contains = "contains"
+    trigram = "trigram"
+
+
+_CJK_CHARS = (
+    "々〆"  # 々〆
+    "ぁ-ゖ"  # ひらがな
+    "ァ-ヺー"  # カタカナ・長音
+    "㐀-䶿"  # CJK統合漢字拡張A
+    "一-鿿"  # CJK統合漢字
+    "豈-﫿"  # CJK互換漢字
+)
+_TOKEN_RE = re.compile(rf"(?P<cjk>[{_CJK_CHARS}]+)|(?P<word>[^\W_{_CJK_CHARS}]+)")
+
+
+def _runs(text: str) -> Iterator[Tuple[str, str]]:
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    for match in _TOKEN_RE.finditer(normalized):
+        yield match.lastgroup, match.group()
+
+
+def _bigrams(run: str) -> List[str]:
+    return [run[i : i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """テキストを索引用のトークン列に分割する
+
+    CJK文字列はbigramに加えて末尾の1文字も出力する。これにより1文字の
+    検索語でも前方一致 (``'京':*``) で全ての出現位置にヒットする。
+    """
+    if not text:
+        return []
+    tokens: List[str] = []
+    for kind, run in _runs(text):
+        if kind == "cjk":
+            tokens.extend(_bigrams(run))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def to_search_document(*weighted_texts: Tuple[Optional[str], str]) -> str:
+    """(テキスト, 重み) の組からtsvectorリテラルを生成する
+
+    例: ``to_search_document((title, "A"), (content, "D"))``
+    """
+    positions: dict = {}
+    position = 0
+    for text, weight in weighted_texts:
+        for token in tokenize(text):
+            position = min(position + 1, 16383)  # tsvectorの位置の上限
+            positions.setdefault(token, []).append(f"{position}{weight}")
+    return " ".join(
+        f"'{token}':{','.join(token_positions[:256])}"
+        for token, token_positions in positions.items()
+    )
+
+
+def to_tsquery_text(keyword: str) -> str:
+    """検索語をtsqueryリテラルに変換する。トークンが無い場合は空文字を返す
+
+    CJK文字列のbigramは隣接演算子 (<->) でつなぎ、語と語はANDで結合する。
+    """
+    terms: List[str] = []
+    for kind, run in _runs(keyword):
+        if kind == "cjk" and len(run) == 1:
+            terms.append(f"'{run}':*")
+        elif kind == "cjk":
+            terms.append(" <-> ".join(f"'{bigram}'" for bigram in _bigrams(run)))
+        else:
+            terms.append(f"'{run}'")
+    return " & ".join(f"({term})" for term in terms)
+
+
+def is_postgresql(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+
+def fulltext_clauses(db: AsyncSession, document_column, keyword: str):
+    """全文検索の (WHERE句, ORDER BY句) を返す。検索語が空なら None
+
+    PostgreSQLではtsvectorのGIN索引とts_rankを使う。それ以外(テスト用の
+    SQLiteなど)ではトークンの部分一致にフォールバックし、順位付けはしない。
+    """
+    query_text = to_tsquery_text(keyword)
+    if not query_text:
+        return None
+    if is_postgresql(db):
+        vector = cast(document_column, TSVECTOR)
+        query = cast(query_text, TSQUERY)
+        return vector.op("@@")(query), func.ts_rank(vector, query).desc()
+    conditions = []
+    for kind, run in _runs(keyword):
+        if kind == "cjk" and len(run) == 1:
+            conditions.append(document_column.contains(f"'{run}"))
+        elif kind == "cjk":
+            conditions.extend(
+                document_column.contains(f"'{bigram}':") for bigram in _bigrams(run)
+            )
+        else:
+            conditions.append(document_column.contains(f"'{run}':"))
+    return and_(*conditions), None
+
+
+async def set_similarity_threshold(
+    db: AsyncSession, threshold: Optional[float] = None
+) -> None:
+    """現在のトランザクション内でのみ有効なword_similarityの閾値を設定する
+
+    thresholdを省略した場合は ``TRGM_SIMILARITY_THRESHOLD`` を使う。
+
+    閾値はGIN索引が使える演算子 (<%) の判定に使われるため、
+    ``word_similarity(...) > threshold`` のような関数呼び出しではなくGUCで渡す。
+    """
+    if threshold is None:
+        threshold = env_info.TRGM_SIMILARITY_THRESHOLD
+    if is_postgresql(db):
+        await db.execute(
+            select(
+                func.set_config(
+                    "pg_trgm.word_similarity_threshold", str(threshold), True
+                )
+            )
+        )
+
+
+def trigram_clauses(db: AsyncSession, columns: Sequence, keyword: str):
+    """あいまい検索の (WHERE句, ORDER BY句) を返す
+
+    PostgreSQLでは各列のgin_trgm_ops索引を ``keyword <% column`` で使い、
+    最も似ている列のword_similarityの降順に並べる。それ以外のDBでは
+    大文字小文字を区別しない部分一致にフォールバックし、順位付けはしない。
+    """
+    keyword = unicodedata.normalize("NFKC", keyword)
+    if is_postgresql(db):
+        term = literal(keyword)
+        where = or_(*(term.op("<%")(column) for column in columns))
+        rank = func.greatest(
+            *(
+                func.coalesce(func.word_similarity(term, column), 0)
+                for column in columns
+            )
+        )
+        return where, rank.desc()
+    pattern = keyword.lower()
+    return or_(*(func.lower(column).contains(pattern) for column in columns)), None
@@ -0,0 +1,75 @@
+"""パスワードのハッシュ化がイベントループの応答性に与える影響を計測する
+
+同時にN件のユーザー登録(ハッシュ化)を行っている間、10msごとに起きるタスクの
+遅れ(イベントループの遅延)を計測し、イベントループ上で直接ハッシュ化する場合と
+ワーカースレッドで実行する場合(get_password_hash_async)を比較する。
+
+    python -m benchmark_password_hash --signups 20
+    BCRYPT_ROUNDS=10 PASSWORD_HASH_CONCURRENCY=2 python -m benchmark_password_hash
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from api.security.password import (
+    env_info,
+    get_password_hash,
+    get_password_hash_async,
+)
+
+TICK_SECONDS = 0.01
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    # 予定より何秒遅れて起きたかを記録する
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def signup_blocking(password: str) -> str:
+    return get_password_hash(password)
+
+
+async def signup_offloaded(password: str) -> str:
+    return await get_password_hash_async(password)
+
+
+async def run(signup, signups: int) -> None:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    await asyncio.sleep(TICK_SECONDS)
+    start = time.perf_counter()
+    await asyncio.gather(*(signup(f"password-{i}") for i in range(signups)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{signup.__name__:<18} total {elapsed:6.2f}s  "
+        f"loop lag median {statistics.median(lags_ms):7.1f}ms  "
+        f"p99 {p99:7.1f}ms  max {lags_ms[-1]:7.1f}ms"
+    )
+
+
+async def main(signups: int) -> None:
+    print(
+        f"{signups} concurrent signups, BCRYPT_ROUNDS={env_info.BCRYPT_ROUNDS}, "
+        f"PASSWORD_HASH_CONCURRENCY={env_info.PASSWORD_HASH_CONCURRENCY or 'cpu_count'}"
+    )
+    await run(signup_blocking, signups)
+    await run(signup_offloaded, signups)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signups", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.signups))
@@ -0,0 +1,118 @@
+"""APIのコールドスタートにかかる時間を計測する
+
+毎回新しいPythonプロセスで `import main` を実行し、import時間の中央値と最小値を表示する。
+--first-request を指定すると、uvicornを起動してから最初のリクエスト(/health)に
+応答するまでの時間(time-to-first-request)も計測する。
+--top を指定すると `python -X importtime` の結果から自己時間の長いモジュールを表示する。
+
+    python -m benchmark_startup --runs 10
+    python -m benchmark_startup --runs 5 --first-request
+    python -m benchmark_startup --top 15
+"""
+
+import argparse
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import httpx
+
+# 起動できない場合(ポートの競合など)に待つ上限
+FIRST_REQUEST_TIMEOUT_SECONDS = 60
+
+MEASURE_IMPORT = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import(runs: int) -> List[float]:
+    seconds = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", MEASURE_IMPORT],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        seconds.append(float(result.stdout.strip().splitlines()[-1]))
+    return seconds
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(runs: int) -> List[float]:
+    seconds = []
+    for _ in range(runs):
+        port = _free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - start < FIRST_REQUEST_TIMEOUT_SECONDS:
+                try:
+                    response = httpx.get(f"http://127.0.0.1:{port}/health")
+                    if response.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+            else:
+                raise RuntimeError("API did not respond to /health")
+            seconds.append(time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+    return seconds
+
+
+def slowest_modules(top: int) -> List[Tuple[int, str]]:
+    # importtimeの出力: "import time: self [us] | cumulative | imported package"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[0].strip().isdigit():
+            modules.append((int(parts[0]), parts[2].strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-request", action="store_true")
+    parser.add_argument("--top", type=int, default=0)
+    args = parser.parse_args()
+
+    seconds = [s * 1000 for s in measure_import(args.runs)]
+    print(
+        f"import main: median {statistics.median(seconds):.0f}ms  "
+        f"min {min(seconds):.0f}ms  ({args.runs} runs)"
+    )
+    if args.first_request:
+        seconds = [s * 1000 for s in measure_first_request(args.runs)]
+        print(
+            f"first request: median {statistics.median(seconds):.0f}ms  "
+            f"min {min(seconds):.0f}ms  ({args.runs} runs)"
+        )
+    for self_us, module in slowest_modules(args.top):
+        print(f"{self_us / 1000:8.1f}ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
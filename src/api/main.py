@@ -1,7 +1,17 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
-import migrate_db
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from api import metrics
+from api.compression import CacheControlMiddleware, CompressionMiddleware
+from api.db import READ_PRIMARY_COOKIE, db_engine, dispose_engines
+from api.request_metrics import RequestMetricsMiddleware
+from api.schema_version import log_pending_migrations
+from api.security.token_store import check_token_store
+from api.sql_timing import SqlTimingMiddleware
 from api.routers import (
+    auth,
     user,
     article,
     photo,
@@ -12,8 +22,43 @@ from api.routers import (
     cultural_insight,
 )
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 未適用のマイグレーションがあれば警告する (適用は python -m migrate_db で行う)。
+    # APIのプロセスではmigrate_dbと同期エンジンを読み込まず、リクエストと同じ非同期エンジンで確認する
+    await log_pending_migrations(db_engine)
+    # トークンストアが使えなくても公開エンドポイントは提供し、トークンを使うリクエストだけ503にする
+    await check_token_store()
+    yield
+    await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
+# 各ルーターのCACHE_CONTROLを、そのルーターのパス以下のGET/HEADのレスポンスに付ける。
+# 書き込み直後のクライアント(プライマリから読む)へのレスポンスはprivateにする
+app.add_middleware(
+    CacheControlMiddleware,
+    private_cookie=READ_PRIMARY_COOKIE,
+    policies={
+        f"/v1{router.router_v1.prefix}": router.CACHE_CONTROL
+        for router in (
+            user,
+            article,
+            photo,
+            translation,
+            tourist_spot,
+            restaurant,
+            feedback,
+            cultural_insight,
+        )
+    },
+)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(SqlTimingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
+app.include_router(auth.router_v1, prefix="/v1")
 app.include_router(user.router_v1, prefix="/v1")
 app.include_router(article.router_v1, prefix="/v1")
 app.include_router(photo.router_v1, prefix="/v1")
@@ -34,6 +79,11 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(metrics.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
 
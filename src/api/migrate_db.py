@@ -1,10 +1,44 @@
-from sqlalchemy import create_engine
+"""スキーマのマイグレーション
 
-from api.db import Base, db_engine_sync
+テーブルの新規作成はBase.metadata.create_allで行い、既存のデータベースに対する
+変更(列の追加、索引の追加など)はMIGRATIONSにバージョン順に定義する。
+適用済みのバージョンはschema_migrationsテーブルに記録する。
+
+使い方:
+    python -m migrate_db            # 未適用のマイグレーションを適用する (upgrade)
+    python -m migrate_db status     # 未適用のマイグレーションを表示する
+    python -m migrate_db reset      # 全テーブルを削除して作り直す
+"""
+
+import argparse
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, List, Set
+
+from sqlalchemy import (
+    Index,
+    bindparam,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from api.db import Base, get_sync_engine
+from api.schema_version import (
+    LATEST_SCHEMA_VERSION,
+    get_applied_versions as _get_applied_versions,
+    migration_metadata,
+    schema_migrations,
+)
+from api.setup_logger import setup_logger
 
 # モデルクラスをインポート
 from api.models.user import User
-from api.models.article import Article
+from api.models.article import Article, article_search_document
 from api.models.article_restaurant import ArticleRestaurant
 from api.models.article_tourist_spot import ArticleTouristSpot
 from api.models.photo import Photo
@@ -14,15 +48,306 @@ from api.models.restaurant import Restaurant
 from api.models.feedback import Feedback
 from api.models.cultural_insight import CulturalInsight
 
+logger, log_decorator = setup_logger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+# マイグレーションを行うプロセスでのみ同期エンジンを作成する
+db_engine_sync = get_sync_engine()
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+    # FalseのマイグレーションはAUTOCOMMITの接続で実行する (CREATE INDEX CONCURRENTLYなど)
+    transactional: bool = True
+
+
+def _index(table, name: str) -> Index:
+    return next(index for index in table.__table__.indexes if index.name == name)
+
+
+@contextmanager
+def _concurrently(index: Index) -> Iterator[Index]:
+    # モデルに定義した索引をそのまま使い、このマイグレーションの間だけCONCURRENTLYにする
+    options = index.dialect_options["postgresql"]
+    options["concurrently"] = True
+    try:
+        yield index
+    finally:
+        options["concurrently"] = False
+
+
+def create_indexes_concurrently(conn: Connection, *indexes: Index) -> None:
+    """テーブルをロックせずに索引を作成する (PostgreSQL以外では通常のCREATE INDEX)
+
+    途中で失敗した場合はINVALIDな索引が残るため、DROP INDEXしてから再実行すること。
+    """
+    for index in indexes:
+        with _concurrently(index):
+            index.create(conn, checkfirst=True)
+        logger.info(f"Created index {index.name}")
+
+
+def _add_article_search_text(conn: Connection) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("articles")}
+    if "search_text" not in columns:
+        conn.execute(text("ALTER TABLE articles ADD COLUMN search_text TEXT"))
+    articles = Article.__table__
+    backfill = (
+        update(articles)
+        .where(articles.c.id == bindparam("article_id"))
+        .values(search_text=bindparam("document"))
+    )
+    backfilled = 0
+    while True:
+        rows = conn.execute(
+            select(articles.c.id, articles.c.title, articles.c.content)
+            .where(articles.c.search_text.is_(None))
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            backfill,
+            [
+                {
+                    "article_id": row.id,
+                    "document": article_search_document(row.title, row.content),
+                }
+                for row in rows
+            ],
+        )
+        backfilled += len(rows)
+    logger.info(f"Backfilled search_text for {backfilled} articles")
+
+
+def _create_article_search_index(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        create_indexes_concurrently(conn, _index(Article, "ix_articles_search_text"))
+
+
+def _create_trigram_indexes(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    create_indexes_concurrently(
+        conn,
+        *(
+            _index(TouristSpot, f"ix_tourist_spots_{column}_trgm")
+            for column in ("name", "location", "description")
+        ),
+        *(
+            _index(Restaurant, f"ix_restaurants_{column}_trgm")
+            for column in ("name", "location", "cuisine")
+        ),
+    )
+
+
+def _create_foreign_key_indexes(conn: Connection) -> None:
+    create_indexes_concurrently(
+        conn,
+        _index(Article, "ix_articles_author_id"),
+        _index(Photo, "ix_photos_article_id"),
+        _index(Translation, "ix_translations_article_id_language"),
+        _index(Feedback, "ix_feedbacks_article_id"),
+        _index(Feedback, "ix_feedbacks_user_id"),
+        _index(CulturalInsight, "ix_cultural_insights_article_id"),
+        _index(ArticleTouristSpot, "ix_article_tourist_spots_article_id"),
+        _index(ArticleTouristSpot, "ix_article_tourist_spots_tourist_spot_id"),
+        _index(ArticleRestaurant, "ix_article_restaurants_article_id"),
+        _index(ArticleRestaurant, "ix_article_restaurants_restaurant_id"),
+    )
+
+
+def _set_foreign_key_on_delete(conn: Connection) -> None:
+    # SQLiteは外部キー制約を変更できないため、PostgreSQLのみ
+    if conn.dialect.name != "postgresql":
+        return
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {
+            tuple(fk["constrained_columns"]): fk
+            for fk in inspect(conn).get_foreign_keys(table.name)
+        }
+        for constraint in table.foreign_key_constraints:
+            if constraint.ondelete is None:
+                continue
+            fk = existing.get(tuple(constraint.column_keys))
+            if fk is None or fk["options"].get("ondelete") == constraint.ondelete:
+                continue
+            name = preparer.quote(fk["name"])
+            columns = ", ".join(preparer.quote(c) for c in constraint.column_keys)
+            referred = ", ".join(
+                preparer.quote(element.column.name) for element in constraint.elements
+            )
+            # NOT VALIDで追加してから検証し、既存行の検証中に書き込みを止めない
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"DROP CONSTRAINT {name}, "
+                    f"ADD CONSTRAINT {name} FOREIGN KEY ({columns}) "
+                    f"REFERENCES {preparer.format_table(constraint.referred_table)} "
+                    f"({referred}) ON DELETE {constraint.ondelete} NOT VALID"
+                )
+            )
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"VALIDATE CONSTRAINT {name}"
+                )
+            )
+            logger.info(
+                f"Set ON DELETE {constraint.ondelete} on {table.name}.{columns}"
+            )
+
+
+def _create_association_unique_indexes(conn: Connection) -> None:
+    indexes = []
+    for model, other in (
+        (ArticleTouristSpot, "tourist_spot_id"),
+        (ArticleRestaurant, "restaurant_id"),
+    ):
+        table = model.__table__
+        # 一意索引を作る前に、同じ組の重複は最も古い行だけを残して削除する
+        keep = (
+            select(func.min(table.c.id))
+            .group_by(table.c.article_id, table.c[other])
+            .scalar_subquery()
+        )
+        removed = conn.execute(table.delete().where(table.c.id.not_in(keep))).rowcount
+        logger.info(f"Removed {removed} duplicate rows from {table.name}")
+        indexes.append(_index(model, f"uq_{table.name}_article_id_{other}"))
+    create_indexes_concurrently(conn, *indexes)
+
+
+# 新しいマイグレーションは末尾に追加し、適用済みのものは変更しないこと
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Add and backfill articles.search_text", _add_article_search_text),
+    Migration(
+        2,
+        "Create GIN index on articles.search_text",
+        _create_article_search_index,
+        transactional=False,
+    ),
+    Migration(
+        3,
+        "Create pg_trgm indexes for tourist spot and restaurant search",
+        _create_trigram_indexes,
+        transactional=False,
+    ),
+    Migration(
+        4,
+        "Create indexes on foreign key columns",
+        _create_foreign_key_indexes,
+        transactional=False,
+    ),
+    Migration(
+        5,
+        "Add ON DELETE CASCADE / SET NULL to foreign keys",
+        _set_foreign_key_on_delete,
+        transactional=False,
+    ),
+    Migration(
+        6,
+        "Create unique indexes on article association pairs",
+        _create_association_unique_indexes,
+        transactional=False,
+    ),
+]
+
+
+def check_migration_versions(migrations: List[Migration]) -> None:
+    """バージョンが1からの連番で、最後がLATEST_SCHEMA_VERSIONと一致することを確認する
+
+    APIの起動時はmigrate_dbを読み込まずにLATEST_SCHEMA_VERSIONで未適用を判定するため、
+    マイグレーションを追加して定数を更新し忘れた場合はここで失敗させる。
+    """
+    versions = [migration.version for migration in migrations]
+    if versions != list(range(1, LATEST_SCHEMA_VERSION + 1)):
+        raise RuntimeError(
+            f"Migration versions {versions} do not match "
+            f"api.schema_version.LATEST_SCHEMA_VERSION = {LATEST_SCHEMA_VERSION}"
+        )
+
+
+check_migration_versions(MIGRATIONS)
+
+
+def get_applied_versions(engine: Engine = db_engine_sync) -> Set[int]:
+    with engine.connect() as conn:
+        return _get_applied_versions(conn)
+
+
+def get_pending_migrations(engine: Engine = db_engine_sync) -> List[Migration]:
+    applied = get_applied_versions(engine)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        schema_migrations.insert().values(
+            version=migration.version,
+            description=migration.description,
+            applied_at=datetime.now(),
+        )
+    )
+
+
+def stamp(engine: Engine, migrations: List[Migration]) -> None:
+    """マイグレーションを実行せずに適用済みとして記録する"""
+    with engine.begin() as conn:
+        for migration in migrations:
+            _record(conn, migration)
+
+
+def upgrade(engine: Engine = db_engine_sync) -> List[Migration]:
+    """未適用のマイグレーションをバージョン順に適用し、適用したものを返す"""
+    migration_metadata.create_all(engine)
+    pending = get_pending_migrations(engine)
+    for migration in pending:
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        if migration.transactional:
+            with engine.begin() as conn:
+                migration.upgrade(conn)
+                _record(conn, migration)
+        else:
+            with engine.connect() as conn:
+                migration.upgrade(conn.execution_options(isolation_level="AUTOCOMMIT"))
+            stamp(engine, [migration])
+    return pending
+
 
-def reset_database():
-    Base.metadata.drop_all(bind=db_engine_sync)
-    Base.metadata.create_all(bind=db_engine_sync)
+def create_database(engine: Engine = db_engine_sync) -> None:
+    """テーブルを作成し、既存のデータベースであれば未適用のマイグレーションを適用する"""
+    is_new_database = not inspect(engine).has_table(Article.__tablename__)
+    Base.metadata.create_all(bind=engine)
+    migration_metadata.create_all(engine)
+    if is_new_database:
+        # create_allで最新のスキーマが作られるため、全て適用済みとして記録する
+        stamp(engine, get_pending_migrations(engine))
+    else:
+        upgrade(engine)
 
 
-def create_database():
-    Base.metadata.create_all(bind=db_engine_sync)
+def reset_database(engine: Engine = db_engine_sync) -> None:
+    Base.metadata.drop_all(bind=engine)
+    migration_metadata.drop_all(engine)
+    create_database(engine)
 
 
 if __name__ == "__main__":
-    reset_database()
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    parser.add_argument(
+        "command", nargs="?", default="upgrade", choices=["upgrade", "status", "reset"]
+    )
+    args = parser.parse_args()
+    if args.command == "status":
+        for migration in get_pending_migrations():
+            print(f"{migration.version}: {migration.description}")
+    elif args.command == "reset":
+        reset_database()
+    else:
+        create_database()
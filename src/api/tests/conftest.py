@@ -1,21 +1,55 @@
+import os
+from datetime import datetime
+
+# テストではRedisを使わず、トークンストアとキャッシュにプロセス内のメモリを使う
+# (importより前に設定する)
+os.environ.setdefault("TOKEN_STORE_IN_MEMORY", "true")
+os.environ.setdefault("CACHE_IN_MEMORY", "true")
+
 import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from typing import AsyncGenerator
 
-from api.db import get_db, Base
+import api.models as models
+from api.cache import cache
+from api.db import get_db, get_read_db, Base
+from api.security.token_store import token_store
+from api.security.user_cache import user_cache
 from main import app
 
 ASYNC_DB_URL = "sqlite+aiosqlite:///:memory:"
 
 
+def enable_foreign_keys(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def clear_cache() -> AsyncGenerator[None, None]:
+    # テストごとにDBを作り直すため、前のテストのIDでキャッシュが残らないようにする
+    await cache.clear()
+    await user_cache.clear()
+    await token_store.clear()
+    yield
+
+
 @pytest_asyncio.fixture
 async def async_session() -> AsyncGenerator[AsyncSession, None]:
     async_engine = create_async_engine(ASYNC_DB_URL, echo=True)
+    # SQLiteは接続ごとに有効にしないと外部キー制約 (ON DELETE) を適用しない
+    event.listen(async_engine.sync_engine, "connect", enable_foreign_keys)
     async_session = sessionmaker(
-        autocommit=False, autoflush=False, bind=async_engine, class_=AsyncSession
+        autocommit=False,
+        autoflush=False,
+        bind=async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
     )
 
     async with async_engine.begin() as conn:
@@ -26,6 +60,23 @@ async def async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+@pytest_asyncio.fixture
+async def author(async_session: AsyncSession) -> models.User:
+    # 外部キー制約を有効にしているため、author_id=1 の記事を作るテストは先に著者を作る
+    user = models.User(
+        id=1,
+        username="author",
+        email="author@example.com",
+        role="user",
+        hashed_password="",
+        created_at=datetime.now(),
+        updated_at=datetime.now(),
+    )
+    async_session.add(user)
+    await async_session.commit()
+    return user
+
+
 @pytest_asyncio.fixture
 async def async_client(
     async_session: AsyncSession,
@@ -34,6 +85,7 @@ async def async_client(
         yield async_session
 
     app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_read_db] = get_test_db
 
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
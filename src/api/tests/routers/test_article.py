@@ -1,5 +1,6 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from main import app
@@ -7,8 +8,12 @@ from api.db import Base, get_db
 import api.models as models
 import api.schemas as schemas
 import api.cruds as cruds
+from api.models.article import article_search_document
+from api.cache import cache_requests
+from api.metrics import REGISTRY
+from api.pagination import NEXT_CURSOR_HEADER
 
-pytestmark = pytest.mark.asyncio
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("author")]
 
 
 async def test_create_article(async_client: AsyncClient, async_session: AsyncSession):
@@ -75,6 +80,34 @@ async def test_read_article_not_found(async_client: AsyncClient):
     assert response.json()["detail"] == "Article not found"
 
 
+async def test_read_article_conditional(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    article = schemas.ArticleCreate(
+        title="Test Article", content="Content", status="draft", author_id=1
+    )
+    db_article = await cruds.create_article(db=async_session, article=article)
+    url = f"/v1/articles/{db_article.id}"
+
+    response = await async_client.get(url)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    response = await async_client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # 更新するとETagが変わり、本文を返す
+    await async_client.put(url, json={"title": "Updated Test Article"})
+    response = await async_client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["title"] == "Updated Test Article"
+
+
 async def test_update_article(async_client: AsyncClient, async_session: AsyncSession):
     article = schemas.ArticleCreate(
         title="Test Article", content="Content", status="draft", author_id=1
@@ -98,6 +131,52 @@ async def test_update_article(async_client: AsyncClient, async_session: AsyncSes
     assert data["status"] == updated_article_data["status"]
 
 
+async def test_update_article_single_statement(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    article = schemas.ArticleCreate(
+        title="Kyoto temples", content="Kinkakuji", status="draft", author_id=1
+    )
+    db_article = await cruds.create_article(db=async_session, article=article)
+
+    statements = []
+    sync_engine = async_session.bind.sync_engine
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        response = await async_client.put(
+            f"/v1/articles/{db_article.id}", json={"status": "published"}
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Kyoto temples"
+    assert response.json()["status"] == "published"
+    # 事前のSELECTやrefreshを行わず、UPDATE ... RETURNING の1文だけ
+    assert [s.split()[0].upper() for s in statements] == ["UPDATE"]
+
+    # タイトルだけを更新しても検索用の列は本文を含めて作り直される。
+    # 本文だけを読み、UPDATEは1文で済む
+    statements.clear()
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        response = await async_client.put(
+            f"/v1/articles/{db_article.id}", json={"title": "Osaka castles"}
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert [s.split()[0].upper() for s in statements] == ["SELECT", "UPDATE"]
+    assert "content" in statements[0] and "title" not in statements[0]
+    db_article = await async_session.get(
+        models.Article, db_article.id, populate_existing=True
+    )
+    assert db_article.search_text == article_search_document(
+        "Osaka castles", "Kinkakuji"
+    )
+
+
 async def test_update_article_not_found(async_client: AsyncClient):
     updated_article_data = {
         "title": "Updated Test Article",
@@ -124,6 +203,28 @@ async def test_delete_article(async_client: AsyncClient, async_session: AsyncSes
     assert db_article is None
 
 
+async def test_delete_article_single_statement(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    article = schemas.ArticleCreate(
+        title="Test Article", content="Content", status="draft", author_id=1
+    )
+    db_article = await cruds.create_article(db=async_session, article=article)
+
+    statements = []
+    sync_engine = async_session.bind.sync_engine
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        response = await async_client.delete(f"/v1/articles/{db_article.id}")
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 204
+    # 行を読み込まずに DELETE ... RETURNING の1文だけ (子の行はON DELETE CASCADE)
+    assert [s.split()[0].upper() for s in statements] == ["DELETE"]
+
+
 async def test_delete_article_not_found(async_client: AsyncClient):
     response = await async_client.delete("/v1/articles/999")
     assert response.status_code == 404
@@ -194,3 +295,224 @@ async def test_create_cultural_insight_for_article(
     data = response.json()
     assert data["content"] == cultural_insight_data["content"]
     assert data["article_id"] == db_article.id
+
+
+async def test_read_articles_with_cursor(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    for i in range(5):
+        await cruds.create_article(
+            db=async_session,
+            article=schemas.ArticleCreate(
+                title=f"Test Article {i}",
+                content=f"Content {i}",
+                status="draft",
+                author_id=1,
+            ),
+        )
+
+    response = await async_client.get("/v1/articles/", params={"limit": 2})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [article["title"] for article in first_page] == [
+        "Test Article 0",
+        "Test Article 1",
+    ]
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+
+    titles = [article["title"] for article in first_page]
+    while cursor:
+        response = await async_client.get(
+            "/v1/articles/", params={"limit": 2, "after": cursor}
+        )
+        assert response.status_code == 200
+        titles.extend(article["title"] for article in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+
+    assert titles == [f"Test Article {i}" for i in range(5)]
+
+
+async def test_read_articles_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/v1/articles/", params={"after": "!!"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+async def test_search_articles_fulltext(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    for title, content in [
+        ("京都の寺社めぐり", "清水寺と金閣寺を一日で回るモデルコース"),
+        ("東京駅周辺のランチ", "丸の内で人気のレストランを紹介します"),
+        ("Osaka street food", "Takoyaki and okonomiyaki in Dotonbori"),
+    ]:
+        await cruds.create_article(
+            db=async_session,
+            article=schemas.ArticleCreate(
+                title=title, content=content, status="published", author_id=1
+            ),
+        )
+
+    response = await async_client.get(
+        "/v1/articles/search", params={"keyword": "金閣寺"}
+    )
+    assert response.status_code == 200
+    assert [article["title"] for article in response.json()] == ["京都の寺社めぐり"]
+
+    response = await async_client.get("/v1/articles/search", params={"keyword": "京"})
+    assert {article["title"] for article in response.json()} == {
+        "京都の寺社めぐり",
+        "東京駅周辺のランチ",
+    }
+
+    response = await async_client.get(
+        "/v1/articles/search", params={"keyword": "TAKOYAKI"}
+    )
+    assert [article["title"] for article in response.json()] == [
+        "Osaka street food"
+    ]
+
+    response = await async_client.get(
+        "/v1/articles/search", params={"keyword": "京都 ランチ"}
+    )
+    assert response.json() == []
+
+
+async def test_search_articles_contains(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    await cruds.create_article(
+        db=async_session,
+        article=schemas.ArticleCreate(
+            title="Test Article", content="Content", status="draft", author_id=1
+        ),
+    )
+    response = await async_client.get(
+        "/v1/articles/search", params={"keyword": "Arti", "mode": "contains"}
+    )
+    assert response.status_code == 200
+    assert [article["title"] for article in response.json()] == ["Test Article"]
+
+
+async def test_create_articles_bulk(
+    async_client: AsyncClient, async_session: AsyncSession, author: models.User
+):
+    user = author
+    rows = [
+        {
+            "title": "京都の寺",
+            "content": "金閣寺",
+            "status": "draft",
+            "author_id": user.id,
+        },
+        {"title": "Missing content", "status": "draft", "author_id": user.id},
+        {"title": "No author", "content": "x", "status": "draft", "author_id": 999},
+        {
+            "title": "Osaka",
+            "content": "Takoyaki",
+            "status": "draft",
+            "author_id": user.id,
+        },
+    ]
+    response = await async_client.post("/v1/articles/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+    assert [article["title"] for article in data["created"]] == ["京都の寺", "Osaka"]
+    assert all("id" in article for article in data["created"])
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    assert data["errors"][0]["errors"][0]["loc"] == ["content"]
+
+    # before_insertを経由しないため、検索用の列が一括作成でも設定されていること
+    response = await async_client.get(
+        "/v1/articles/search", params={"keyword": "金閣寺"}
+    )
+    assert [article["title"] for article in response.json()] == ["京都の寺"]
+
+
+async def test_read_article_is_cached_until_updated(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    db_article = await cruds.create_article(
+        db=async_session,
+        article=schemas.ArticleCreate(
+            title="Cached", content="Content", status="draft", author_id=1
+        ),
+    )
+    hit_labels = {"entity": "article", "result": "hit"}
+    cache_requests.labels(**hit_labels)
+    before = REGISTRY.get_sample_value("cache_requests_total", hit_labels)
+
+    for _ in range(2):
+        response = await async_client.get(f"/v1/articles/{db_article.id}")
+        assert response.json()["title"] == "Cached"
+    assert REGISTRY.get_sample_value("cache_requests_total", hit_labels) == before + 1
+
+    await async_client.put(
+        f"/v1/articles/{db_article.id}", json={"title": "Updated", "status": "draft"}
+    )
+    response = await async_client.get(f"/v1/articles/{db_article.id}")
+    assert response.json()["title"] == "Updated"
+
+
+async def test_read_articles_expand(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    for i in range(3):
+        db_article = await cruds.create_article(
+            db=async_session,
+            article=schemas.ArticleCreate(
+                title=f"Article {i}", content="Content", status="draft", author_id=1
+            ),
+        )
+        # コミットで属性が期限切れになる前にIDを取っておく
+        article_id = db_article.id
+        for j in range(2):
+            await cruds.create_photo(
+                async_session,
+                schemas.PhotoCreate(file_path=f"/photos/{i}-{j}.jpg"),
+                article_id=article_id,
+            )
+        tourist_spot = await cruds.create_tourist_spot(
+            async_session,
+            schemas.TouristSpotCreate(
+                name=f"Spot {i}",
+                location="Kyoto",
+                description="Description",
+                average_stay_time=1.0,
+            ),
+        )
+        await cruds.link_article_to_tourist_spot(
+            async_session, tourist_spot_id=tourist_spot.id, article_id=article_id
+        )
+
+    statements = []
+    sync_engine = async_session.bind.sync_engine
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        response = await async_client.get(
+            "/v1/articles/", params={"expand": "photos,tourist_spots"}
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [len(article["photos"]) for article in data] == [2, 2, 2]
+    assert [article["tourist_spots"][0]["name"] for article in data] == [
+        "Spot 0",
+        "Spot 1",
+        "Spot 2",
+    ]
+    assert "translations" not in data[0]
+    # 記事の一覧 + リレーションごとに1クエリ
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 3
+
+    response = await async_client.get(
+        f"/v1/articles/{data[0]['id']}", params={"expand": "photos"}
+    )
+    assert len(response.json()["photos"]) == 2
+    assert "tourist_spots" not in response.json()
+
+    response = await async_client.get("/v1/articles/", params={"expand": "author"})
+    assert response.status_code == 400
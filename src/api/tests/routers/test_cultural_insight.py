@@ -6,7 +6,7 @@ from main import app
 import api.schemas as schemas
 import api.cruds as cruds
 
-pytestmark = pytest.mark.asyncio
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("author")]
 
 
 async def test_create_cultural_insight(
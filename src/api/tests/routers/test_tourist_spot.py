@@ -1,5 +1,7 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.db import get_db, Base
@@ -7,8 +9,9 @@ from main import app
 import api.models as models
 import api.schemas as schemas
 import api.cruds as cruds
+from api.cruds.association import lock_owner
 
-pytestmark = pytest.mark.asyncio
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("author")]
 
 
 async def test_create_tourist_spot(async_client: AsyncClient):
@@ -84,6 +87,14 @@ async def test_update_tourist_spot(
     assert data["average_stay_time"] == update_data["average_stay_time"]
 
 
+async def test_update_tourist_spot_not_found(async_client: AsyncClient):
+    response = await async_client.put(
+        "/v1/tourist_spots/999", json={"name": "Updated Tourist Spot"}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Tourist spot not found"
+
+
 async def test_delete_tourist_spot(
     async_client: AsyncClient, async_session: AsyncSession
 ):
@@ -225,3 +236,141 @@ async def test_update_association(
     data = response.json()
     assert data["article_id"] == article.id
     assert data["tourist_spot_id"] == tourist_spot.id
+
+
+async def test_search_tourist_spots(async_client: AsyncClient):
+    for name, location in [("Kinkaku-ji", "Kyoto"), ("Tokyo Tower", "Tokyo")]:
+        await async_client.post(
+            "/v1/tourist_spots/",
+            json={
+                "name": name,
+                "location": location,
+                "description": "Test Description",
+                "average_stay_time": 1.0,
+            },
+        )
+
+    # SQLiteではtrigram検索は大文字小文字を区別しない部分一致になる
+    response = await async_client.get(
+        "/v1/tourist_spots/search", params={"keyword": "kyoto"}
+    )
+    assert response.status_code == 200
+    assert [spot["name"] for spot in response.json()] == ["Kinkaku-ji"]
+
+    response = await async_client.get(
+        "/v1/tourist_spots/search", params={"keyword": "Tower", "mode": "contains"}
+    )
+    assert [spot["name"] for spot in response.json()] == ["Tokyo Tower"]
+
+    response = await async_client.get(
+        "/v1/tourist_spots/search", params={"keyword": "kyoto", "threshold": 2}
+    )
+    assert response.status_code == 422
+
+
+async def test_create_tourist_spots_bulk(async_client: AsyncClient):
+    rows = [
+        {
+            "name": f"Spot {i}",
+            "location": "Kyoto",
+            "description": "Test Description",
+            "average_stay_time": i,
+        }
+        for i in range(3)
+    ]
+    rows.insert(1, {"name": "Broken", "average_stay_time": "long"})
+    response = await async_client.post("/v1/tourist_spots/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+    assert [spot["name"] for spot in data["created"]] == ["Spot 0", "Spot 1", "Spot 2"]
+    assert [error["index"] for error in data["errors"]] == [1]
+
+    response = await async_client.get("/v1/tourist_spots/")
+    assert len(response.json()) == 3
+
+
+async def test_link_tourist_spots_to_article(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    article = await cruds.create_article(
+        db=async_session,
+        article=schemas.ArticleCreate(
+            title="Test Article", content="Content", status="draft", author_id=1
+        ),
+    )
+    article_id = article.id
+    spot_ids = []
+    for i in range(3):
+        tourist_spot = await cruds.create_tourist_spot(
+            async_session,
+            schemas.TouristSpotCreate(
+                name=f"Spot {i}",
+                location="Kyoto",
+                description="Description",
+                average_stay_time=1.0,
+            ),
+        )
+        spot_ids.append(tourist_spot.id)
+
+    async def linked_spot_ids():
+        result = await async_session.execute(
+            select(models.ArticleTouristSpot.tourist_spot_id).filter(
+                models.ArticleTouristSpot.article_id == article_id
+            )
+        )
+        return sorted(result.scalars())
+
+    response = await async_client.post(
+        f"/v1/articles/{article_id}/tourist_spots",
+        json=[spot_ids[0], spot_ids[1], spot_ids[1]],
+    )
+    assert response.status_code == 200
+    assert [link["tourist_spot_id"] for link in response.json()] == spot_ids[:2]
+
+    # 紐付け済みの観光地は無視され、新しく紐付けたものだけが返る
+    response = await async_client.post(
+        f"/v1/articles/{article_id}/tourist_spots", json=spot_ids[1:]
+    )
+    assert [link["tourist_spot_id"] for link in response.json()] == [spot_ids[2]]
+    assert await linked_spot_ids() == spot_ids
+
+    response = await async_client.put(
+        f"/v1/articles/{article_id}/tourist_spots", json=[spot_ids[2], spot_ids[0]]
+    )
+    assert response.status_code == 200
+    assert [link["tourist_spot_id"] for link in response.json()] == [
+        spot_ids[2],
+        spot_ids[0],
+    ]
+    assert await linked_spot_ids() == [spot_ids[0], spot_ids[2]]
+
+    response = await async_client.delete(
+        f"/v1/tourist_spots/{spot_ids[2]}/articles",
+        params={"article_ids": [article_id]},
+    )
+    assert response.status_code == 204
+    assert await linked_spot_ids() == [spot_ids[0]]
+
+
+async def test_replace_links_locks_owner_row(async_session: AsyncSession):
+    article = await cruds.create_article(
+        db=async_session,
+        article=schemas.ArticleCreate(
+            title="Test Article", content="Content", status="draft", author_id=1
+        ),
+    )
+    statements = []
+    event.listen(
+        async_session.bind.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    await cruds.set_article_tourist_spots(async_session, article.id, [])
+
+    # 置き換えの前に記事の行をロックし、同じ記事への置き換えを直列にする
+    assert statements[0].startswith("SELECT articles.id")
+    lock = lock_owner(models.ArticleTouristSpot, "article_id", article.id)
+    assert str(lock.compile(dialect=postgresql.dialect())).endswith("FOR UPDATE")
+    lock = lock_owner(models.ArticleTouristSpot, "tourist_spot_id", 1)
+    assert "FROM tourist_spots" in str(lock)
@@ -7,7 +7,7 @@ import api.cruds as cruds
 import api.models as models
 from main import app
 
-pytestmark = pytest.mark.asyncio
+pytestmark = [pytest.mark.asyncio, pytest.mark.usefixtures("author")]
 
 
 async def test_create_translation(
@@ -125,6 +125,14 @@ async def test_update_translation(
     assert data["article_id"] == article.id
 
 
+async def test_update_translation_not_found(async_client: AsyncClient):
+    response = await async_client.put(
+        "/v1/translations/999", json={"title": "Updated Translation"}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Translation not found"
+
+
 async def test_delete_translation(
     async_client: AsyncClient, async_session: AsyncSession
 ):
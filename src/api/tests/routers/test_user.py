@@ -1,5 +1,7 @@
 import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
@@ -8,6 +10,9 @@ from main import app
 import api.models as models
 import api.schemas as schemas
 import api.cruds as cruds
+import api.cruds.user as user_cruds
+from api.security import create_user_access_token, get_token_data
+from api.security.token_store import TokenStoreUnavailable, bump_token_version
 
 pytestmark = pytest.mark.asyncio
 
@@ -131,6 +136,33 @@ async def test_update_user_not_found(async_client: AsyncClient):
     assert response.json()["detail"] == "User not found"
 
 
+async def test_update_user_email_already_registered(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    users = [
+        await cruds.create_user(
+            async_session,
+            schemas.UserCreate(
+                username=name,
+                email=f"{name}@example.com",
+                password="testpassword",
+                role="user",
+            ),
+        )
+        for name in ("testuser", "otheruser")
+    ]
+
+    response = await async_client.put(
+        f"/v1/users/{users[0].id}", json={"email": users[1].email}
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Email already registered"
+
+    # ロールバックしたセッションで続けて処理できる
+    db_user = await cruds.get_user(db=async_session, user_id=users[0].id)
+    assert db_user.email == users[0].email
+
+
 async def test_delete_user(async_client: AsyncClient, async_session: AsyncSession):
     user = schemas.UserCreate(
         username="testuser",
@@ -152,6 +184,111 @@ async def test_delete_user(async_client: AsyncClient, async_session: AsyncSessio
     assert db_user is None
 
 
+async def test_delete_user_keeps_feedbacks(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    db_user = await cruds.create_user(
+        db=async_session,
+        user=schemas.UserCreate(
+            username="testuser",
+            email="testuser@example.com",
+            password="testpassword",
+            role="user",
+        ),
+    )
+    feedback = models.Feedback(content="Great", user_id=db_user.id)
+    async_session.add(feedback)
+    await async_session.commit()
+    feedback_id = feedback.id
+
+    response = await async_client.delete(f"/v1/users/{db_user.id}")
+    assert response.status_code == 200
+
+    # ユーザーを削除してもフィードバックは残り、user_idだけがNULLになる
+    async_session.expire_all()
+    db_feedback = await async_session.get(models.Feedback, feedback_id)
+    assert db_feedback is not None
+    assert db_feedback.user_id is None
+
+
+async def test_delete_user_integrity_error(
+    async_client: AsyncClient, async_session: AsyncSession, monkeypatch
+):
+    user = schemas.UserCreate(
+        username="testuser",
+        email="testuser@example.com",
+        password="testpassword",
+        role="user",
+    )
+    db_user = await cruds.create_user(db=async_session, user=user)
+
+    async def fail_delete(*args):
+        raise IntegrityError("DELETE FROM users", {}, Exception("foreign key"))
+
+    monkeypatch.setattr(user_cruds, "delete_returning", fail_delete)
+    response = await async_client.delete(f"/v1/users/{db_user.id}")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "User is still referenced"
+
+    assert await cruds.get_user(db=async_session, user_id=db_user.id) is not None
+
+
+async def test_update_user_token_store_unavailable(
+    async_client: AsyncClient, async_session: AsyncSession, monkeypatch
+):
+    db_user = await cruds.create_user(
+        db=async_session,
+        user=schemas.UserCreate(
+            username="testuser",
+            email="testuser@example.com",
+            password="testpassword",
+            role="user",
+        ),
+    )
+
+    async def fail_bump(user_id):
+        raise TokenStoreUnavailable("connection refused")
+
+    # トークンを無効にできない場合はロールを変えない
+    monkeypatch.setattr(user_cruds, "bump_token_version", fail_bump)
+    response = await async_client.put(f"/v1/users/{db_user.id}", json={"role": "admin"})
+    assert response.status_code == 503
+    assert (await cruds.get_user(db=async_session, user_id=db_user.id)).role == "user"
+
+
+async def test_update_user_token_store_fails_after_commit(
+    async_client: AsyncClient, async_session: AsyncSession, monkeypatch
+):
+    db_user = await cruds.create_user(
+        db=async_session,
+        user=schemas.UserCreate(
+            username="testuser",
+            email="testuser@example.com",
+            password="testpassword",
+            role="user",
+        ),
+    )
+    token = await create_user_access_token(db_user)
+    calls = []
+
+    async def bump_then_fail(user_id):
+        calls.append(user_id)
+        if len(calls) > 1:
+            raise TokenStoreUnavailable("connection refused")
+        await bump_token_version(user_id)
+
+    # コミット後のバージョン更新に失敗しても、コミット済みの更新は成功として返す
+    monkeypatch.setattr(user_cruds, "bump_token_version", bump_then_fail)
+    response = await async_client.put(f"/v1/users/{db_user.id}", json={"role": "admin"})
+    assert response.status_code == 200
+    assert response.json()["role"] == "admin"
+    assert calls == [db_user.id, db_user.id]
+    # コミット前にバージョンを増やしているため、変更前のトークンは使えない
+    with pytest.raises(HTTPException) as exc_info:
+        await get_token_data(token)
+    assert exc_info.value.status_code == 401
+
+
 async def test_delete_user_not_found(async_client: AsyncClient):
     response = await async_client.delete("/v1/users/999")
     assert response.status_code == 404
@@ -0,0 +1,178 @@
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import main
+import api.cruds as cruds
+import api.schemas as schemas
+import api.security.token_store as token_store_module
+from api.cache import cache, env_info as cache_env_info
+from api.security import (
+    create_access_token,
+    create_user_access_token,
+    get_current_user,
+    get_token_data,
+    require_role,
+)
+from api.security.token_store import (
+    RedisTokenStore,
+    TokenStoreUnavailable,
+    check_token_store,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def create_test_user(db: AsyncSession) -> schemas.User:
+    return await cruds.create_user(
+        db,
+        schemas.UserCreate(
+            username="testuser",
+            email="testuser@example.com",
+            role="user",
+            password="testpassword",
+        ),
+    )
+
+
+async def test_get_current_user_is_cached(async_session: AsyncSession):
+    user = await create_test_user(async_session)
+    token = await create_user_access_token(user)
+
+    statements = []
+    event.listen(
+        async_session.bind.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    current_user = await get_current_user(
+        db=async_session, token_data=await get_token_data(token)
+    )
+    assert current_user.id == user.id
+    assert len(statements) == 1
+
+    # 2回目はキャッシュから返り、DBを引かない
+    current_user = await get_current_user(
+        db=async_session, token_data=await get_token_data(token)
+    )
+    assert current_user.username == "testuser"
+    assert len(statements) == 1
+
+    # 更新するとキャッシュが破棄され、新しい値を返す
+    await cruds.update_user(
+        async_session, schemas.UserUpdate(username="renamed"), user.id
+    )
+    current_user = await get_current_user(
+        db=async_session, token_data=await get_token_data(token)
+    )
+    assert current_user.username == "renamed"
+
+
+async def test_token_carries_role_and_is_checked_without_db(
+    async_session: AsyncSession,
+):
+    user = await create_test_user(async_session)
+    token = await create_user_access_token(user)
+
+    statements = []
+    event.listen(
+        async_session.bind.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    token_data = await get_token_data(token)
+    assert (token_data.user_id, token_data.role) == (user.id, "user")
+    assert await require_role("user")(token_data) is token_data
+    with pytest.raises(HTTPException) as exc_info:
+        await require_role("admin")(token_data)
+    assert exc_info.value.status_code == 403
+    assert statements == []
+
+    # ロールを変えると発行済みのトークンは使えなくなる
+    await cruds.update_user(async_session, schemas.UserUpdate(role="admin"), user.id)
+    with pytest.raises(HTTPException) as exc_info:
+        await get_token_data(token)
+    assert exc_info.value.status_code == 401
+    token_data = await get_token_data(
+        await create_user_access_token(await cruds.get_user(async_session, user.id))
+    )
+    assert token_data.role == "admin"
+
+    # ロールとバージョンを含まないトークンは受け付けない
+    with pytest.raises(HTTPException):
+        await get_token_data(create_access_token({"sub": user.email}))
+
+
+async def test_login_and_logout(async_client: AsyncClient, async_session: AsyncSession):
+    await create_test_user(async_session)
+
+    response = await async_client.post(
+        "/v1/token",
+        data={"username": "testuser@example.com", "password": "wrongpassword"},
+    )
+    assert response.status_code == 401
+
+    response = await async_client.post(
+        "/v1/token",
+        data={"username": "testuser@example.com", "password": "testpassword"},
+    )
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await async_client.post("/v1/logout", headers=headers)
+    assert response.status_code == 204
+    # ログアウトしたトークンはすぐに使えなくなる
+    response = await async_client.post("/v1/logout", headers=headers)
+    assert response.status_code == 401
+
+
+async def test_unreachable_token_store_rejects_tokens(
+    async_session: AsyncSession, monkeypatch
+):
+    user = await create_test_user(async_session)
+    token = await create_user_access_token(user)
+
+    # Redisに接続できない間は、失効していないとみなさずに503を返す
+    unreachable = RedisTokenStore("redis://127.0.0.1:1/0", "auth")
+    with pytest.raises(TokenStoreUnavailable):
+        await unreachable.is_revoked("jti")
+    monkeypatch.setattr(token_store_module, "token_store", unreachable)
+    with pytest.raises(HTTPException) as exc_info:
+        await get_token_data(token)
+    assert exc_info.value.status_code == 503
+
+    # 未設定の場合も起動は止めず、トークンを使う処理だけを503にする
+    monkeypatch.setattr(token_store_module, "token_store", None)
+    assert await check_token_store() is False
+    with pytest.raises(HTTPException) as exc_info:
+        await create_user_access_token(user)
+    assert exc_info.value.status_code == 503
+
+
+async def test_app_starts_without_token_store(monkeypatch):
+    async def noop(*args):
+        return None
+
+    # トークンストアが無くても起動し、トークンを使わないエンドポイントは提供する
+    monkeypatch.setattr(token_store_module, "token_store", None)
+    monkeypatch.setattr(main, "log_pending_migrations", noop)
+    monkeypatch.setattr(main, "dispose_engines", noop)
+    async with main.lifespan(main.app):
+        pass
+
+
+async def test_token_versions_are_not_evicted(async_session: AsyncSession):
+    user = await create_test_user(async_session)
+    token = await create_user_access_token(user)
+    await cruds.update_user(async_session, schemas.UserUpdate(role="admin"), user.id)
+
+    # エンティティのキャッシュを破棄・溢れさせても、変えたバージョンは残る
+    await cache.clear()
+    for i in range(cache_env_info.CACHE_MAX_ENTRIES + 1):
+        await cache.set(f"filler:{i}", "1", 60)
+    with pytest.raises(HTTPException) as exc_info:
+        await get_token_data(token)
+    assert exc_info.value.status_code == 401
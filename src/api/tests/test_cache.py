@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import cache as cache_module
+from api.cache import InMemoryCache
+import api.cruds as cruds
+import api.schemas as schemas
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_in_memory_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = InMemoryCache()
+
+    await cache.set("key", "value", ttl=10)
+    assert await cache.get("key") == "value"
+
+    now[0] += 10
+    assert await cache.get("key") is None
+
+
+async def test_in_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(max_entries=2)
+    await cache.set("a", "1", ttl=60)
+    await cache.set("b", "2", ttl=60)
+    await cache.get("a")
+    await cache.set("c", "3", ttl=60)
+
+    assert await cache.get("a") == "1"
+    assert await cache.get("b") is None
+    assert await cache.get("c") == "3"
+
+    await cache.delete("a", "missing")
+    assert await cache.get("a") is None
+
+
+async def test_cache_disabled_without_shared_backend(monkeypatch):
+    # REDIS_URLもCACHE_IN_MEMORYも無い場合は、読み書き・破棄とも何もしない
+    monkeypatch.setattr(cache_module, "cache", None)
+    article = schemas.Article(
+        id=1,
+        title="Kyoto temples",
+        content="Kinkakuji",
+        status="draft",
+        author_id=1,
+        created_at=datetime(2024, 1, 1),
+        updated_at=datetime(2024, 1, 1),
+    )
+    await cache_module.set_cached("article", 1, article, AsyncSession())
+    assert await cache_module.get_cached("article", 1, schemas.Article) is None
+    await cache_module.invalidate("article", 1)
+
+
+@pytest.mark.usefixtures("author")
+async def test_replica_reads_are_cached_except_right_after_invalidation(
+    async_session: AsyncSession, monkeypatch
+):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    article = await cruds.create_article(
+        async_session,
+        schemas.ArticleCreate(
+            title="Kyoto temples", content="Kinkakuji", status="draft", author_id=1
+        ),
+    )
+    replica_session = AsyncSession(async_session.bind, info={"replica": True})
+
+    async def read_from_replica():
+        async with replica_session:
+            await cruds.get_article(replica_session, article.id)
+        return await cache_module.get_cached("article", article.id, schemas.Article)
+
+    # PG_READ_HOSTを設定した環境では読み取りはレプリカから行うため、その値もキャッシュする
+    cached = await read_from_replica()
+    assert cached.title == "Kyoto temples"
+
+    # 破棄した直後は、遅延したレプリカの古い値でキャッシュを入れ直さない
+    await cruds.update_article(
+        async_session, schemas.ArticleUpdate(title="Updated"), article.id
+    )
+    assert await read_from_replica() is None
+    await cruds.get_article(async_session, article.id)
+    cached = await cache_module.get_cached("article", article.id, schemas.Article)
+    assert cached.title == "Updated"
+
+    # レプリカの遅延の上限を過ぎれば、再びレプリカの値をキャッシュする
+    await cache_module.invalidate("article", article.id)
+    now[0] += cache_module.env_info.CACHE_REPLICA_LAG_SECONDS
+    assert (await read_from_replica()).title == "Updated"
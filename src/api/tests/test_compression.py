@@ -0,0 +1,119 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import api.cruds as cruds
+import api.schemas as schemas
+from api import compression
+from api.compression import select_encoding
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_select_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert select_encoding("gzip, deflate") == "gzip"
+    assert select_encoding("br;q=1.0, gzip;q=0.5") == "gzip"
+    assert select_encoding("gzip;q=0, *;q=0.5") is None
+    assert select_encoding("identity") is None
+
+    monkeypatch.setattr(compression, "brotli", object())
+    assert select_encoding("gzip, br") == "br"
+    assert select_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert select_encoding("*") == "br"
+
+
+@pytest.mark.usefixtures("author")
+async def test_compression_and_cache_control(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    for i in range(20):
+        await cruds.create_article(
+            db=async_session,
+            article=schemas.ArticleCreate(
+                title=f"Article {i}",
+                content="Content " * 20,
+                status="draft",
+                author_id=1,
+            ),
+        )
+
+    response = await async_client.get(
+        "/v1/articles/", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()) == 20
+    # 下書きを含む記事は共有キャッシュに置かせない
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = await async_client.get(
+        "/v1/articles/", headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+
+    # 小さいレスポンスは圧縮しない
+    response = await async_client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "cache-control" not in response.headers
+
+    response = await async_client.get("/v1/users/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["cache-control"] == "private, no-cache"
+    response = await async_client.post("/v1/tourist_spots/", json={})
+    assert "cache-control" not in response.headers
+
+
+@pytest.mark.usefixtures("author")
+async def test_cache_control_of_mutable_entities(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    article = await cruds.create_article(
+        db=async_session,
+        article=schemas.ArticleCreate(
+            title="Kyoto temples", content="Kinkakuji", status="published", author_id=1
+        ),
+    )
+
+    # 公開済みの記事は共有キャッシュに置けるが、毎回ETagで再検証させる
+    response = await async_client.get(f"/v1/articles/{article.id}")
+    assert response.headers["cache-control"] == "no-cache"
+    response = await async_client.get(
+        f"/v1/articles/{article.id}",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == "no-cache"
+
+    # 書き込み直後のクライアントへのレスポンス(プライマリから読む)はprivateにする
+    # (テストではget_dbを差し替えているため、Cookieは直接付ける)
+    response = await async_client.get(
+        f"/v1/articles/{article.id}",
+        headers={"Cookie": f"read_primary_until={time.time() + 5}"},
+    )
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+@pytest.mark.usefixtures("author")
+async def test_not_modified_draft_is_private(
+    async_client: AsyncClient, async_session: AsyncSession
+):
+    article = await cruds.create_article(
+        db=async_session,
+        article=schemas.ArticleCreate(
+            title="Draft", content="Not yet", status="draft", author_id=1
+        ),
+    )
+    url = f"/v1/articles/{article.id}"
+
+    response = await async_client.get(url)
+    assert response.headers["cache-control"] == "private, no-cache"
+    # 再検証の304でも下書きを共有キャッシュに置かせない
+    response = await async_client.get(
+        url, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == "private, no-cache"
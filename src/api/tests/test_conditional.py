@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import api.models as models
+from api.conditional import check_not_modified, set_validators
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_request(if_none_match: str) -> Request:
+    return Request(
+        {"type": "http", "headers": [(b"if-none-match", if_none_match.encode())]}
+    )
+
+
+@pytest.mark.usefixtures("author")
+async def test_row_without_updated_at_has_no_validators(async_session: AsyncSession):
+    # updated_at列はNULLを許すため、古い行にはupdated_atが無い
+    db_article = models.Article(
+        title="Old",
+        content="Content",
+        status="published",
+        author_id=1,
+        created_at=datetime.now(),
+    )
+    async_session.add(db_article)
+    await async_session.commit()
+
+    not_modified = await check_not_modified(
+        make_request("*"), async_session, "article", db_article.id
+    )
+    assert not_modified is None
+
+    response = Response()
+    set_validators(response, "article", db_article.id, None)
+    assert "etag" not in response.headers
+    assert "last-modified" not in response.headers
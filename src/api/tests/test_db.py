@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+
+import api.db as db
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_request(method: str = "GET", cookie: str = "") -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "method": method, "headers": headers})
+
+
+async def test_is_pinned_to_primary():
+    assert db.is_pinned_to_primary(make_request()) is False
+
+    future = f"{db.READ_PRIMARY_COOKIE}={time.time() + 60}"
+    assert db.is_pinned_to_primary(make_request(cookie=future)) is True
+
+    past = f"{db.READ_PRIMARY_COOKIE}={time.time() - 60}"
+    assert db.is_pinned_to_primary(make_request(cookie=past)) is False
+
+    broken = f"{db.READ_PRIMARY_COOKIE}=not-a-timestamp"
+    assert db.is_pinned_to_primary(make_request(cookie=broken)) is False
+
+
+async def test_get_db_pins_writers_to_primary():
+    response = Response()
+    session_gen = db.get_db(make_request("POST"), response)
+    session = await session_gen.__anext__()
+    await session_gen.aclose()
+    assert db.READ_PRIMARY_COOKIE in response.headers["set-cookie"]
+    assert session.bind is db.db_engine
+
+    response = Response()
+    session_gen = db.get_db(make_request("GET"), response)
+    await session_gen.__anext__()
+    await session_gen.aclose()
+    assert "set-cookie" not in response.headers
+
+
+async def test_get_read_db_routes_to_replica(monkeypatch):
+    replica_sessions = []
+
+    class FakeReplicaSession:
+        async def __aenter__(self):
+            replica_sessions.append(self)
+            return self
+
+        async def __aexit__(self, *args):
+            return False
+
+    monkeypatch.setattr(db, "ReadSessionLocal", FakeReplicaSession)
+
+    session_gen = db.get_read_db(make_request())
+    session = await session_gen.__anext__()
+    await session_gen.aclose()
+    assert session is replica_sessions[0]
+
+    pinned = f"{db.READ_PRIMARY_COOKIE}={time.time() + 60}"
+    session_gen = db.get_read_db(make_request(cookie=pinned))
+    session = await session_gen.__anext__()
+    await session_gen.aclose()
+    assert session.bind is db.db_engine
+    assert len(replica_sessions) == 1
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+from api.get_env import clear_env_cache, get_env_info
+
+
+class EnvInfo(BaseModel):
+    TEST_GET_ENV_LIMIT: int = 10
+
+
+def test_get_env_info_is_cached(monkeypatch):
+    monkeypatch.setenv("TEST_GET_ENV_LIMIT", "20")
+    clear_env_cache()
+    env_info = get_env_info(EnvInfo)
+    assert env_info.TEST_GET_ENV_LIMIT == 20
+
+    # 同じクラスには読み込み済みのインスタンスを返す
+    monkeypatch.setenv("TEST_GET_ENV_LIMIT", "30")
+    assert get_env_info(EnvInfo) is env_info
+
+    clear_env_cache()
+    assert get_env_info(EnvInfo).TEST_GET_ENV_LIMIT == 30
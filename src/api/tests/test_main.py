@@ -10,9 +10,15 @@ tests/routers/*.py: こちらは 各エンドポイント（およびそれに
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from main import app
+from api.metrics import REGISTRY
+from api.request_metrics import request_duration, requests_total
+from api import sql_timing
+from api.sql_timing import register_sql_timing
 
 pytestmark = pytest.mark.asyncio
 
@@ -27,3 +33,66 @@ async def test_root(async_client: AsyncClient):
     response = await async_client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Welcome to the Japan Tourism Info API"}
+
+
+async def test_request_metrics(async_client: AsyncClient):
+    route = "/v1/articles/{article_id}"
+    labels = {"method": "GET", "route": route}
+
+    def counts():
+        return (
+            REGISTRY.get_sample_value(
+                "http_requests_total", {**labels, "status": "404"}
+            ),
+            REGISTRY.get_sample_value("http_request_duration_seconds_count", labels),
+        )
+
+    # 系列を作っておき、リクエスト前の値を0として読めるようにする
+    requests_total.labels(status="404", **labels)
+    request_duration.labels(**labels)
+    before = counts()
+
+    response = await async_client.get("/v1/articles/999")
+    assert response.status_code == 404
+    await async_client.get("/no/such/path")
+
+    # ルートは生のURLではなくテンプレートで記録される
+    assert counts() == (before[0] + 1, before[1] + 1)
+    body = (await async_client.get("/metrics")).text
+    assert 'route="<unmatched>",status="404"' in body
+    assert "/no/such/path" not in body
+
+
+async def test_server_timing(async_client: AsyncClient, async_session: AsyncSession):
+    register_sql_timing(async_session.bind)
+
+    response = await async_client.get("/health")
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+
+    response = await async_client.get("/v1/articles/")
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert response.headers["server-timing"].endswith('desc="1 queries"')
+
+
+async def test_server_timing_after_failed_statement(
+    async_session: AsyncSession, monkeypatch
+):
+    register_sql_timing(async_session.bind)
+    clock = iter([1.0, 2.0, 2.5])
+    monkeypatch.setattr(sql_timing.time, "perf_counter", lambda: next(clock))
+    stats = sql_timing.QueryStats()
+    token = sql_timing._current_stats.set(stats)
+    try:
+        async with async_session.bind.connect() as conn:
+            info_before = dict(conn.info)
+            # 失敗した文ではafter_cursor_executeが呼ばれないが、接続に値を残さない
+            with pytest.raises(DBAPIError):
+                await conn.execute(text("SELECT * FROM no_such_table"))
+            assert dict(conn.info) == info_before
+            await conn.execute(text("SELECT 1"))
+    finally:
+        sql_timing._current_stats.reset(token)
+
+    assert stats.count == 1
+    assert stats.seconds == 0.5
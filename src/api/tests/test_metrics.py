@@ -0,0 +1,66 @@
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api import metrics
+from api.pool import (
+    InstrumentedAsyncAdaptedQueuePool,
+    pool_checkout_wait_seconds,
+    register_pool_metrics,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_factories_use_api_registry():
+    counter = metrics.counter("test_errors", "Test errors", ("route",))
+    counter.labels(route="/a").inc()
+    assert metrics.REGISTRY.get_sample_value("test_errors_total", {"route": "/a"}) == 1
+    # プロセス全体のデフォルトレジストリには登録しない
+    assert REGISTRY.get_sample_value("test_errors_total", {"route": "/a"}) is None
+    with pytest.raises(ValueError):
+        counter.labels(status="500")
+
+
+async def test_instrumented_pool_records_checkout():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=2,
+        max_overflow=0,
+    )
+    register_pool_metrics(engine, "test")
+    labels = {"engine": "test"}
+    pool_checkout_wait_seconds.labels(**labels)
+    before = metrics.REGISTRY.get_sample_value(
+        "db_pool_checkout_wait_seconds_count", labels
+    )
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert metrics.REGISTRY.get_sample_value("db_pool_checked_out", labels) == 1
+
+    assert metrics.REGISTRY.get_sample_value("db_pool_checked_out", labels) == 0
+    assert (
+        metrics.REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", labels)
+        == before + 1
+    )
+    await engine.dispose()
+
+
+async def test_metrics_endpoint(async_client: AsyncClient):
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.PROMETHEUS_CONTENT_TYPE
+    families = {
+        family.name: family for family in text_string_to_metric_families(response.text)
+    }
+    assert families["db_pool_checkout_wait_seconds"].type == "histogram"
+    checked_out = {
+        sample.labels["engine"]: sample.value
+        for sample in families["db_pool_checked_out"].samples
+    }
+    assert checked_out["primary"] == 0
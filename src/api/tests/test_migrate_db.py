@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import migrate_db
+from api.models.article import article_search_document
+from api.schema_version import LATEST_SCHEMA_VERSION, log_pending_migrations
+
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+
+def test_create_database_stamps_new_database(tmp_path):
+    engine = make_engine(tmp_path)
+    migrate_db.create_database(engine)
+
+    assert migrate_db.get_pending_migrations(engine) == []
+    assert migrate_db.get_applied_versions(engine) == {
+        migration.version for migration in migrate_db.MIGRATIONS
+    }
+
+
+def test_upgrade_existing_database(tmp_path):
+    engine = make_engine(tmp_path)
+    # マイグレーション導入前のデータベース (search_text列・外部キーの索引なし)
+    migrate_db.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_photos_article_id"))
+        conn.execute(text("DROP INDEX ix_translations_article_id_language"))
+        conn.execute(
+            text("DROP INDEX uq_article_tourist_spots_article_id_tourist_spot_id")
+        )
+        for _ in range(2):
+            conn.execute(
+                text(
+                    "INSERT INTO article_tourist_spots (article_id, tourist_spot_id) "
+                    "VALUES (1, 1)"
+                )
+            )
+        conn.execute(text("ALTER TABLE articles DROP COLUMN search_text"))
+        conn.execute(
+            text(
+                "INSERT INTO articles (title, content, status) "
+                "VALUES ('京都', 'Kinkaku-ji', 'draft')"
+            )
+        )
+    assert len(migrate_db.get_pending_migrations(engine)) == len(migrate_db.MIGRATIONS)
+
+    applied = migrate_db.upgrade(engine)
+
+    assert [migration.version for migration in applied] == [
+        migration.version for migration in migrate_db.MIGRATIONS
+    ]
+    assert migrate_db.get_pending_migrations(engine) == []
+    indexes = {
+        index["name"]: index["column_names"]
+        for table in ("photos", "translations")
+        for index in inspect(engine).get_indexes(table)
+    }
+    assert indexes["ix_photos_article_id"] == ["article_id"]
+    assert indexes["ix_translations_article_id_language"] == ["article_id", "language"]
+    with engine.connect() as conn:
+        search_text = conn.execute(text("SELECT search_text FROM articles")).scalar()
+    assert search_text == article_search_document("京都", "Kinkaku-ji")
+    # 重複した紐付けは1行にまとめられ、一意索引が作られる
+    with engine.connect() as conn:
+        pairs = conn.execute(text("SELECT COUNT(*) FROM article_tourist_spots"))
+        assert pairs.scalar() == 1
+    assert {
+        index["name"]: index["unique"]
+        for index in inspect(engine).get_indexes("article_tourist_spots")
+    }["uq_article_tourist_spots_article_id_tourist_spot_id"]
+
+    # 2回目は何もしない
+    assert migrate_db.upgrade(engine) == []
+
+
+def test_latest_schema_version_matches_migrations():
+    # 起動時の確認はmigrate_dbを読み込まずにLATEST_SCHEMA_VERSIONで行う
+    assert [migration.version for migration in migrate_db.MIGRATIONS] == list(
+        range(1, LATEST_SCHEMA_VERSION + 1)
+    )
+    # マイグレーションを追加して定数を更新し忘れると、migrate_dbの読み込み時に失敗する
+    extra = migrate_db.Migration(
+        LATEST_SCHEMA_VERSION + 1, "Next migration", lambda conn: None
+    )
+    with pytest.raises(RuntimeError):
+        migrate_db.check_migration_versions(migrate_db.MIGRATIONS + [extra])
+
+
+@pytest.mark.asyncio
+async def test_log_pending_migrations(tmp_path):
+    engine = make_engine(tmp_path)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    migrate_db.migration_metadata.create_all(engine)
+    migrate_db.stamp(engine, migrate_db.MIGRATIONS[:-1])
+    assert await log_pending_migrations(async_engine) == [LATEST_SCHEMA_VERSION]
+
+    migrate_db.stamp(engine, migrate_db.MIGRATIONS[-1:])
+    assert await log_pending_migrations(async_engine) == []
+    await async_engine.dispose()
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from api.security import get_password_hash_async, verify_password_async
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_password_hash_does_not_block_event_loop():
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    hashed = await get_password_hash_async("testpassword")
+    task.cancel()
+
+    # ハッシュ化の間も他のタスクが動いている
+    assert ticks > 0
+    assert await verify_password_async("testpassword", hashed)
+    assert not await verify_password_async("wrongpassword", hashed)
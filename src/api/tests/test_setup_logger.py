@@ -0,0 +1,50 @@
+import logging
+import queue
+
+from api.metrics import REGISTRY
+from api.setup_logger import (
+    DroppingQueueHandler,
+    dropped_log_records,
+    load_logger_config,
+)
+
+
+def make_record(level: int, msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_dropping_queue_handler_drops_info_when_full():
+    log_queue: queue.Queue = queue.Queue(maxsize=1)
+    handler = DroppingQueueHandler(log_queue)
+    dropped_log_records.labels(level="INFO")
+    before = REGISTRY.get_sample_value("log_records_dropped_total", {"level": "INFO"})
+
+    handler.handle(make_record(logging.INFO, "first %s", 1))
+    handler.handle(make_record(logging.INFO, "second %s", 2))
+
+    assert (
+        REGISTRY.get_sample_value("log_records_dropped_total", {"level": "INFO"})
+        == before + 1
+    )
+    record = log_queue.get_nowait()
+    # 整形は書き込みスレッドで行うため、キューには引数が展開されないまま入る
+    assert (record.msg, record.args) == ("first %s", (1,))
+    assert record.getMessage() == "first 1"
+
+
+def test_load_logger_config_defaults_to_sync(tmp_path):
+    config_path = tmp_path / "logger.ini"
+    config_path.write_text(
+        "[logger]\n"
+        "Level = INFO\n"
+        "Folder = log\n"
+        "File = api.log\n"
+        "Format = %%(message)s\n"
+        "MaxBytes = 1000\n"
+        "BackupCount = 1\n"
+    )
+
+    logger_info = load_logger_config(str(config_path))
+
+    assert logger_info.mode == "sync"
+    assert logger_info.queue_size == 10000
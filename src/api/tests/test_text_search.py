@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg
+
+import api.models as models
+from api.text_search import (
+    to_search_document,
+    to_tsquery_text,
+    tokenize,
+    trigram_clauses,
+)
+
+
+def test_tokenize_cjk_bigrams():
+    assert tokenize("東京駅") == ["東京", "京駅", "駅"]
+    assert tokenize("駅") == ["駅"]
+
+
+def test_tokenize_normalizes_words():
+    # 全角英数字はNFKCで半角に正規化し、小文字で扱う
+    assert tokenize("Ｋｙｏｔｏ Tower2024") == ["kyoto", "tower2024"]
+    assert tokenize("Kyoto駅") == ["kyoto", "駅"]
+    assert tokenize("!!") == []
+
+
+def test_to_search_document_positions_and_weights():
+    document = to_search_document(("東京", "A"), ("東京 tour", "D"))
+    assert document == "'東京':1A,3D '京':2A,4D 'tour':5D"
+
+
+def test_to_tsquery_text():
+    assert to_tsquery_text("東京駅 tour") == "('東京' <-> '京駅') & ('tour')"
+    assert to_tsquery_text("京") == "('京':*)"
+    assert to_tsquery_text("  ") == ""
+
+
+def test_trigram_clauses_postgresql():
+    db = SimpleNamespace(bind=SimpleNamespace(dialect=asyncpg.dialect()))
+    where, rank = trigram_clauses(
+        db, (models.TouristSpot.name, models.TouristSpot.location), "Kyōto"
+    )
+    sql = str(
+        select(models.TouristSpot.id)
+        .where(where)
+        .order_by(rank)
+        .compile(dialect=asyncpg.dialect())
+    )
+    assert "<% tourist_spots.name) OR ($1::VARCHAR <% tourist_spots.location)" in sql
+    assert "ORDER BY greatest(coalesce(word_similarity(" in sql
@@ -1,11 +1,17 @@
+from contextlib import contextmanager
 import os
-from typing import Type, TypeVar, Awaitable, Any
+import threading
+import time
+from typing import Type, TypeVar, Any, Iterator
 
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2 import pool as pg_pool
 from pydantic import BaseModel, ValidationError, TypeAdapter
 import redis
 
+from cache_codec import decode_rows, encode_rows
+
 
 class EnvInfo(BaseModel):
     PG_VERSION: str
@@ -15,6 +21,10 @@ class EnvInfo(BaseModel):
     PG_PASSWORD: str
     PG_DATABASE: str
     REDIS_PASSWORD: str
+    PG_POOL_MINCONN: int = 1
+    PG_POOL_MAXCONN: int = 10
+    REDIS_CACHE_TTL: int = 60
+    REDIS_CACHE_COMPRESS_THRESHOLD: int = 1024
 
 
 class PostgresConfig(BaseModel):
@@ -24,12 +34,23 @@ class PostgresConfig(BaseModel):
     PG_PORT: str = "5432"
     PG_DATABASE: str = "test_db"
     PG_TABLE: str = "test_table"
+    # コネクションプールの設定
+    PG_POOL_MINCONN: int = 1
+    PG_POOL_MAXCONN: int = 10
+    # プールから取り出すまでにこの秒数以上アイドルだった接続はSELECT 1で確認する
+    PG_POOL_HEALTH_CHECK_INTERVAL: float = 30.0
+    # プールが枯渇している場合に接続の返却を待つ最大秒数
+    PG_POOL_TIMEOUT: float = 30.0
 
 
 class RedisConfig(BaseModel):
     REDIS_PASSWORD: str
     REDIS_HOST: str = "localhost"
     REDIS_PORT: str = "6379"
+    # get_dataでキャッシュする秒数
+    REDIS_CACHE_TTL: int = 60
+    # キャッシュする値がこのバイト数以上であればzlibで圧縮する
+    REDIS_CACHE_COMPRESS_THRESHOLD: int = 1024
 
 
 T = TypeVar("T")
@@ -88,6 +109,92 @@ def get_env_info(env_info_class: Type[S]) -> S:
     return env_info_instance
 
 
+class ManagedConnectionPool:
+    """スレッドセーフなPostgreSQLコネクションプール
+
+    psycopg2のThreadedConnectionPoolは枯渇時に即座にPoolErrorを送出するため、
+    セマフォで最大接続数まで待ち合わせる。しばらく使われていなかった接続は
+    取り出し時にヘルスチェックし、切断されていれば張り直す。
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        health_check_interval: float = 30.0,
+        timeout: float = 30.0,
+        **connect_kwargs: Any,
+    ):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._maxconn = maxconn
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._health_check_interval = health_check_interval
+        self._timeout = timeout
+        self._last_used: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """プールから自動コミットの接続を取り出し、終了時に返却する"""
+        if not self._slots.acquire(timeout=self._timeout):
+            raise pg_pool.PoolError(
+                f"コネクションプールが枯渇しています ({self._timeout}秒待機)"
+            )
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # 接続自体が壊れている可能性があるのでプールに戻さず破棄する
+            if conn is not None:
+                self._release(conn, close=True)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._release(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def _checkout(self):
+        # プールにある接続が全て切断されていても、最後は新しく張った接続を確認して返す
+        for _ in range(self._maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                conn.autocommit = True  # 自動コミットを有効にする
+                return conn
+            self._release(conn, close=True)
+        raise pg_pool.PoolError("正常な接続を取得できません")
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+        if (
+            last_used is not None
+            and time.monotonic() - last_used < self._health_check_interval
+        ):
+            return True
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release(self, conn, close: bool = False) -> None:
+        with self._lock:
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        self._pool.putconn(conn, close=close)
+
+    def closeall(self) -> None:
+        self._pool.closeall()
+
+
 class PostgresAndRedisManager:
     def __init__(
         self,
@@ -98,25 +205,63 @@ class PostgresAndRedisManager:
         self.postgresConfig = postgresConfig
         if self.check_database_exists() is False:
             self.create_new_database()
+        self.pool = self._create_pool(
+            self.postgresConfig.PG_DATABASE,
+            minconn=self.postgresConfig.PG_POOL_MINCONN,
+            maxconn=self.postgresConfig.PG_POOL_MAXCONN,
+        )
         self.redisConfig = redisConfig
         self.r = redis.Redis(
             host=self.redisConfig.REDIS_HOST,
             port=self.redisConfig.REDIS_PORT,
             password=self.redisConfig.REDIS_PASSWORD,
-            decode_responses=True,
         )
         self.allowed_tables = allowed_tables
         self.allowed_tables.append(self.postgresConfig.PG_TABLE)
 
-    def check_database_exists(self) -> bool:
-        with psycopg2.connect(
+    def _create_pool(
+        self, dbname: str, minconn: int, maxconn: int
+    ) -> ManagedConnectionPool:
+        return ManagedConnectionPool(
+            minconn,
+            maxconn,
+            health_check_interval=self.postgresConfig.PG_POOL_HEALTH_CHECK_INTERVAL,
+            timeout=self.postgresConfig.PG_POOL_TIMEOUT,
+            dbname=dbname,
+            user=self.postgresConfig.PG_USER,
+            password=self.postgresConfig.PG_PASSWORD,
+            host=self.postgresConfig.PG_HOST,
+            port=self.postgresConfig.PG_PORT,
+        )
+
+    @contextmanager
+    def _admin_connection(self) -> Iterator[Any]:
+        """データベースの存在確認・作成用 (dbname="postgres") の接続
+
+        起動時にしか使わないため、プールせずに使い終わったら閉じる。
+        """
+        conn = psycopg2.connect(
             dbname="postgres",
             user=self.postgresConfig.PG_USER,
             password=self.postgresConfig.PG_PASSWORD,
             host=self.postgresConfig.PG_HOST,
             port=self.postgresConfig.PG_PORT,
-        ) as conn:
-            conn.autocommit = True  # 自動コミットを有効にする
+        )
+        try:
+            conn.autocommit = True
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        """プールしている全ての接続とRedisの接続を閉じる (終了時に呼ぶ)"""
+        if getattr(self, "pool", None) is not None:
+            self.pool.closeall()
+        if getattr(self, "r", None) is not None:
+            self.r.close()
+
+    def check_database_exists(self) -> bool:
+        with self._admin_connection() as conn:
             with conn.cursor() as cur:
                 # 指定したデータベースが存在するかどうかを確認するSQLクエリ
                 query = "SELECT 1 FROM pg_database WHERE datname = %s;"
@@ -137,16 +282,7 @@ class PostgresAndRedisManager:
 
     def create_new_database(self) -> None:
         """デフォルトのデータベースに接続して新しいデータベースを作成"""
-        try:
-            conn = psycopg2.connect(
-                dbname="postgres",
-                user=self.postgresConfig.PG_USER,
-                password=self.postgresConfig.PG_PASSWORD,
-                host=self.postgresConfig.PG_HOST,
-                port=self.postgresConfig.PG_PORT,
-            )
-            conn.autocommit = True  # 自動コミットを有効にする
-
+        with self._admin_connection() as conn:
             with conn.cursor() as cur:
                 # 新しいデータベースを作成（既に存在する場合は不要）
                 # データベース名に特殊文字が含まれていないことを確認し、安全であることを保証する
@@ -154,10 +290,7 @@ class PostgresAndRedisManager:
                     raise ValueError("不正なデータベース名です。")
                 query = f"CREATE DATABASE {self.postgresConfig.PG_DATABASE};"
                 cur.execute(query)
-            print(f"データベース '{self.postgresConfig.PG_DATABASE}' を作成しました。")
-        finally:
-            if conn:
-                conn.close()
+        print(f"データベース '{self.postgresConfig.PG_DATABASE}' を作成しました。")
 
     def query(
         self,
@@ -192,15 +325,8 @@ class PostgresAndRedisManager:
             query = query_template.format(table_name=table_name)
         else:
             query = query_template
-        # データベースに接続
-        with psycopg2.connect(
-            dbname=self.postgresConfig.PG_DATABASE,
-            user=self.postgresConfig.PG_USER,
-            password=self.postgresConfig.PG_PASSWORD,
-            host=self.postgresConfig.PG_HOST,
-            port=self.postgresConfig.PG_PORT,
-        ) as conn:
-            conn.autocommit = True
+        # プールから接続を取り出す
+        with self.pool.connection() as conn:
             # カーソルを作成
             with conn.cursor() as cur:
                 cur.execute(query, params)
@@ -216,20 +342,31 @@ class PostgresAndRedisManager:
         key,
         query_template: str,
         table_name: str = "",
-        params: tuple[Any, ...] = ("",),
-    ) -> list[tuple[Any, ...]] | Awaitable[Any] | None:
-        """キャッシュされたデータを取得する関数。キャッシュが存在しない場合はDBから取得してキャッシュする"""
+        params: tuple[Any, ...] | None = None,
+    ) -> list[tuple[Any, ...]] | None:
+        """キャッシュされたデータを取得する関数。キャッシュが存在しない場合はDBから取得してキャッシュする
+
+        キャッシュヒット時もDBから取得した場合と同じlist[tuple]を返す。
+        """
         # Redisからデータを取得しようとする
         cached_data = self.r.get(key)
         if cached_data:
-            print("キャッシュヒット")
-            return cached_data
-        else:
-            print("キャッシュミス - DBからデータを取得")
-            data = self.query(query_template, table_name, params)
-            # 取得したデータをキャッシュに保存（例：有効期限60秒）
-            self.r.setex(key, 60, str(data))
+            try:
+                data = decode_rows(cached_data)
+                print("キャッシュヒット")
+                return data
+            except Exception as e:
+                # 旧形式(文字列)のキャッシュなどは読み捨ててDBから取得し直す
+                print(f"キャッシュデータを読み込めません: {e}")
+        print("キャッシュミス - DBからデータを取得")
+        data = self.query(query_template, table_name, params)
+        try:
+            payload = encode_rows(data, self.redisConfig.REDIS_CACHE_COMPRESS_THRESHOLD)
+        except TypeError as e:
+            print(f"キャッシュに保存できません: {e}")
             return data
+        self.r.setex(key, self.redisConfig.REDIS_CACHE_TTL, payload)
+        return data
 
 
 if __name__ == "__main__":
@@ -255,3 +392,4 @@ if __name__ == "__main__":
     params_select = (10,)
     data = manager.get_data(key, query_template_select, table_name, params_select)
     print(data)
+    manager.close()
@@ -0,0 +1,71 @@
+"""Redisにキャッシュするクエリ結果のエンコード・デコード
+
+クエリ結果 (list[tuple]) をmsgpackでバイナリにし、一定サイズ以上はzlibで圧縮する。
+msgpackが直接扱えないdatetime/date/time/Decimalは拡張型として保存するため、
+キャッシュヒット時もDBから取得した場合と同じ型の値が返る。
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+import zlib
+
+import msgpack
+
+# 先頭1バイトで形式を判別する
+_RAW = b"\x00"
+_COMPRESSED = b"\x01"
+
+# msgpackの拡張型コード
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+_EXT_TIME = 3
+_EXT_DECIMAL = 4
+
+
+def _default(obj: Any) -> msgpack.ExtType:
+    # datetimeはdateのサブクラスなので先に判定する
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+    if isinstance(obj, time):
+        return msgpack.ExtType(_EXT_TIME, obj.isoformat().encode())
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode())
+    raise TypeError(f"キャッシュできない型です: {type(obj).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == _EXT_TIME:
+        return time.fromisoformat(data.decode())
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def encode_rows(
+    rows: list[tuple[Any, ...]] | None, compress_threshold: int = 1024
+) -> bytes:
+    """クエリ結果をバイト列にする。compress_thresholdバイト以上なら圧縮する"""
+    packed = msgpack.packb(rows, default=_default, use_bin_type=True)
+    if len(packed) >= compress_threshold:
+        return _COMPRESSED + zlib.compress(packed)
+    return _RAW + packed
+
+
+def decode_rows(payload: bytes) -> list[tuple[Any, ...]] | None:
+    """encode_rowsで作ったバイト列を元のクエリ結果 (list[tuple]) に戻す"""
+    header, body = payload[:1], payload[1:]
+    if header == _COMPRESSED:
+        body = zlib.decompress(body)
+    elif header != _RAW:
+        raise ValueError("不正なキャッシュデータです。")
+    rows = msgpack.unpackb(body, ext_hook=_ext_hook, raw=False)
+    if rows is None:
+        return None
+    return [tuple(row) for row in rows]
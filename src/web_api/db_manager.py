@@ -53,8 +53,14 @@ class DBManager:
             PG_USER=self.env_info.PG_USER,
             PG_PASSWORD=self.env_info.PG_PASSWORD,
             PG_DATABASE=self.env_info.PG_DATABASE,
+            PG_POOL_MINCONN=self.env_info.PG_POOL_MINCONN,
+            PG_POOL_MAXCONN=self.env_info.PG_POOL_MAXCONN,
+        )
+        self.redis_config = RedisConfig(
+            REDIS_PASSWORD=self.env_info.REDIS_PASSWORD,
+            REDIS_CACHE_TTL=self.env_info.REDIS_CACHE_TTL,
+            REDIS_CACHE_COMPRESS_THRESHOLD=self.env_info.REDIS_CACHE_COMPRESS_THRESHOLD,
         )
-        self.redis_config = RedisConfig(REDIS_PASSWORD=self.env_info.REDIS_PASSWORD)
         self.manager: PostgresAndRedisManager = self._initialize_manager()
         self._create_tables()
 
@@ -264,6 +270,10 @@ class DBManager:
         )
         print("記事が追加されました。")
 
+    def close(self):
+        """プールしている接続を閉じる関数 (終了時に呼ぶ)"""
+        self.manager.close()
+
 
 if __name__ == "__main__":
     # DBManagerのインスタンスを作成
@@ -295,3 +305,6 @@ if __name__ == "__main__":
     # db_manager.get_table_info("articles")
     # articlesテーブルからIDによってレコードを取得する
     db_manager.get_record_by_id("articles", 1)
+
+    # プールしている接続を閉じる
+    db_manager.close()
@@ -0,0 +1,82 @@
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+import zlib
+
+import msgpack
+import pytest
+
+from cache_codec import decode_rows, encode_rows
+
+ROWS = [
+    (
+        1,
+        "京都",
+        datetime(2024, 4, 1, 9, 30, 15, 123456),
+        date(2024, 4, 1),
+        time(9, 30, 15),
+        Decimal("1234.50"),
+    ),
+    (
+        2,
+        None,
+        datetime(2024, 4, 1, 9, 30, tzinfo=timezone(timedelta(hours=9))),
+        date(1999, 12, 31),
+        time(23, 59, 59, 999999),
+        Decimal("-0.001"),
+    ),
+]
+
+
+def test_round_trip_keeps_types():
+    decoded = decode_rows(encode_rows(ROWS))
+    assert decoded == ROWS
+    for row, expected in zip(decoded, ROWS):
+        assert isinstance(row, tuple)
+        assert [type(value) for value in row] == [type(value) for value in expected]
+    # タイムゾーン付きのdatetimeはオフセットも保つ
+    assert decoded[1][2].utcoffset() == timedelta(hours=9)
+    # Decimalは桁数も保つ
+    assert str(decoded[0][5]) == "1234.50"
+
+
+def test_small_payload_is_not_compressed():
+    payload = encode_rows(ROWS, compress_threshold=10_000)
+    assert payload[:1] == b"\x00"
+    assert msgpack.unpackb(payload[1:], raw=False)[0][:2] == [1, "京都"]
+    assert decode_rows(payload) == ROWS
+
+
+def test_large_payload_is_compressed():
+    rows = [(i, "記事の本文" * 20) for i in range(100)]
+    payload = encode_rows(rows, compress_threshold=1024)
+    assert payload[:1] == b"\x01"
+    packed = zlib.decompress(payload[1:])
+    assert len(payload) < len(packed)
+    assert decode_rows(payload) == rows
+
+
+def test_compression_threshold_is_inclusive():
+    # 先頭1バイトを除いたmsgpackのサイズ
+    size = len(encode_rows(ROWS[:1], compress_threshold=10_000)) - 1
+    # ちょうどcompress_thresholdバイトの場合は圧縮する
+    assert encode_rows(ROWS[:1], compress_threshold=size)[:1] == b"\x01"
+    assert encode_rows(ROWS[:1], compress_threshold=size + 1)[:1] == b"\x00"
+
+
+def test_none_and_empty_results():
+    assert decode_rows(encode_rows(None)) is None
+    assert decode_rows(encode_rows([])) == []
+
+
+def test_unknown_header_is_rejected():
+    payload = encode_rows(ROWS)
+    with pytest.raises(ValueError):
+        decode_rows(b"\x02" + payload[1:])
+    # 旧形式の文字列のキャッシュも読まずにエラーにする
+    with pytest.raises(ValueError):
+        decode_rows(str(ROWS).encode())
+
+
+def test_unsupported_type_raises_type_error():
+    with pytest.raises(TypeError):
+        encode_rows([(1, object())])
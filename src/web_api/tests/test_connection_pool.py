@@ -0,0 +1,146 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+import pytest
+
+import PostgresAndRedisManager
+from PostgresAndRedisManager import ManagedConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        if not self.conn.alive:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = 0
+        self.autocommit = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeThreadedConnectionPool:
+    """psycopg2のThreadedConnectionPoolの代わりに、接続を作らずに貸し出す"""
+
+    def __init__(self, minconn, maxconn, **connect_kwargs):
+        self.idle = []
+        self.created = []
+        self.closed = []
+        self.new_connections_alive = True
+
+    def getconn(self):
+        if self.idle:
+            return self.idle.pop()
+        conn = FakeConnection(self.new_connections_alive)
+        self.created.append(conn)
+        return conn
+
+    def putconn(self, conn, close=False):
+        if close:
+            conn.closed = 1
+            self.closed.append(conn)
+        else:
+            self.idle.append(conn)
+
+    def closeall(self):
+        self.idle.clear()
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    monkeypatch.setattr(
+        PostgresAndRedisManager.pg_pool,
+        "ThreadedConnectionPool",
+        FakeThreadedConnectionPool,
+    )
+
+    def make(maxconn=2, **kwargs):
+        return ManagedConnectionPool(1, maxconn, **kwargs)
+
+    return make
+
+
+def test_connection_waits_for_free_slot(make_pool):
+    pool = make_pool(maxconn=2, timeout=0.05)
+    with pool.connection(), pool.connection():
+        # 最大接続数まで貸し出している間は待ち、timeoutでPoolErrorになる
+        with pytest.raises(pg_pool.PoolError):
+            with pool.connection():
+                pass
+    with pool.connection() as conn:
+        assert conn.autocommit is True
+
+
+def test_concurrent_connections_are_bounded(make_pool):
+    pool = make_pool(maxconn=2, timeout=5)
+    lock = threading.Lock()
+    in_use = [0]
+    max_in_use = [0]
+
+    def work():
+        with pool.connection():
+            with lock:
+                in_use[0] += 1
+                max_in_use[0] = max(max_in_use[0], in_use[0])
+            time.sleep(0.01)
+            with lock:
+                in_use[0] -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max_in_use[0] == 2
+
+
+def test_unhealthy_connections_are_replaced(make_pool):
+    pool = make_pool(maxconn=3, health_check_interval=0)
+    dead = [FakeConnection(alive=False) for _ in range(2)]
+    pool._pool.idle.extend(dead)
+
+    # 切断された接続は全て閉じ、確認できた新しい接続を返す
+    with pool.connection() as conn:
+        assert conn.alive
+        assert conn not in dead
+    assert pool._pool.closed == dead[::-1]
+    assert pool._pool.idle == [conn]
+
+
+def test_recently_used_connection_skips_health_check(make_pool):
+    pool = make_pool(maxconn=1, health_check_interval=30)
+    with pool.connection() as conn:
+        pass
+    conn.alive = False
+    # 最後に使ってからhealth_check_interval未満の接続はSELECT 1をしない
+    with pool.connection() as reused:
+        assert reused is conn
+
+
+def test_checkout_fails_when_no_healthy_connection(make_pool):
+    pool = make_pool(maxconn=2, health_check_interval=0)
+    pool._pool.new_connections_alive = False
+
+    with pytest.raises(pg_pool.PoolError):
+        with pool.connection():
+            pass
+    # 確認できなかった接続はプールに戻さない
+    assert pool._pool.idle == []
+    assert len(pool._pool.closed) == 3
+    # 取得に失敗しても待ち合わせの枠は返却されている
+    assert pool._slots._value == 2